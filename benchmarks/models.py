@@ -0,0 +1,33 @@
+from pgvector.sqlalchemy import Vector  # type: ignore
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from sqlalchemy_oso_cloud.orm import Resource, attribute, relation, remote_relation
+
+
+class Base(DeclarativeBase):
+  pass
+
+class Organization(Base, Resource):
+  __tablename__ = "organization"
+  id: Mapped[int] = mapped_column(primary_key=True)
+  name: Mapped[str]
+  documents: Mapped[list["Document"]] = relation(back_populates="organization")
+
+class Document(Base, Resource):
+  __tablename__ = "document"
+  id: Mapped[int] = mapped_column(primary_key=True)
+  organization_id: Mapped[int] = mapped_column(ForeignKey("organization.id"), index=True)
+  organization: Mapped["Organization"] = relation(back_populates="documents")
+  team_id: Mapped[int] = remote_relation(remote_resource_name="Team")
+  content: Mapped[str]
+  status: Mapped[str] = attribute(index=True)
+  is_public: Mapped[bool] = attribute(default=False)
+  embedding: Mapped[list[float]] = mapped_column(Vector(3), nullable=True)
+
+class DocumentChunk(Base, Resource):
+  __tablename__ = "document_chunk"
+  id: Mapped[int] = mapped_column(primary_key=True)
+  document_id: Mapped[int] = mapped_column(ForeignKey("document.id"), index=True)
+  document: Mapped["Document"] = relation()
+  content: Mapped[str]
@@ -0,0 +1,204 @@
+"""
+Measure the overhead that authorization adds to queries.
+
+Runs offline against `.stand_in.OsoStandIn` and SQLite (or any database given by `--database-url`),
+and prints the results as JSON:
+
+    python -m benchmarks.run --latency-ms 5 --output results.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from importlib.metadata import version
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from oso_cloud import Value
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import FilterCache, Session, select
+from sqlalchemy_oso_cloud.auth import fetch_filter, fetch_filters
+from sqlalchemy_oso_cloud.vector import authorized_nearest
+
+from .models import Base, Document, DocumentChunk, Organization
+from .stand_in import OsoStandIn
+
+STATUSES = ["draft", "review", "published"]
+
+
+def measure(run: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, Any]:
+  """
+  Time `run`. If it returns an `int`, that is the number of rows it loaded.
+
+  :return: Summary statistics, in milliseconds per iteration.
+  """
+  for _ in range(warmup):
+    run()
+  timings: List[float] = []
+  rows = 0
+  for _ in range(iterations):
+    start = time.perf_counter()
+    loaded = run()
+    timings.append(time.perf_counter() - start)
+    if isinstance(loaded, int):
+      rows += loaded
+  timings.sort()
+  result = {
+    "iterations": iterations,
+    "mean_ms": statistics.mean(timings) * 1000,
+    "median_ms": statistics.median(timings) * 1000,
+    "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+    "min_ms": timings[0] * 1000,
+    "max_ms": timings[-1] * 1000,
+  }
+  if rows:
+    result["rows_per_second"] = rows / sum(timings)
+  return result
+
+
+def populate(engine: Engine, documents: int, organizations: int, vectors: bool):
+  Base.metadata.drop_all(engine)
+  Base.metadata.create_all(engine)
+  rng = random.Random(0)
+  with Session(engine) as session:
+    session.add_all([Organization(id=i, name=f"organization-{i}") for i in range(1, organizations + 1)])
+    for i in range(1, documents + 1):
+      document = Document(
+        id=i,
+        organization_id=rng.randint(1, organizations),
+        team_id=rng.randint(1, 10),
+        content=f"document {i}",
+        status=rng.choice(STATUSES),
+        is_public=rng.random() < 0.05,
+      )
+      if vectors:
+        document.embedding = [rng.random() for _ in range(3)]
+      session.add(document)
+      session.add_all([DocumentChunk(document_id=i, content=f"chunk {j} of document {i}") for j in range(2)])
+    session.commit()
+
+
+def main(argv: Optional[List[str]] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--database-url", default="sqlite://", help="SQLAlchemy URL of the database to benchmark against (default: in-memory SQLite)")
+  parser.add_argument("--latency-ms", type=float, default=5.0, help="latency of each request to the Oso Cloud stand-in (default: 5)")
+  parser.add_argument("--iterations", type=int, default=100, help="timed iterations per benchmark (default: 100)")
+  parser.add_argument("--warmup", type=int, default=10, help="untimed iterations per benchmark (default: 10)")
+  parser.add_argument("--documents", type=int, default=1000, help="number of documents to create (default: 1000)")
+  parser.add_argument("--organizations", type=int, default=10, help="number of organizations to spread documents across (default: 10)")
+  parser.add_argument("--output", help="file to write the results to (default: stdout)")
+  args = parser.parse_args(argv)
+
+  engine = create_engine(args.database_url)
+  vectors = engine.dialect.name == "postgresql"
+  if vectors:
+    with engine.begin() as connection:
+      connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+  populate(engine, args.documents, args.organizations, vectors)
+
+  actors = [Value("User", f"user-{i}") for i in range(args.organizations)]
+  turn = iter(range(sys.maxsize))
+
+  def actor() -> Value:
+    return actors[next(turn) % len(actors)]
+
+  with OsoStandIn(args.organizations, latency=args.latency_ms / 1000) as stand_in:
+    sqlalchemy_oso_cloud.init(Base.registry, dialect=engine, url=stand_in.url, api_key="benchmark")
+    oso_module = sqlalchemy_oso_cloud.oso
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def benchmark(name: str, run: Callable[[], Any]):
+      requests = stand_in.requests
+      results[name] = measure(run, args.iterations, args.warmup)
+      results[name]["oso_requests_per_iteration"] = (stand_in.requests - requests) / (args.iterations + args.warmup)
+
+    def load(query: Callable[[Session], Sequence[Any]]) -> Callable[[], int]:
+      def run() -> int:
+        with Session(engine) as session:
+          return len(query(session))
+      return run
+
+    benchmark("construct.select", lambda: select(Document).authorized(actor(), "read"))
+    with Session(engine) as session:
+      benchmark("construct.query", lambda: session.query(Document).authorized(actor(), "read"))
+    oso_module._defer_authorization = True
+    try:
+      benchmark("construct.select.deferred", lambda: select(Document).authorized(actor(), "read"))
+    finally:
+      oso_module._defer_authorization = False
+
+    benchmark("fetch.filter", lambda: fetch_filter(Document, actor(), "read"))
+    benchmark(
+      "fetch.filters.multi_model",
+      lambda: fetch_filters([(model, actor(), "read") for model in (Organization, Document, DocumentChunk)]),
+    )
+
+    statement = select(Document, DocumentChunk).join(DocumentChunk.document).authorized(actor(), "read")
+    benchmark("compile.multi_model", lambda: statement.compile(dialect=engine.dialect))
+
+    benchmark("execute.select.unauthorized", load(lambda session: session.execute(select(Document)).scalars().all()))
+    benchmark(
+      "execute.select",
+      load(lambda session: session.execute(select(Document).authorized(actor(), "read")).scalars().all()),
+    )
+    benchmark("execute.query", load(lambda session: session.query(Document).authorized(actor(), "read").all()))
+    benchmark(
+      "execute.select.multi_model",
+      load(lambda session: session.execute(
+        select(Document, DocumentChunk).join(DocumentChunk.document).authorized(actor(), "read")
+      ).all()),
+    )
+
+    oso_module._filter_cache = FilterCache(ttl=None)
+    try:
+      benchmark(
+        "execute.select.cached",
+        load(lambda session: session.execute(select(Document).authorized(actor(), "read")).scalars().all()),
+      )
+    finally:
+      oso_module._filter_cache = None
+
+    if vectors:
+      target = [0.5, 0.5, 0.5]
+      benchmark(
+        "execute.select.pgvector_nearest",
+        load(lambda session: session.execute(
+          select(Document).order_by(Document.embedding.l2_distance(target)).limit(10).authorized(actor(), "read")
+        ).scalars().all()),
+      )
+
+      def nearest(strategy: str) -> Callable[[Session], Sequence[Any]]:
+        return lambda session: authorized_nearest(
+          session, Document, Document.embedding, target, 10, actor(), "read", strategy=strategy
+        )
+
+      for strategy in ("auto", "prefilter", "iterative"):
+        benchmark(f"execute.authorized_nearest.{strategy}", load(nearest(strategy)))
+
+  output = json.dumps({
+    "environment": {
+      "python": platform.python_version(),
+      "sqlalchemy": version("sqlalchemy"),
+      "oso_cloud": version("oso-cloud"),
+      "sqlalchemy_oso_cloud": version("sqlalchemy-oso-cloud"),
+      "database": engine.dialect.name,
+      "latency_ms": args.latency_ms,
+      "documents": args.documents,
+      "organizations": args.organizations,
+    },
+    "benchmarks": results,
+  }, indent=2)
+  if args.output:
+    with open(args.output, "w") as f:
+      f.write(output + "\n")
+  else:
+    print(output)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,127 @@
+"""
+A local, in-process stand-in for the parts of the Oso Cloud API that `.authorized()` uses.
+
+It answers `list_local` requests with filters for this policy,
+built from the data bindings the client sends with each request:
+
+    actor User {}
+
+    resource Organization {
+      roles = ["admin"];
+      permissions = ["read"];
+      "read" if "admin";
+    }
+
+    resource Document {
+      relations = { organization: Organization };
+      permissions = ["read"];
+      "read" if "admin" on "organization";
+      "read" if has_status(resource, "published");
+      "read" if is_public(resource);
+    }
+
+    resource DocumentChunk {
+      relations = { document: Document };
+      permissions = ["read"];
+      "read" if "read" on "document";
+    }
+
+`User{"user-N"}` is an admin of `Organization{N % organizations + 1}`.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+
+class OsoStandIn:
+  """
+  Serves `list_local` filters over HTTP with a configurable latency.
+
+  Use as a context manager, and pass `url` to `sqlalchemy_oso_cloud.init`.
+  """
+
+  def __init__(self, organizations: int, latency: float = 0.0):
+    """
+    :param organizations: The number of organizations that users are spread across.
+    :param latency: How many seconds to wait before answering each request.
+    """
+    self.organizations = organizations
+    self.latency = latency
+    self.requests = 0
+    self._lock = threading.Lock()
+    self._server: Optional[ThreadingHTTPServer] = None
+    self._thread: Optional[threading.Thread] = None
+
+  @property
+  def url(self) -> str:
+    assert self._server is not None, "the stand-in is not running"
+    host, port = self._server.server_address[:2]
+    return f"http://{host!s}:{port}"
+
+  def __enter__(self) -> "OsoStandIn":
+    stand_in = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path != "/api/list_query":
+          self.send_error(404)
+          return
+        with stand_in._lock:
+          stand_in.requests += 1
+        if stand_in.latency:
+          time.sleep(stand_in.latency)
+        response = json.dumps({"sql": stand_in.list_local(body["query"], body["column"], body["data_bindings"])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+      def log_message(self, format, *args):
+        pass
+
+    self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    self._thread.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    assert self._server is not None and self._thread is not None
+    self._server.shutdown()
+    self._server.server_close()
+    self._thread.join()
+
+  def organization_for(self, user_id: str) -> int:
+    """The organization that a user is an admin of."""
+    return int(user_id.rsplit("-", 1)[-1]) % self.organizations + 1
+
+  def list_local(self, query: Dict[str, Any], column: str, data_bindings: str) -> str:
+    facts = yaml.safe_load(data_bindings)["facts"]
+    if query["actor_type"] != "User" or query["action"] != "read":
+      return "1 = 0"
+    organization = self.organization_for(query["actor_id"])
+    return self._read_filter(query["resource_type"], column, organization, facts)
+
+  def _read_filter(self, resource_type: str, column: str, organization: int, facts: Dict[str, Any]) -> str:
+    if resource_type == "Organization":
+      return f"{column} IN ({organization})"
+    if resource_type == "Document":
+      relation = facts["has_relation(Document:_, organization, Organization:_)"]["query"]
+      status = facts["has_status(Document:_, String:_)"]["query"]
+      public = facts["is_public(Document:_)"]["query"]
+      branches: List[str] = [
+        f"{column} IN (WITH f0(c0, c1) AS ({relation}) SELECT c0 FROM f0 WHERE c1 IN ({organization}))",
+        f"{column} IN (WITH f1(c0, c1) AS ({status}) SELECT c0 FROM f1 WHERE c1 = 'published')",
+        f"{column} IN (WITH f2(c0) AS ({public}) SELECT c0 FROM f2)",
+      ]
+      return " OR ".join(branches)
+    if resource_type == "DocumentChunk":
+      relation = facts["has_relation(DocumentChunk:_, document, Document:_)"]["query"]
+      document = self._read_filter("Document", "c1", organization, facts)
+      return f"{column} IN (WITH f3(c0, c1) AS ({relation}) SELECT c0 FROM f3 WHERE {document})"
+    return "1 = 0"
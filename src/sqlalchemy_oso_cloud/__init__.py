@@ -10,15 +10,38 @@ The main features are:
 - Automatic Local Authorization configuration from your ORM models
   via utilities provided in the `.orm` module.
 - Extensions to SQLAlchemy's `Select` and `Query` classes to provide
-  an `.authorized_for(actor, action)` method for filtering results.
+  an `.authorized_for(actor, action)` method for filtering results,
+  and `Update` and `Delete` classes to authorize bulk writes in one statement.
+- Optional caching of authorization filters via `.FilterCache`, and a `.CircuitBreaker` for when Oso Cloud is failing.
+- Optional planning of how to authorize top-k statements via `.AuthorizationPlanner`.
+- Optional caching of the results of authorized statements via `.ResultCache`.
+- Optional materialization of the authorized resources of hot actors via `.AuthorizationTable`.
+- asyncio support via the `.asyncio` module.
+- Instrumentation hooks via the `.instrumentation` module, and OpenTelemetry support via `.opentelemetry`.
 
 See the [README](https://github.com/osohq/sqlalchemy-oso-cloud) for more information.
 """
 from . import orm
 from .auth import _apply_authorization_options, authorized
-from .oso import get_oso, init
+from .breaker import CircuitBreaker, CircuitOpenError
+from .cache import FilterCache
+from .dml_impl import Delete, Update, delete, update
+from .materialize import AuthorizationTable
+from .oso import (
+    AsyncOso,
+    get_async_oso,
+    get_authorization_table,
+    get_circuit_breaker,
+    get_filter_cache,
+    get_oso,
+    get_planner,
+    get_result_cache,
+    init,
+)
+from .planner import AuthorizationPlanner
 from .query import Query
+from .result_cache import LRUBackend, RedisBackend, ResultCache
 from .select_impl import Select, select
 from .session import Session
 
-__all__ = ["orm", "Session", "Query", "init", "get_oso", "Select", "select", "authorized", "_apply_authorization_options"]
+__all__ = ["orm", "Session", "Query", "init", "get_oso", "get_async_oso", "AsyncOso", "get_filter_cache", "FilterCache", "CircuitBreaker", "CircuitOpenError", "get_circuit_breaker", "AuthorizationPlanner", "get_planner", "ResultCache", "LRUBackend", "RedisBackend", "get_result_cache", "AuthorizationTable", "get_authorization_table", "Select", "select", "Update", "update", "Delete", "delete", "authorized", "_apply_authorization_options"]
@@ -0,0 +1,240 @@
+"""
+Recommends the indexes that authorized queries need.
+
+The filters returned by Oso Cloud look up the facts in your database by the columns
+that your `.orm.relation`, `.orm.attribute` and `.orm.remote_relation` bindings map:
+foreign keys, attribute values and remote relation IDs. Without an index on those columns,
+every authorized query scans the whole table.
+
+    from sqlalchemy_oso_cloud.advisor import recommend_indexes, to_ddl
+
+    recommendations = recommend_indexes(Base.registry, inspect(engine))
+    print(to_ddl(recommendations, engine.dialect))
+
+Each recommendation is a composite index on the binding column followed by the resource's ID,
+so that the database can answer the lookup from the index alone.
+
+The advisor can also be run from the command line:
+
+    python -m sqlalchemy_oso_cloud.advisor myapp.models:Base --database-url postgresql://... --format alembic
+"""
+import argparse
+import importlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import (
+  Column,
+  ColumnElement,
+  Index,
+  MetaData,
+  Table,
+  create_engine,
+  inspect,
+)
+from sqlalchemy.engine import Dialect, Inspector
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty, registry
+from sqlalchemy.schema import CreateIndex
+
+from .orm import (
+  _ATTRIBUTE_INFO_KEY,
+  _RELATION_INFO_KEY,
+  _REMOTE_RELATION_INFO_KEY,
+  Resource,
+)
+from .oso import _truncate_identifier, to_polar_type
+
+__all__ = ["IndexRecommendation", "recommend_indexes", "to_ddl", "to_alembic"]
+
+
+class IndexRecommendation(NamedTuple):
+  """An index that authorized queries need, but that doesn't exist."""
+
+  table: Table
+  columns: Tuple[str, ...]
+  """The columns to index, in order: the binding column, followed by the resource's ID."""
+  facts: Tuple[str, ...]
+  """The facts whose queries use this index."""
+  indexed: bool
+  """Whether an index with the binding column as its leading column already exists.
+  If so, the recommended index only makes the lookup cheaper; otherwise, the lookup scans the whole table."""
+
+  @property
+  def name(self) -> str:
+    return _truncate_identifier(f"ix_oso_{self.table.name}_{'_'.join(self.columns)}")
+
+  def to_index(self) -> Index:
+    """The recommended index as a SQLAlchemy `Index`, on a copy of `table` so that your metadata is unchanged."""
+    table = self.table.to_metadata(MetaData())
+    return Index(self.name, *[table.c[column] for column in self.columns])
+
+
+def _primary_key(table: Table) -> Tuple[str, ...]:
+  return tuple(column.name for column in table.primary_key.columns)
+
+def _lookups(registry: registry) -> List[Tuple[str, Table, Tuple[str, ...]]]:
+  """Find the fact lookups in a registry: the fact, and the table and columns it is looked up by."""
+  lookups: List[Tuple[str, Table, Tuple[str, ...]]] = []
+  for mapper in sorted(registry.mappers, key=lambda mapper: mapper.class_.__name__):
+    if not issubclass(mapper.class_, Resource):
+      continue
+    name = mapper.class_.__name__
+    for attr in mapper.attrs:
+      if isinstance(attr, RelationshipProperty) and _RELATION_INFO_KEY in attr.info:
+        fact = f"has_relation({name}:_, {attr.key}, {attr.entity.class_.__name__}:_)"
+        for local, remote in attr.local_remote_pairs or []:
+          lookups.extend(_join_lookups(fact, [local, remote]))
+      elif isinstance(attr, ColumnProperty) and len(attr.columns) == 1:
+        column = attr.columns[0]
+        if not isinstance(column, Column) or column.table is None:
+          continue
+        if _ATTRIBUTE_INFO_KEY in column.info:
+          if to_polar_type(column.type) == "Boolean":
+            fact = f"{attr.key}({name}:_)"
+          else:
+            fact = f"has_{attr.key}({name}:_, {to_polar_type(column.type)}:_)"
+        elif _REMOTE_RELATION_INFO_KEY in column.info:
+          remote_resource_name, remote_relation_key = column.info[_REMOTE_RELATION_INFO_KEY]
+          fact = f"has_relation({name}:_, {remote_relation_key or column.name.removesuffix('_id')}, {remote_resource_name}:_)"
+        else:
+          continue
+        lookups.append((fact, column.table, (column.name, *_primary_key(column.table))))
+  return lookups
+
+def _join_lookups(fact: str, columns: Sequence[ColumnElement]) -> List[Tuple[str, Table, Tuple[str, ...]]]:
+  """The lookups for the join columns of a relationship: every column that isn't already its table's primary key."""
+  lookups = []
+  for column in columns:
+    if not isinstance(column, Column) or not isinstance(column.table, Table) or column.primary_key:
+      continue
+    primary_key = _primary_key(column.table)
+    # an association table has a composite primary key that includes the join column
+    rest = [name for name in primary_key if name != column.name] if primary_key else []
+    lookups.append((fact, column.table, (column.name, *rest)))
+  return lookups
+
+def _existing_indexes(table: Table, inspector: Optional[Inspector]) -> Set[Tuple[str, ...]]:
+  """The column lists of the indexes on a table, from the database if an inspector is given, otherwise from the metadata."""
+  if inspector is not None:
+    if not inspector.has_table(table.name, schema=table.schema):
+      return set()
+    indexes = {
+      tuple(name for name in index["column_names"] if name is not None)
+      for index in inspector.get_indexes(table.name, schema=table.schema)
+    }
+    indexes.add(tuple(inspector.get_pk_constraint(table.name, schema=table.schema)["constrained_columns"]))
+    indexes.update(
+      tuple(constraint["column_names"])
+      for constraint in inspector.get_unique_constraints(table.name, schema=table.schema)
+    )
+    return indexes
+  indexes = {tuple(column.name for column in index.columns) for index in table.indexes}
+  indexes.add(_primary_key(table))
+  indexes.update(
+    (column.name,) for column in table.columns if column.index or column.unique
+  )
+  return indexes
+
+def recommend_indexes(registry: registry, inspector: Optional[Inspector] = None) -> List[IndexRecommendation]:
+  """
+  Recommend indexes for the columns that fact queries look up resources by.
+
+  :param registry: The SQLAlchemy registry containing your models. For example, `Base.registry`.
+  :param inspector: (optional) An [`Inspector`](https://docs.sqlalchemy.org/en/20/core/reflection.html#sqlalchemy.engine.reflection.Inspector)
+    for your database, such as `inspect(engine)`, to check the indexes that actually exist.
+    By default, the indexes declared in your models are checked.
+  :return: The recommended indexes that don't exist yet. An existing index covers a recommendation
+    if its leading columns are the recommended columns.
+  """
+  facts: Dict[Tuple[Table, Tuple[str, ...]], List[str]] = {}
+  for fact, table, columns in _lookups(registry):
+    facts.setdefault((table, columns), [])
+    if fact not in facts[(table, columns)]:
+      facts[(table, columns)].append(fact)
+
+  existing: Dict[Table, Set[Tuple[str, ...]]] = {}
+  recommendations = []
+  for (table, columns), table_facts in facts.items():
+    if table not in existing:
+      existing[table] = _existing_indexes(table, inspector)
+    if any(index[:len(columns)] == columns for index in existing[table]):
+      continue
+    indexed = any(index[:1] == columns[:1] for index in existing[table])
+    recommendations.append(IndexRecommendation(table, columns, tuple(table_facts), indexed))
+  return recommendations
+
+def to_ddl(recommendations: Sequence[IndexRecommendation], dialect: Optional[Dialect] = None, concurrently: bool = False) -> str:
+  """
+  Render `CREATE INDEX` statements for recommended indexes.
+
+  :param recommendations: The recommendations from `recommend_indexes`.
+  :param dialect: (optional) The dialect to render the statements for.
+  :param concurrently: (optional) On PostgreSQL, create the indexes with `CREATE INDEX CONCURRENTLY`,
+    which doesn't lock the table against writes.
+  """
+  statements = []
+  for recommendation in recommendations:
+    index = recommendation.to_index()
+    if concurrently:
+      index.dialect_options["postgresql"]["concurrently"] = True
+    statements.append(f"{CreateIndex(index).compile(dialect=dialect)};")
+  return "\n".join(statements)
+
+def to_alembic(recommendations: Sequence[IndexRecommendation]) -> str:
+  """
+  Render the `upgrade` and `downgrade` functions of an [Alembic](https://alembic.sqlalchemy.org/) migration
+  that creates the recommended indexes.
+
+  :param recommendations: The recommendations from `recommend_indexes`.
+  """
+  upgrade = [
+    f"    op.create_index({recommendation.name!r}, {recommendation.table.name!r}, {list(recommendation.columns)!r}"
+    + (f", schema={recommendation.table.schema!r}" if recommendation.table.schema else "")
+    + ")"
+    for recommendation in recommendations
+  ]
+  downgrade = [
+    f"    op.drop_index({recommendation.name!r}, table_name={recommendation.table.name!r}"
+    + (f", schema={recommendation.table.schema!r}" if recommendation.table.schema else "")
+    + ")"
+    for recommendation in reversed(recommendations)
+  ]
+  return "\n".join([
+    "def upgrade():",
+    *(upgrade or ["    pass"]),
+    "",
+    "",
+    "def downgrade():",
+    *(downgrade or ["    pass"]),
+  ])
+
+def _load_registry(path: str) -> registry:
+  module_name, _, attr = path.partition(":")
+  target = getattr(importlib.import_module(module_name), attr or "Base")
+  return target if isinstance(target, registry) else target.registry
+
+def main(argv: Optional[Sequence[str]] = None):
+  parser = argparse.ArgumentParser(
+    prog="python -m sqlalchemy_oso_cloud.advisor",
+    description="Recommend indexes for the columns that Oso Cloud fact queries look up resources by.",
+  )
+  parser.add_argument("registry", help="the declarative base or registry of your models, as module:attribute (default attribute: Base)")
+  parser.add_argument("--database-url", help="check the indexes in this database instead of the ones declared in your models")
+  parser.add_argument("--format", choices=["text", "ddl", "alembic"], default="text", help="output format (default: text)")
+  parser.add_argument("--concurrently", action="store_true", help="with --format ddl, use CREATE INDEX CONCURRENTLY on PostgreSQL")
+  args = parser.parse_args(argv)
+
+  engine = create_engine(args.database_url) if args.database_url else None
+  recommendations = recommend_indexes(_load_registry(args.registry), inspect(engine) if engine is not None else None)
+  if args.format == "ddl":
+    print(to_ddl(recommendations, engine.dialect if engine is not None else None, args.concurrently))
+  elif args.format == "alembic":
+    print(to_alembic(recommendations))
+  else:
+    for recommendation in recommendations:
+      problem = "slow lookup" if recommendation.indexed else "full scan"
+      print(f"{recommendation.table.name}({', '.join(recommendation.columns)}): {problem} for {', '.join(recommendation.facts)}")
+    if not recommendations:
+      print("All fact lookups are indexed.")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,92 @@
+"""
+[asyncio](https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html) support.
+
+Use `AsyncSession` with `init(defer_authorization=True)` and authorized statements
+fetch their filters from Oso Cloud without blocking the event loop:
+
+    async with AsyncSession(engine) as session:
+        stmt = select(Document).authorized(user, "read")
+        documents = (await session.scalars(stmt)).all()
+
+Without deferred authorization, use `await stmt.authorized_async(user, "read")` instead.
+
+Requires SQLAlchemy's asyncio dependencies, e.g. `pip install sqlalchemy[asyncio]`.
+"""
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, List, TypeVar
+
+import sqlalchemy
+import sqlalchemy.ext.asyncio
+
+from .auth import (
+  Actions,
+  _authorization_requests,
+  _authorize_models_async,
+  _authorize_objects,
+  _expunge_chunk,
+  _stream_chunk,
+  _stream_key,
+)
+from .session import Session
+
+if TYPE_CHECKING:
+  from oso_cloud import Value
+
+T = TypeVar("T")
+
+__all__ = ["AsyncSession"]
+
+
+class _AsyncSyncSession(Session):
+  """
+  The `.Session` that an `AsyncSession` runs its statements with.
+  It awaits deferred authorization filters instead of blocking the event loop.
+  """
+  _await_filters = True
+
+
+class AsyncSession(sqlalchemy.ext.asyncio.AsyncSession):
+  """
+  An extension of SQLAlchemy's
+  [`sqlalchemy.ext.asyncio.AsyncSession`](https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html#sqlalchemy.ext.asyncio.AsyncSession)
+  that resolves deferred authorization without blocking the event loop.
+
+  Accepts all of the same arguments as
+  [`sqlalchemy.ext.asyncio.AsyncSession`](https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html#sqlalchemy.ext.asyncio.AsyncSession),
+  except for `sync_session_class`.
+  """
+  sync_session_class = _AsyncSyncSession
+
+  def __init__(self, *args, **kwargs):
+    if "sync_session_class" in kwargs:
+      raise ValueError("sqlalchemy_oso_cloud does not currently support combining with other session classes")
+    super().__init__(*args, **kwargs)
+
+  async def authorize_objects(self, actor: "Value", action: str, objects: Iterable[T]) -> List[T]:
+    """
+    Filter instances that have already been loaded down to the ones an actor is authorized for.
+    See `.Session.authorize_objects`.
+    """
+    return await self.run_sync(_authorize_objects, actor, action, list(objects))
+
+  async def stream_authorized(
+    self,
+    statement: sqlalchemy.Select,
+    actor: "Value",
+    action: Actions,
+    chunk_size: int = 1000,
+  ) -> AsyncIterator[Any]:
+    """
+    Iterate over every authorized result of a statement with bounded memory.
+    See `.Session.stream_authorized`.
+    """
+    key = _stream_key(statement, chunk_size)
+    requests = _authorization_requests(statement, actor, action)
+    statement = statement.options(*await _authorize_models_async(requests, self.sync_session))
+    after = None
+    while True:
+      chunk, after = await self.run_sync(_stream_chunk, statement, key, after, chunk_size)
+      for item in chunk:
+        yield item
+      _expunge_chunk(self.sync_session, chunk)
+      if after is None:
+        return
@@ -1,13 +1,75 @@
-from typing import TYPE_CHECKING, Callable, List, Optional, Set, Type, Union
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import chain
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
-from oso_cloud import Value
-from sqlalchemy import ColumnClause, literal_column
-from sqlalchemy.orm import LoaderCriteriaOption, with_loader_criteria
+import sqlalchemy.orm
+from sqlalchemy import ClauseElement, ColumnElement, Executable, Result, event
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import (
+    InstanceState,
+    LoaderCriteriaOption,
+    ORMExecuteState,
+    UserDefinedOption,
+    with_loader_criteria,
+)
+from sqlalchemy.orm.attributes import instance_state
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlalchemy.orm.loading import merge_frozen_result
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.types import Boolean
+from sqlalchemy.util import await_only
 
+from .cache import FilterKey
+from .filters import filter_expression
+from .instrumentation import (
+    Authorization,
+    Execution,
+    FilterFetch,
+    _filters_fetched,
+    _listeners_for,
+    _statement_executed,
+)
 from .orm import Resource
-from .oso import get_oso
+from .oso import (
+    get_async_oso,
+    get_authorization_table,
+    get_circuit_breaker,
+    get_filter_cache,
+    get_oso,
+    get_planner,
+    get_result_cache,
+    is_authorization_deferred,
+)
+from .planner import CANDIDATES, FILTER
 
 if TYPE_CHECKING:
+    from oso_cloud import Value
+
+    from .dml_impl import Delete, Update
     from .query import Query
     from .select_impl import Select
 
@@ -24,22 +86,314 @@ def extract_unique_models(column_descriptions) -> Set[Type]:
     return models
 
 
-def create_auth_criteria_for_model(model: Type, actor: Value, action: str) -> Callable:
+E = TypeVar("E", bound=Executable)
+T = TypeVar("T")
+Q = TypeVar("Q", bound=Union["Query", "Select"])
+Statement = Union["Query", sqlalchemy.Select, "Update", "Delete"]
+
+AuthorizationRequest = Tuple[Type, "Value", str]
+"""A model, and the actor and action to authorize on it."""
+
+_MAX_CONCURRENT_FETCHES = 8
+
+_MAX_IDENTITY_PARAMETERS = 10000
+"""
+How many primary key values `_authorized_identities` binds per query. Databases limit the parameters
+of a statement (SQLite to 32766, PostgreSQL's protocol and asyncpg to 32767), and the filter needs some too.
+"""
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_MAX_CONCURRENT_FETCHES,
+                thread_name_prefix="sqlalchemy_oso_cloud"
+            )
+        return _executor
+
+
+# Filters being fetched from Oso Cloud, so that concurrent fetches of the same filter are only made once.
+# Async fetches are tracked per event loop, since their futures belong to a loop.
+# Each fetch is tracked with the filter cache generation it started in (see `_cache_generation`).
+_in_flight: Dict[FilterKey, Tuple["Future[Tuple[str, float]]", Optional[int]]] = {}
+_in_flight_lock = Lock()
+_in_flight_async: Dict[Tuple[asyncio.AbstractEventLoop, FilterKey], Tuple["asyncio.Future[Tuple[str, float]]", Optional[int]]] = {}
+
+
+def _filter_key(model: Type, actor: "Value", action: str) -> FilterKey:
+    return FilterKey(actor, action, model.__name__, f"{model.__tablename__}.id")
+
+
+def _cache_generation() -> Optional[int]:
+    """
+    The generation of the filter cache, which changes whenever filters are invalidated,
+    or `None` if filters aren't cached.
+    """
+    cache = get_filter_cache()
+    return None if cache is None else cache._generation
+
+
+def _cache_filter(key: FilterKey, sql_filter: str, generation: Optional[int]) -> str:
+    """Cache a filter, unless filters were invalidated since it started being fetched in `generation`."""
+    cache = get_filter_cache()
+    if cache is not None:
+        cache._set(key, sql_filter, generation)
+    return sql_filter
+
+
+def _list_local(key: FilterKey) -> Tuple[str, float]:
+    """
+    Fetch a filter from Oso Cloud, and cache it if a filter cache is configured.
+
+    Concurrent fetches of the same filter are coalesced: the first one calls Oso Cloud,
+    and the others wait for its result. A fetch that started before filters were invalidated
+    isn't joined, since its filter may predate the invalidation.
+
+    :return: The filter, and how many seconds it took to fetch.
+    """
+    generation = _cache_generation()
+    with _in_flight_lock:
+        in_flight = _in_flight.get(key)
+        if in_flight is not None and in_flight[1] == generation:
+            future, leader = in_flight[0], False
+        else:
+            future, leader = Future(), True
+            _in_flight[key] = (future, generation)
+    if not leader:
+        start = time.perf_counter()
+        sql_filter, _ = future.result()
+        return sql_filter, time.perf_counter() - start
+
+    try:
+        result = _list_local_uncoalesced(key, generation)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            if _in_flight.get(key, (None, None))[0] is future:
+                del _in_flight[key]
+
+
+def _list_local_uncoalesced(key: FilterKey, generation: Optional[int] = None) -> Tuple[str, float]:
+    """
+    :param generation: The filter cache generation the fetch started in. Defaults to the current one.
+    """
+    if generation is None:
+        generation = _cache_generation()
+    breaker = get_circuit_breaker()
+    start = time.perf_counter()
+    with breaker._call() if breaker is not None else nullcontext():
+        sql_filter = get_oso().list_local(
+            actor=key.actor,
+            action=key.action,
+            resource_type=key.resource_type,
+            column=key.column
+        )
+    return _cache_filter(key, sql_filter, generation), time.perf_counter() - start
+
+
+async def _list_local_async(key: FilterKey) -> Tuple[str, float]:
+    """Like `_list_local`, but awaits Oso Cloud instead of blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    generation = _cache_generation()
+    while True:
+        in_flight = _in_flight_async.get((loop, key))
+        if in_flight is None or in_flight[1] != generation:
+            break
+        future = in_flight[0]
+        start = time.perf_counter()
+        try:
+            sql_filter, _ = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # The fetch we were waiting for was cancelled, so fetch it ourselves.
+            continue
+        return sql_filter, time.perf_counter() - start
+
+    future = loop.create_future()
+    _in_flight_async[(loop, key)] = (future, generation)
+    try:
+        result = await _list_local_async_uncoalesced(key, generation)
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved, in case nothing was waiting for it.
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if _in_flight_async.get((loop, key), (None, None))[0] is future:
+            del _in_flight_async[(loop, key)]
+
+
+async def _list_local_async_uncoalesced(key: FilterKey, generation: Optional[int] = None) -> Tuple[str, float]:
+    if generation is None:
+        generation = _cache_generation()
+    breaker = get_circuit_breaker()
+    start = time.perf_counter()
+    with breaker._call() if breaker is not None else nullcontext():
+        sql_filter = await get_async_oso().list_local(
+            actor=key.actor,
+            action=key.action,
+            resource_type=key.resource_type,
+            column=key.column
+        )
+    return _cache_filter(key, sql_filter, generation), time.perf_counter() - start
+
+
+def _refresh(key: FilterKey):
+    """Refetch a stale filter in the background."""
+    cache = get_filter_cache()
+    assert cache is not None
+    try:
+        _list_local(key)
+    except Exception:
+        cache._end_refresh(key, False)
+    else:
+        cache._end_refresh(key, True)
+
+
+def _refresh_in_background(keys: Sequence[FilterKey]):
+    cache = get_filter_cache()
+    assert cache is not None
+    for key in keys:
+        if cache._begin_refresh(key):
+            _get_executor().submit(_refresh, key)
+
+
+def _cached_filters(keys: List[FilterKey]) -> Tuple[Dict[FilterKey, str], List[FilterKey], Set[FilterKey]]:
+    """
+    Look up filters in the filter cache, returning the filters found, the keys that missed,
+    and the keys whose filters were stale. Stale filters are refreshed in the background.
+    """
+    filters: Dict[FilterKey, str] = {}
+    cache = get_filter_cache()
+
+    misses = []
+    stale: Set[FilterKey] = set()
+    for key in dict.fromkeys(keys):
+        cached, is_stale = cache._lookup(key) if cache is not None else (None, False)
+        if cached is None:
+            misses.append(key)
+        else:
+            filters[key] = cached
+            if is_stale:
+                stale.add(key)
+    if stale:
+        _refresh_in_background(list(stale))
+    return filters, misses, stale
+
+
+def _fetch(key: FilterKey, sql_filter: str, duration: float, cache_hit: bool, stale: bool = False) -> FilterFetch:
+    return FilterFetch(key.resource_type, key.action, duration, len(sql_filter.encode()), cache_hit, stale)
+
+
+def _fetch_filters(requests: Sequence[AuthorizationRequest]) -> Tuple[List[str], Authorization]:
+    """Fetch the `list_local` filters for several models, and describe how they were fetched"""
+    start = time.perf_counter()
+    keys = [_filter_key(model, actor, action) for model, actor, action in requests]
+    filters, misses, stale = _cached_filters(keys)
+    fetches = [_fetch(key, sql_filter, 0.0, True, key in stale) for key, sql_filter in filters.items()]
+
+    fetched: List[Tuple[str, float]] = []
+    if len(misses) == 1:
+        fetched = [_list_local(misses[0])]
+    elif misses:
+        fetched = list(_get_executor().map(_list_local, misses))
+    for key, (sql_filter, duration) in zip(misses, fetched):
+        filters[key] = sql_filter
+        fetches.append(_fetch(key, sql_filter, duration, False))
+
+    authorization = Authorization(len(requests), tuple(fetches), time.perf_counter() - start)
+    return [filters[key] for key in keys], authorization
+
+
+async def _fetch_filters_async(requests: Sequence[AuthorizationRequest]) -> Tuple[List[str], Authorization]:
+    """Like `_fetch_filters`, but awaits Oso Cloud instead of blocking the event loop"""
+    start = time.perf_counter()
+    keys = [_filter_key(model, actor, action) for model, actor, action in requests]
+    filters, misses, stale = _cached_filters(keys)
+    fetches = [_fetch(key, sql_filter, 0.0, True, key in stale) for key, sql_filter in filters.items()]
+
+    fetched = await asyncio.gather(*[_list_local_async(key) for key in misses])
+    for key, (sql_filter, duration) in zip(misses, fetched):
+        filters[key] = sql_filter
+        fetches.append(_fetch(key, sql_filter, duration, False))
+
+    authorization = Authorization(len(requests), tuple(fetches), time.perf_counter() - start)
+    return [filters[key] for key in keys], authorization
+
+
+def fetch_filters(requests: Sequence[AuthorizationRequest]) -> List[str]:
+    """
+    Fetch the `list_local` filters for several models at once.
+
+    Identical requests are only fetched once, cached filters are reused,
+    and the remaining filters are fetched from Oso Cloud concurrently.
+
+    :param requests: The models to fetch filters for, with the actor and action to authorize on each.
+    :return: The filters, in the same order as `requests`.
+    """
+    return _fetch_filters(requests)[0]
+
+
+async def fetch_filters_async(requests: Sequence[AuthorizationRequest]) -> List[str]:
+    """
+    Like `fetch_filters`, but awaits Oso Cloud instead of blocking the event loop.
+    """
+    return (await _fetch_filters_async(requests))[0]
+
+
+def fetch_filter(model: Type, actor: "Value", action: str) -> str:
+    """Fetch the `list_local` filter for a model, consulting the filter cache if one is configured"""
+    return fetch_filters([(model, actor, action)])[0]
+
+
+def _fetch_filter_uncached(model: Type, actor: "Value", action: str) -> str:
+    """
+    Fetch a filter from Oso Cloud, bypassing the filter cache and any fetch of it already in flight,
+    either of which may return a filter from before facts were written.
+    """
+    return _list_local_uncoalesced(_filter_key(model, actor, action))[0]
+
+
+def _criteria_for_expression(criteria: ColumnElement[bool]) -> Callable:
+    return lambda cls: criteria
+
+
+def _criteria_for_filter(sql_filter: str) -> Callable:
+    return _criteria_for_expression(filter_expression(sql_filter))
+
+
+def create_auth_criteria_for_model(model: Type, actor: "Value", action: str) -> Callable:
     """Create authorization criteria for a specific model"""
-    oso = get_oso()
-    
-    sql_filter = oso.list_local(
-        actor=actor,
-        action=action,
-        resource_type=model.__name__,
-        column=f"{model.__tablename__}.id"
-    )
+    sql_filter = fetch_filter(model, actor, action)
     
-    criteria: ColumnClause = literal_column(sql_filter)
-    return lambda cls: criteria
+    return _criteria_for_filter(sql_filter)
 
 
-def authorized(actor: Value, action: str, model: Type) -> LoaderCriteriaOption:
+def _validate_model(model: Type):
+    if not model:
+        raise ValueError("Must provide a model to authorize against.")
+   
+    if not issubclass(model, Resource):
+        raise ValueError(f"Model {model.__name__} must inherit from Resource to use authorization")
+
+
+def authorized(actor: "Value", action: str, model: Type) -> LoaderCriteriaOption:
     """
     Create authorization options for use with .options()
     
@@ -62,12 +416,7 @@ def authorized(actor: Value, action: str, model: Type) -> LoaderCriteriaOption:
     :return: List of loader criteria options for use with .options()
     """
     
-    if not model:
-        raise ValueError("Must provide a model to authorize against.")
-   
-    if not issubclass(model, Resource):
-        raise ValueError(f"Model {model.__name__} must inherit from Resource to use authorization")
-
+    _validate_model(model)
     
     auth_criteria = create_auth_criteria_for_model(model, actor, action)
 
@@ -79,38 +428,784 @@ def authorized(actor: Value, action: str, model: Type) -> LoaderCriteriaOption:
     
 
 
-def _authorize_all_models(query_obj: Union["Query", "Select"], actor: Value, action: str) -> List[LoaderCriteriaOption]:
+def _criteria_options(requests: Sequence[AuthorizationRequest], sql_filters: List[str]) -> List[LoaderCriteriaOption]:
+    return [
+        with_loader_criteria(
+            model,
+            _criteria_for_filter(sql_filter),
+            include_aliases=True
+        )
+        for (model, _, _), sql_filter in zip(requests, sql_filters)
+    ]
+
+
+def _materialized_criteria(requests: Sequence[AuthorizationRequest]) -> List[Optional[Callable]]:
     """
-    Create authorization options for all Resource models in a query.
+    The criteria of the requests whose authorizations are fresh in the `.AuthorizationTable` passed to `.init`.
 
-    :param query_obj: The query object to extract models from
-    :param actor: The actor performing the action
-    :param action: The action to authorize
-    :return: List of authorization options for all Resource models
+    :return: One entry per request: its criteria, or `None` if its filter must be fetched.
+    """
+    table = get_authorization_table()
+    if table is None:
+        return [None] * len(requests)
+    materialized: List[Optional[Callable]] = []
+    for model, actor, action in requests:
+        if table.is_fresh(actor, action, model):
+            materialized.append(_criteria_for_expression(table._criteria(model, actor, action)))
+        else:
+            materialized.append(None)
+    return materialized
+
+
+def _combined_options(
+    requests: Sequence[AuthorizationRequest],
+    materialized: List[Optional[Callable]],
+    sql_filters: List[str],
+) -> List[LoaderCriteriaOption]:
+    """Authorization options for every request, in order, from its materialized criteria or its fetched filter"""
+    fetched = iter(_criteria_options([request for request, criteria in zip(requests, materialized) if criteria is None], sql_filters))
+    return [
+        next(fetched) if criteria is None else with_loader_criteria(model, criteria, include_aliases=True)
+        for (model, _, _), criteria in zip(requests, materialized)
+    ]
+
+
+def _authorize_models(requests: Sequence[AuthorizationRequest], session: Optional[sqlalchemy.orm.Session] = None) -> List[ORMOption]:
+    """
+    Create authorization options for several models, fetching all of their filters in one step.
+
+    :param requests: The models to authorize, with the actor and action to authorize on each.
+    :param session: The session executing the statement, if the filters are fetched during execution.
+    :return: List of authorization options, one per request, followed by an `AuthorizationReport`.
+    """
+    for model, _, _ in requests:
+        _validate_model(model)
+
+    materialized = _materialized_criteria(requests)
+    fetched = [request for request, criteria in zip(requests, materialized) if criteria is None]
+    sql_filters, authorization = _fetch_filters(fetched)
+    authorization = authorization._replace(models=len(requests))
+    _filters_fetched(session, authorization)
+    return [*_combined_options(requests, materialized, sql_filters), AuthorizationReport(authorization)]
+
+
+async def _authorize_models_async(requests: Sequence[AuthorizationRequest], session: Optional[sqlalchemy.orm.Session] = None) -> List[ORMOption]:
+    """
+    Like `_authorize_models`, but awaits Oso Cloud instead of blocking the event loop.
+    """
+    for model, _, _ in requests:
+        _validate_model(model)
+
+    materialized = _materialized_criteria(requests)
+    fetched = [request for request, criteria in zip(requests, materialized) if criteria is None]
+    sql_filters, authorization = await _fetch_filters_async(fetched)
+    authorization = authorization._replace(models=len(requests))
+    _filters_fetched(session, authorization)
+    return [*_combined_options(requests, materialized, sql_filters), AuthorizationReport(authorization)]
+
+
+def _statement_models(query_obj: Union["Query", sqlalchemy.Select]) -> Set[Type]:
+    """Extract all models from every part of a statement: its FROM clauses, joins and subqueries"""
+    statement = query_obj.statement if isinstance(query_obj, sqlalchemy.orm.Query) else query_obj
+    models = set()
+    for element in visitors.iterate(statement):
+        entity = getattr(element, "_annotations", {}).get("parententity")
+        if entity is not None:
+            models.add(entity.mapper.class_)
+    return models
+
+
+def _resource_models(query_obj: Statement) -> List[Type]:
     """
-    models = extract_unique_models(query_obj.column_descriptions)
-    auth_options = []
+    Find the Resource models in a query.
 
-    for model in models:
-        if issubclass(model, Resource):
-            auth_options.append(authorized(actor, action, model))
+    The models that the query selects are authorized. If it selects none, such as
+    `select(func.count()).select_from(Document)` or a select from a subquery,
+    the models in its FROM clauses, joins and subqueries are authorized instead.
+    For an `UPDATE` or `DELETE`, the model being updated or deleted is authorized.
 
-    if not auth_options:
+    :param query_obj: The query object to extract models from
+    :return: The Resource models in the query
+    """
+    if isinstance(query_obj, (sqlalchemy.Update, sqlalchemy.Delete)):
+        entity = query_obj.entity_description.get("entity")
+        models = [entity] if isinstance(entity, type) and issubclass(entity, Resource) else []
+    else:
+        models = [
+            model for model in extract_unique_models(query_obj.column_descriptions)
+            if issubclass(model, Resource)
+        ]
+        if not models:
+            models = [model for model in _statement_models(query_obj) if issubclass(model, Resource)]
+
+    if not models:
         raise ValueError("No Resource models found in query to authorize")
 
-    return auth_options
+    return models
+
+
+class DeferredAuthorization(UserDefinedOption):
+    """
+    Records the models, actor and action a statement should be authorized for,
+    without fetching any filters from Oso Cloud.
+
+    The filters are fetched and applied when the statement is executed by an ORM `Session`.
+    Until then, the statement is filtered on `_UnresolvedAuthorization`, which can't be compiled.
+    """
+
+    payload: Tuple[AuthorizationRequest, ...]
+
+
+class _UnresolvedAuthorization(ColumnElement[bool]):
+    """
+    The criteria a deferred statement is filtered on until its filters are fetched.
+
+    Sessions replace it with the fetched filters before executing the statement.
+    Anything else that compiles the statement, such as `Connection.execute` or `str()`, fails
+    instead of running it without its filters.
+    """
+
+    inherit_cache = True
+    type = Boolean()
+    _traverse_internals = []
+
+
+@compiles(_UnresolvedAuthorization)
+def _compile_unresolved_authorization(element: _UnresolvedAuthorization, compiler: SQLCompiler, **kwargs) -> str:
+    raise CompileError(
+        "Cannot compile a statement whose authorization is deferred: its filters are only fetched "
+        "when it is executed by an ORM Session. Execute it with a Session, or build it without defer_authorization."
+    )
+
+
+def _unresolved_options(requests: Sequence[AuthorizationRequest]) -> List[LoaderCriteriaOption]:
+    return [
+        with_loader_criteria(model, _UnresolvedAuthorization(), include_aliases=True)
+        for model, _, _ in requests
+    ]
+
+
+def _without_unresolved(statement: E) -> E:
+    """The statement without the `_UnresolvedAuthorization` criteria of its deferred authorization, if any."""
+    options = tuple(
+        option for option in statement._with_options
+        if not (isinstance(option, LoaderCriteriaOption) and isinstance(option.where_criteria, _UnresolvedAuthorization))
+    )
+    if len(options) == len(statement._with_options):
+        return statement
+    generated = cast(Any, statement)._generate()
+    generated._with_options = options
+    return cast(E, generated)
+
+
+class AuthorizationReport(UserDefinedOption):
+    """
+    Records how the filters applied to a statement were fetched, for `.instrumentation` listeners.
+    """
+
+    payload: Authorization
+
+
+def _resolve_deferred(statement: E, session: sqlalchemy.orm.Session) -> E:
+    """
+    Fetch and apply the filters recorded by `DeferredAuthorization` options on a statement.
+
+    Sessions run by an `AsyncSession` from `.asyncio` await the filters
+    instead of blocking the event loop.
+
+    :return: The statement with its filters applied, or `statement` itself if it has no deferred authorization.
+    """
+    requests = [
+        request
+        for option in statement._with_options
+        if isinstance(option, DeferredAuthorization)
+        for request in option.payload
+    ]
+    if not requests:
+        return statement
+    return _without_unresolved(statement).options(*_authorize_models_in_session(requests, session))
+
+
+def _authorize_models_in_session(requests: Sequence[AuthorizationRequest], session: sqlalchemy.orm.Session) -> List[ORMOption]:
+    """
+    Like `_authorize_models`, for statements a session is about to execute.
+    Sessions run by an `AsyncSession` from `.asyncio` await the filters instead of blocking the event loop.
+    """
+    if getattr(session, "_await_filters", False):
+        return await_only(_authorize_models_async(requests, session))
+    return _authorize_models(requests, session)
+
+
+def _resolve_deferred_authorization(orm_execute_state: ORMExecuteState):
+    """
+    Fetch and apply the filters recorded by `DeferredAuthorization` options
+    just before a statement is executed.
+    """
+    orm_execute_state.statement = _resolve_deferred(orm_execute_state.statement, orm_execute_state.session)
+
+
+def _instrument_execution(orm_execute_state: ORMExecuteState) -> Optional[Result]:
+    """
+    Time the execution of an authorized statement, if any `.instrumentation` listeners are registered.
+    """
+    listeners = _listeners_for(orm_execute_state.session)
+    if not listeners:
+        return None
+    authorizations = tuple(
+        option.payload
+        for option in orm_execute_state.user_defined_options
+        if isinstance(option, AuthorizationReport)
+    )
+    if not authorizations:
+        return None
+    start = time.perf_counter()
+    result = orm_execute_state.invoke_statement()
+    execution = Execution(orm_execute_state.statement, time.perf_counter() - start, authorizations)
+    _statement_executed(orm_execute_state.session, execution)
+    return result
+
+
+def _plannable_rows(statement: Executable, model: Type) -> Optional[int]:
+    """
+    The number of rows a statement needs (its `LIMIT` plus its `OFFSET`),
+    if it can be authorized with the `candidates` strategy of an `.AuthorizationPlanner`.
+    """
+    if not isinstance(statement, sqlalchemy.Select) or statement._limit is None:
+        return None
+    if statement._group_by_clauses or statement._having_criteria or statement._distinct:
+        return None
+    if not all(isinstance(option, UserDefinedOption) for option in statement._with_options):
+        return None
+    if model not in (description["entity"] for description in statement.column_descriptions):
+        return None
+    return statement._limit + (statement._offset or 0)
 
 
-def _apply_authorization_options(query_obj: Union["Query",  "Select"], actor: Value, action: str, model: Optional[Type] = None):
+def _execute_with_candidates(
+    orm_execute_state: ORMExecuteState,
+    request: AuthorizationRequest,
+    rows: int,
+    candidates: int,
+) -> Tuple[Optional[Result], int, int]:
+    """
+    Run a deferred statement without its filter to fetch candidate rows, check which candidates are authorized,
+    and run it again restricted to the authorized candidates.
+
+    :return: The result, or `None` if too few candidates were authorized,
+      with the number of candidates fetched and the number authorized.
+    """
+    model, actor, action = request
+    statement = orm_execute_state.statement
+    assert isinstance(statement, sqlalchemy.Select)
+    # Candidates are fetched without the filter, and the statement is then restricted to the authorized ones.
+    statement = _without_unresolved(statement)
+    mapper = sqlalchemy.inspect(model)
+    primary_key = [getattr(model, mapper.get_property_by_column(column).key) for column in mapper.primary_key]
+
+    candidate_statement = statement.with_only_columns(*primary_key).limit(candidates).offset(None)
+    identities = {tuple(row): None for row in orm_execute_state.invoke_statement(statement=candidate_statement)}
+    if not identities:
+        return orm_execute_state.invoke_statement(statement=statement.where(sqlalchemy.false())), 0, 0
+
+    authorized = [
+        identity for candidate_model, identity
+        in _authorized_identities(orm_execute_state.session, actor, action, {model: identities})
+        if candidate_model is model
+    ]
+    if len(authorized) < rows and len(identities) == candidates:
+        # Too few candidates were authorized, and there may be authorized rows beyond them.
+        return None, len(identities), len(authorized)
+    if not authorized:
+        restricted = statement.where(sqlalchemy.false())
+    else:
+        restricted = statement.where(_primary_key_in(model, authorized))
+    return orm_execute_state.invoke_statement(statement=restricted), len(identities), len(authorized)
+
+
+def _plan_authorization(orm_execute_state: ORMExecuteState) -> Optional[Result]:
+    """
+    Authorize a deferred statement with the strategy chosen by the `.AuthorizationPlanner` passed to `.init`, if any.
+
+    :return: The result, or `None` if the statement should be authorized with its filter as usual.
+    """
+    planner = get_planner()
+    statement = orm_execute_state.statement
+    if planner is None or not orm_execute_state.is_select:
+        return None
+    requests = [
+        request
+        for option in statement._with_options
+        if isinstance(option, DeferredAuthorization)
+        for request in option.payload
+    ]
+    if len(requests) != 1:
+        return None
+    model, _, action = requests[0]
+    rows = _plannable_rows(statement, model)
+    if rows is None:
+        return None
+
+    strategy, candidates = planner.choose(model.__name__, action, rows)
+    start = time.perf_counter()
+    if strategy == CANDIDATES:
+        result, fetched, authorized = _execute_with_candidates(orm_execute_state, requests[0], rows, candidates)
+        if result is None:
+            _resolve_deferred_authorization(orm_execute_state)
+            result = _instrument_execution(orm_execute_state) or orm_execute_state.invoke_statement()
+        planner.record(model.__name__, action, CANDIDATES, time.perf_counter() - start, fetched, authorized)
+    else:
+        _resolve_deferred_authorization(orm_execute_state)
+        result = _instrument_execution(orm_execute_state) or orm_execute_state.invoke_statement()
+        planner.record(model.__name__, action, FILTER, time.perf_counter() - start)
+    return result
+
+
+_WRITTEN_TABLES = "sqlalchemy_oso_cloud_written_tables"
+"""The `Session.info` key of the tables a session has written to in its current transaction."""
+
+
+def _tracks_writes() -> bool:
+    """Whether a feature that is invalidated by writes, a `.ResultCache` or an `.AuthorizationTable`, is configured."""
+    return get_result_cache() is not None or get_authorization_table() is not None
+
+
+def _record_writes(session: sqlalchemy.orm.Session, tables: Iterable[str]):
+    """
+    Remember the tables a session wrote to, to invalidate the results read from them
+    and the authorizations materialized from them when it commits.
+    """
+    if _tracks_writes():
+        session.info.setdefault(_WRITTEN_TABLES, set()).update(tables)
+
+
+def _after_flush(session: sqlalchemy.orm.Session, flush_context):
+    if not _tracks_writes():
+        return
+    _record_writes(session, {
+        table.fullname
+        for obj in chain(session.new, session.dirty, session.deleted)
+        for table in instance_state(obj).mapper.tables
+    })
+
+
+def _after_commit(session: sqlalchemy.orm.Session):
+    if _WRITTEN_TABLES not in session.info:
+        return
+    tables = session.info.pop(_WRITTEN_TABLES)
+    cache = get_result_cache()
+    if tables and cache is not None:
+        cache.backend.bump(tables)
+    table = get_authorization_table()
+    if tables and table is not None:
+        table._tables_written(tables)
+
+
+def _after_rollback(session: sqlalchemy.orm.Session):
+    session.info.pop(_WRITTEN_TABLES, None)
+
+
+def _statement_tables(statement: ClauseElement) -> FrozenSet[str]:
+    """
+    The tables a statement reads from, including the tables of the relationships of the models it selects,
+    which eager loaders may read from.
+    """
+    tables = {element.fullname for element in visitors.iterate(statement) if isinstance(element, sqlalchemy.TableClause)}
+    for description in getattr(statement, "column_descriptions", ()):
+        entity = description["entity"]
+        if entity is None:
+            continue
+        mapper = sqlalchemy.inspect(entity).mapper
+        tables.update(table.fullname for table in mapper.tables)
+        for relationship in mapper.relationships:
+            tables.update(table.fullname for table in relationship.mapper.tables)
+            if isinstance(relationship.secondary, sqlalchemy.TableClause):
+                tables.add(relationship.secondary.fullname)
+    return frozenset(tables)
+
+
+def _is_authorized(orm_execute_state: ORMExecuteState) -> bool:
+    return any(
+        isinstance(option, (DeferredAuthorization, AuthorizationReport))
+        for option in orm_execute_state.user_defined_options
+    )
+
+
+def _writes(statement: ClauseElement) -> bool:
+    """Whether a statement writes, for example from a data-modifying CTE."""
+    return any(isinstance(element, sqlalchemy.sql.dml.UpdateBase) for element in visitors.iterate(statement))
+
+
+def _database_identity(bind: Union[sqlalchemy.Engine, sqlalchemy.Connection], options: Mapping[str, Any]) -> str:
+    """
+    Identify the database a statement is executed on, so that results cached from one database
+    are never served for another.
+    """
+    engine = bind.engine
+    identity = engine.url.render_as_string(hide_password=True)
+    if engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:"):
+        # Every in-memory SQLite engine is its own database.
+        identity += f"#{id(engine)}"
+    schema_translate_map = options.get("schema_translate_map")
+    if schema_translate_map:
+        identity += repr(sorted(schema_translate_map.items(), key=repr))
+    return identity
+
+
+def _execute_cached(orm_execute_state: ORMExecuteState) -> Optional[Result]:
+    """
+    Serve an authorized `SELECT` from the `.ResultCache` passed to `.init`, or execute and cache it.
+
+    :return: The result, or `None` if the statement should be executed as usual.
+    """
+    cache = get_result_cache()
+    options = orm_execute_state.execution_options
+    if (
+        cache is None
+        or not isinstance(orm_execute_state.statement, sqlalchemy.Select)
+        or orm_execute_state.statement._for_update_arg is not None
+        or orm_execute_state.is_relationship_load
+        or orm_execute_state.is_column_load
+        or not options.get("cache_results", True)
+        or options.get("populate_existing")
+        or options.get("yield_per")
+        or options.get("stream_results")
+        or not _is_authorized(orm_execute_state)
+        or _writes(orm_execute_state.statement)
+    ):
+        return None
+    session = orm_execute_state.session
+    if session.info.get(_WRITTEN_TABLES):
+        # The session can see its own uncommitted writes, which must not be cached or hidden by the cache.
+        cache._count(bypassed=1)
+        return None
+
+    _resolve_deferred_authorization(orm_execute_state)
+    statement = cast(ClauseElement, orm_execute_state.statement)
+    database = _database_identity(session.get_bind(**orm_execute_state.bind_arguments), options)
+    key = cache._key(statement, orm_execute_state.parameters, _statement_tables(statement), database)
+    cached = cache._get(key)
+    if cached is not None:
+        return merge_frozen_result(session, statement, cached, load=False)()
+    result = _instrument_execution(orm_execute_state) or orm_execute_state.invoke_statement()
+    frozen = result.freeze()
+    cache._set(key, frozen)
+    return frozen()
+
+
+def _on_orm_execute(orm_execute_state: ORMExecuteState) -> Optional[Result]:
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if isinstance(table, sqlalchemy.TableClause):
+            _record_writes(orm_execute_state.session, [table.fullname])
+    result = _execute_cached(orm_execute_state)
+    if result is not None:
+        return result
+    result = _plan_authorization(orm_execute_state)
+    if result is not None:
+        return result
+    _resolve_deferred_authorization(orm_execute_state)
+    return _instrument_execution(orm_execute_state)
+
+
+# Listen on every ORM session, not just `.Session`, so that any session can execute a deferred statement.
+# Anything else fails to compile it, because of its `_UnresolvedAuthorization` criteria.
+event.listen(sqlalchemy.orm.Session, "do_orm_execute", _on_orm_execute)
+
+
+def _listen_for_writes():
+    """
+    Track the tables every ORM session writes to, for the features that are invalidated by writes.
+
+    `.init` only calls this when one of them is configured, so that sessions don't pay for it otherwise.
+    """
+    for name, listener in (("after_flush", _after_flush), ("after_commit", _after_commit), ("after_rollback", _after_rollback)):
+        if not event.contains(sqlalchemy.orm.Session, name, listener):
+            event.listen(sqlalchemy.orm.Session, name, listener)
+
+
+Actions = Union[str, Mapping[Type, str]]
+"""An action to authorize on every model, or the action to authorize on each model."""
+
+
+def _authorization_requests(query_obj: Statement, actor: "Value", action: Actions, model: Optional[Type] = None) -> List[AuthorizationRequest]:
+    """
+    The models to authorize a query for, with the actor and action to authorize on each.
+
+    :param action: The action to authorize on every Resource model in the query,
+      or a mapping from model to action, in which case only the models in the mapping are authorized.
+    :param model: (optional) The only model to authorize `action` on.
+    """
+    if not isinstance(action, str):
+        if model is not None:
+            raise ValueError("Cannot specify a model when mapping models to actions.")
+        if not action:
+            raise ValueError("Must provide an action for at least one model.")
+        requests = [(mapped_model, actor, mapped_action) for mapped_model, mapped_action in action.items()]
+    else:
+        models = [model] if model is not None else _resource_models(query_obj)
+        requests = [(authorized_model, actor, action) for authorized_model in models]
+    for authorized_model, _, _ in requests:
+        _validate_model(authorized_model)
+    return requests
+
+
+def _apply_authorization_options(query_obj: Statement, actor: "Value", action: Actions, model: Optional[Type] = None):
     """
     Apply authorization to any query-like object that has column_descriptions and options()
     
-    This works with both Select and Query objects.
+    This works with Select and Query objects, and with ORM-enabled Update and Delete statements.
+    If authorization is deferred (see `.init`), this only records the actor and action,
+    and the filters are fetched when the statement is executed.
+    """
+    requests = _authorization_requests(query_obj, actor, action, model)
+
+    if is_authorization_deferred():
+        return query_obj.options(DeferredAuthorization(tuple(requests)), *_unresolved_options(requests))
+
+    auth_options = _authorize_models(requests)
+    return query_obj.options(*auth_options)
+
+
+async def _apply_authorization_options_async(query_obj: Union["Select", "Update", "Delete"], actor: "Value", action: Actions, model: Optional[Type] = None):
+    """
+    Like `_apply_authorization_options`, but awaits Oso Cloud instead of blocking the event loop.
+    Authorization is never deferred, since fetching the filters no longer blocks.
+    """
+    auth_options = await _authorize_models_async(_authorization_requests(query_obj, actor, action, model))
+    return query_obj.options(*auth_options)
+
+
+def _primary_key_in(model: Type, identities: Sequence[Tuple]) -> ColumnElement[bool]:
+    primary_key = sqlalchemy.inspect(model).primary_key
+    if len(primary_key) == 1:
+        return primary_key[0].in_([identity[0] for identity in identities])
+    return sqlalchemy.tuple_(*primary_key).in_(list(identities))
+
+
+def _authorized_identities(
+    session: sqlalchemy.orm.Session,
+    actor: "Value",
+    action: str,
+    identities: Dict[Type, Dict[Tuple, None]],
+) -> Set[Tuple[Type, Tuple]]:
+    """
+    Check which rows, given by model and primary key, an actor is authorized for,
+    with one query per model that applies the model's filter to just those rows.
+    Models with many rows are checked in chunks, to stay under the database's limit on parameters.
+    """
+    requests = [(model, actor, action) for model in identities]
+    for model, _, _ in requests:
+        _validate_model(model)
+    if getattr(session, "_await_filters", False):
+        sql_filters, authorization = await_only(_fetch_filters_async(requests))
+    else:
+        sql_filters, authorization = _fetch_filters(requests)
+    _filters_fetched(session, authorization)
+
+    permitted: Set[Tuple[Type, Tuple]] = set()
+    for (model, model_identities), sql_filter in zip(identities.items(), sql_filters):
+        primary_key = sqlalchemy.inspect(model).primary_key
+        chunk_size = max(1, _MAX_IDENTITY_PARAMETERS // len(primary_key))
+        model_identity_list = list(model_identities)
+        for start in range(0, len(model_identity_list), chunk_size):
+            statement = (
+                sqlalchemy.select(*primary_key)
+                .where(_primary_key_in(model, model_identity_list[start:start + chunk_size]), filter_expression(sql_filter))
+                .options(AuthorizationReport(authorization))
+            )
+            permitted.update((model, tuple(row)) for row in session.execute(statement))
+    return permitted
+
+
+def _authorize_objects(session: sqlalchemy.orm.Session, actor: "Value", action: str, objects: Sequence[T]) -> List[T]:
+    """
+    Filter loaded instances down to the ones an actor is authorized for,
+    with one query per model instead of one `authorize` call per instance.
+    """
+    identities: Dict[Type, Dict[Tuple, None]] = {}
+    keys = []
+    for obj in objects:
+        state = instance_state(obj)
+        if state.identity is None:
+            raise ValueError(f"Cannot authorize {obj!r}: only persistent instances can be authorized. Flush the session first.")
+        model = state.mapper.class_
+        identities.setdefault(model, {})[state.identity] = None
+        keys.append((model, state.identity))
+    if not identities:
+        return []
+
+    permitted = _authorized_identities(session, actor, action, identities)
+    return [obj for obj, key in zip(objects, keys) if key in permitted]
+
+
+StreamKey = List[Tuple[int, Any]]
+"""The index in a streamed statement's rows of each entity it is paginated on, and the entity."""
+
+
+def _from_leaves(from_clause: sqlalchemy.FromClause) -> Iterator[sqlalchemy.FromClause]:
+    """The tables, aliases and subqueries a FROM clause joins, rejecting outer joins."""
+    if isinstance(from_clause, sqlalchemy.Join):
+        if from_clause.isouter or from_clause.full:
+            raise ValueError("Cannot stream a statement with an outer join: the primary keys it is paginated on may be NULL.")
+        yield from _from_leaves(from_clause.left)
+        yield from _from_leaves(from_clause.right)
+    else:
+        yield from_clause
+
+
+def _stream_key(statement: sqlalchemy.Select, chunk_size: int) -> StreamKey:
+    """
+    The entities a streamed statement is paginated on: every entity it selects.
+
+    The primary keys of the selected entities only identify each row if every table the statement
+    reads from belongs to one of them, since joining any other table can repeat them.
     """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if statement._order_by_clauses or statement._limit_clause is not None or statement._offset_clause is not None:
+        raise ValueError("Cannot stream a statement with ORDER BY, LIMIT or OFFSET: it is paginated by primary key.")
+    key = [
+        (index, description["entity"])
+        for index, description in enumerate(statement.column_descriptions)
+        if description["entity"] is not None and description["expr"] is description["entity"]
+    ]
+    if not any(issubclass(sqlalchemy.inspect(entity).mapper.class_, Resource) for _, entity in key):
+        raise ValueError("Cannot stream a statement that doesn't select a Resource model.")
+    selected = {leaf for _, entity in key for leaf in _from_leaves(sqlalchemy.inspect(entity).selectable)}
+    for from_clause in statement.get_final_froms():
+        for leaf in _from_leaves(from_clause):
+            if leaf not in selected:
+                raise ValueError(
+                    f"Cannot stream a statement that reads from {leaf.description} without selecting its model: "
+                    "its rows may repeat the primary keys they are paginated on."
+                )
+    return key
 
-    if model is not None:
-        auth_option = authorized(actor, action, model)
-        return query_obj.options(auth_option)
+
+def _stream_chunk(
+    session: sqlalchemy.orm.Session,
+    statement: sqlalchemy.Select,
+    key: StreamKey,
+    after: Optional[Tuple],
+    chunk_size: int,
+) -> Tuple[List[Any], Optional[Tuple]]:
+    """
+    Fetch the next chunk of a streamed statement.
+
+    :param statement: The statement, with its authorization options already applied.
+    :param key: The entities to paginate on, from `_stream_key`.
+    :param after: The primary keys of the last row of the previous chunk, or `None` for the first chunk.
+    :return: The rows (or instances, if the statement selects a single model),
+      and the primary keys to fetch the next chunk after, or `None` if this was the last chunk.
+    """
+    columns = [
+        getattr(entity, inspected.mapper.get_property_by_column(column).key)
+        for _, entity in key
+        for inspected in (sqlalchemy.inspect(entity),)
+        for column in inspected.mapper.primary_key
+    ]
+    # Chunks aren't cached, which would defeat iterating with bounded memory.
+    chunk_statement = statement.order_by(*columns).limit(chunk_size).execution_options(cache_results=False)
+    if after is not None:
+        if len(columns) == 1:
+            chunk_statement = chunk_statement.where(columns[0] > after[0])
+        else:
+            chunk_statement = chunk_statement.where(sqlalchemy.tuple_(*columns) > after)
+    rows = session.execute(chunk_statement).all()
+    if len(rows) < chunk_size:
+        last = None
     else:
-        auth_options = _authorize_all_models(query_obj, actor, action)
-        return query_obj.options(*auth_options)
+        last = tuple(value for index, _ in key for value in cast(Tuple, instance_state(rows[-1][index]).identity))
+    if len(statement.column_descriptions) == 1:
+        return [row[0] for row in rows], last
+    return list(rows), last
+
+
+def _expunge_chunk(session: sqlalchemy.orm.Session, chunk: List[Any]):
+    """Remove a streamed chunk's instances from the session, unless they have changes waiting to be flushed."""
+    for item in chunk:
+        for value in (item if isinstance(item, sqlalchemy.Row) else (item,)):
+            state = sqlalchemy.inspect(value, raiseerr=False)
+            if isinstance(state, InstanceState) and state.session_id == session.hash_key and not state.modified:
+                session.expunge(value)
+
+
+def _stream_authorized(
+    session: sqlalchemy.orm.Session,
+    statement: sqlalchemy.Select,
+    actor: "Value",
+    action: Actions,
+    chunk_size: int,
+) -> Iterator[Any]:
+    """
+    Iterate over an authorized statement's results in chunks, paginated by primary key,
+    fetching the authorization filters once.
+    """
+    key = _stream_key(statement, chunk_size)
+    authorized_statement = statement.options(*_authorize_models(_authorization_requests(statement, actor, action), session))
+    after = None
+    while True:
+        chunk, after = _stream_chunk(session, authorized_statement, key, after, chunk_size)
+        yield from chunk
+        _expunge_chunk(session, chunk)
+        if after is None:
+            return
+
+
+PermissionRequests = Tuple[List[AuthorizationRequest], List[AuthorizationRequest]]
+
+
+def _permission_requests(query_obj: Union["Query", "Select"], actor: "Value", actions: Sequence[str], model: Optional[Type]) -> PermissionRequests:
+    """
+    Split a permissions request into the models to filter on the first action,
+    and the model to add a permission column to for each of the other actions.
+    """
+    if isinstance(actions, str) or not actions:
+        raise ValueError("Must provide a list of at least one action.")
+    models = _resource_models(query_obj)
+    if model is None:
+        if len(models) > 1:
+            raise ValueError(
+                f"Query has several Resource models ({', '.join(m.__name__ for m in models)}); "
+                "specify the model to add permission columns for."
+            )
+        model = models[0]
+    _validate_model(model)
+    return [(m, actor, actions[0]) for m in models], [(model, actor, action) for action in actions[1:]]
+
+
+def _permission_column(sql_filter: str, action: str) -> ColumnElement[bool]:
+    return sqlalchemy.case((filter_expression(sql_filter), True), else_=False).label(action)
+
+
+def _apply_permissions(query_obj: Q, requests: PermissionRequests, sql_filters: List[str], authorization: Authorization) -> Q:
+    filter_requests, column_requests = requests
+    _filters_fetched(None, authorization)
+    columns = [
+        _permission_column(sql_filter, action)
+        for (_, _, action), sql_filter in zip(column_requests, sql_filters[len(filter_requests):])
+    ]
+    options = [*_criteria_options(filter_requests, sql_filters[:len(filter_requests)]), AuthorizationReport(authorization)]
+    return cast(Q, query_obj.add_columns(*columns).options(*options))
+
+
+def _apply_permission_columns(query_obj: Q, actor: "Value", actions: Sequence[str], model: Optional[Type] = None) -> Q:
+    """
+    Filter a query on the first action, and add a boolean column for each of the other actions,
+    fetching every filter in one step.
+
+    Unlike `_apply_authorization_options`, this is never deferred,
+    since the columns can't be added to the statement without their filters.
+    """
+    requests = _permission_requests(query_obj, actor, actions, model)
+    sql_filters, authorization = _fetch_filters([*requests[0], *requests[1]])
+    return _apply_permissions(query_obj, requests, sql_filters, authorization)
+
+
+async def _apply_permission_columns_async(query_obj: Q, actor: "Value", actions: Sequence[str], model: Optional[Type] = None) -> Q:
+    """
+    Like `_apply_permission_columns`, but awaits Oso Cloud instead of blocking the event loop.
+    """
+    requests = _permission_requests(query_obj, actor, actions, model)
+    sql_filters, authorization = await _fetch_filters_async([*requests[0], *requests[1]])
+    return _apply_permissions(query_obj, requests, sql_filters, authorization)
@@ -0,0 +1,161 @@
+"""
+A circuit breaker for the filter fetches that `.authorized()` makes to Oso Cloud.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterator, NamedTuple, Tuple
+
+__all__ = ["CircuitBreaker", "CircuitOpenError", "BreakerStats"]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+  """
+  Raised instead of fetching a filter from Oso Cloud while the `CircuitBreaker` is open.
+  """
+
+
+class BreakerStats(NamedTuple):
+  """What a `CircuitBreaker` has seen since it was created."""
+
+  state: str
+  """`closed`, `open` or `half_open`."""
+  successes: int
+  """Filter fetches that succeeded."""
+  failures: int
+  """Filter fetches that failed."""
+  rejected: int
+  """Filter fetches that failed fast because the breaker was open."""
+  opened: int
+  """How many times the breaker has opened."""
+
+
+class CircuitBreaker:
+  """
+  A thread-safe circuit breaker for filter fetches.
+
+  Pass an instance to `.init` to stop waiting on Oso Cloud while it is failing:
+
+      breaker = CircuitBreaker(failure_rate=0.5, minimum_requests=20, window=30, reset_timeout=10)
+      sqlalchemy_oso_cloud.init(Base.registry, filter_cache=FilterCache(ttl=30, stale_ttl=300), circuit_breaker=breaker)
+
+  When at least `failure_rate` of the fetches in the last `window` seconds have failed, the breaker opens,
+  and fetches raise `CircuitOpenError` immediately instead of calling Oso Cloud.
+  Filters that a `.FilterCache` can still serve, including stale ones within its `stale_ttl`, are served as usual.
+  After `reset_timeout` seconds, one fetch is let through: if it succeeds, the breaker closes; otherwise it opens again.
+  """
+
+  def __init__(
+    self,
+    failure_rate: float = 0.5,
+    minimum_requests: int = 20,
+    window: float = 30.0,
+    reset_timeout: float = 10.0,
+  ):
+    """
+    :param failure_rate: The share of failed fetches, between 0 and 1, that opens the breaker.
+    :param minimum_requests: The fewest fetches in `window` for the failure rate to count.
+    :param window: How many seconds of fetches the failure rate is measured over.
+    :param reset_timeout: How many seconds the breaker stays open before letting a fetch through.
+    """
+    if not 0 < failure_rate <= 1:
+      raise ValueError("failure_rate must be greater than 0 and at most 1")
+    self.failure_rate = failure_rate
+    self.minimum_requests = minimum_requests
+    self.window = window
+    self.reset_timeout = reset_timeout
+    self._state = CLOSED
+    self._opened_at = 0.0
+    self._probing = False
+    self._recent: Deque[Tuple[float, bool]] = deque()
+    self._stats = BreakerStats(CLOSED, 0, 0, 0, 0)
+    self._lock = threading.Lock()
+
+  @property
+  def state(self) -> str:
+    """`closed`, `open` or `half_open`."""
+    with self._lock:
+      return self._state
+
+  def stats(self) -> BreakerStats:
+    """
+    The breaker's state, and how many fetches it has seen succeed, fail and fail fast.
+    """
+    with self._lock:
+      return self._stats._replace(state=self._state)
+
+  def _allow(self) -> bool:
+    """
+    Raise `CircuitOpenError` if a fetch may not be made now.
+
+    :return: Whether the fetch is the one let through to probe whether Oso Cloud has recovered.
+    """
+    with self._lock:
+      if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+        self._state = HALF_OPEN
+        self._probing = False
+      if self._state == HALF_OPEN and not self._probing:
+        self._probing = True
+        return True
+      if self._state != CLOSED:
+        self._stats = self._stats._replace(rejected=self._stats.rejected + 1)
+        raise CircuitOpenError("Oso Cloud is failing, so filters are not being fetched")
+      return False
+
+  @contextmanager
+  def _call(self) -> Iterator[None]:
+    """Guard a fetch: raise `CircuitOpenError` if it may not be made, and record its outcome."""
+    probe = self._allow()
+    try:
+      yield
+    except Exception:
+      self._record(False)
+      raise
+    else:
+      self._record(True)
+    finally:
+      if probe:
+        with self._lock:
+          if self._state == HALF_OPEN:
+            # The probe ended without an outcome, such as by `KeyboardInterrupt` or cancellation,
+            # so let the next fetch probe instead.
+            self._probing = False
+
+  def _record(self, succeeded: bool):
+    """Record the outcome of a fetch that `_allow` let through."""
+    now = time.monotonic()
+    with self._lock:
+      if succeeded:
+        self._stats = self._stats._replace(successes=self._stats.successes + 1)
+      else:
+        self._stats = self._stats._replace(failures=self._stats.failures + 1)
+
+      if self._state == OPEN:
+        # A fetch that started before the breaker opened.
+        return
+      if self._state == HALF_OPEN:
+        if succeeded:
+          self._state = CLOSED
+          self._recent.clear()
+        else:
+          self._open(now)
+        return
+
+      self._recent.append((now, succeeded))
+      while self._recent and self._recent[0][0] <= now - self.window:
+        self._recent.popleft()
+      failures = sum(1 for _, ok in self._recent if not ok)
+      if len(self._recent) >= self.minimum_requests and failures >= self.failure_rate * len(self._recent):
+        self._open(now)
+
+  def _open(self, now: float):
+    self._state = OPEN
+    self._opened_at = now
+    self._probing = False
+    self._recent.clear()
+    self._stats = self._stats._replace(opened=self._stats.opened + 1)
@@ -0,0 +1,217 @@
+"""
+Caching for the authorization filters that `.authorized()` fetches from Oso Cloud.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+  TYPE_CHECKING,
+  Iterable,
+  NamedTuple,
+  Optional,
+  Tuple,
+  Union,
+)
+
+if TYPE_CHECKING:
+  from oso_cloud import Value
+  from oso_cloud.api import ConcreteFact, VariableFact
+
+__all__ = ["FilterCache", "CacheStats"]
+
+
+class FilterKey(NamedTuple):
+  actor: "Value"
+  action: str
+  resource_type: str
+  column: str
+
+
+class _Entry(NamedTuple):
+  value: str
+  expires_at: Optional[float]
+  stale_until: Optional[float]
+
+
+class CacheStats(NamedTuple):
+  """How often filters were found in a `FilterCache`."""
+
+  hits: int
+  """Filters served fresh from the cache."""
+  stale_hits: int
+  """Filters served from the cache after their `ttl`, while being refreshed in the background."""
+  misses: int
+  """Filters that had to be fetched from Oso Cloud."""
+  refreshes: int
+  """Background refreshes of stale filters that succeeded."""
+  refresh_failures: int
+  """Background refreshes of stale filters that failed. The stale filter is served until `stale_ttl` runs out."""
+
+
+class FilterCache:
+  """
+  A bounded, thread-safe cache of [`list_local`](https://www.osohq.com/docs/app-integration/client-apis/python#list-local)
+  filters, keyed by actor, action and resource type.
+
+  Pass an instance to `.init` to avoid a round trip to Oso Cloud every time the same
+  actor authorizes the same action on the same model:
+
+      cache = FilterCache(maxsize=10_000, ttl=30)
+      sqlalchemy_oso_cloud.init(Base.registry, filter_cache=cache)
+
+  When the cache is full, the least recently used filter is evicted.
+  Filters older than `ttl` seconds are not served, so `ttl` bounds how long a change
+  to authorization data can go unnoticed.
+
+  With `stale_ttl`, a filter that is older than `ttl` is still served for up to `stale_ttl` more seconds
+  while it is refreshed in the background, so that requests don't wait for Oso Cloud
+  (or fail, if Oso Cloud is unavailable) once a filter has been fetched. `ttl + stale_ttl` then bounds
+  how long a change can go unnoticed.
+  """
+
+  def __init__(
+    self,
+    maxsize: int = 1024,
+    ttl: Optional[float] = 60.0,
+    invalidate_on_write: bool = False,
+    stale_ttl: Optional[float] = None,
+  ):
+    """
+    :param maxsize: The maximum number of filters to keep.
+    :param ttl: How many seconds a filter may be served for, or `None` to keep filters until they are evicted or invalidated.
+    :param invalidate_on_write: Whether to clear the cache whenever facts are inserted or deleted
+      through the client created by `.init` (including `batch()`). Every filter is removed, since a fact can
+      affect actors and resource types that it doesn't mention, for example through group membership.
+    :param stale_ttl: How many seconds after `ttl` a filter may still be served while it is refreshed in the background,
+      or `None` to stop serving filters once `ttl` has passed.
+    """
+    if maxsize < 1:
+      raise ValueError("maxsize must be at least 1")
+    if stale_ttl is not None and ttl is None:
+      raise ValueError("stale_ttl requires a ttl")
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.invalidate_on_write = invalidate_on_write
+    self.stale_ttl = stale_ttl
+    self._entries: "OrderedDict[FilterKey, _Entry]" = OrderedDict()
+    self._lock = threading.Lock()
+    self._refreshing: set[FilterKey] = set()
+    self._stats = CacheStats(0, 0, 0, 0, 0)
+    # Incremented whenever filters are invalidated, so that fetches that started before can't cache their filters.
+    self._generation = 0
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._entries)
+
+  def get(self, key: FilterKey) -> Optional[str]:
+    """
+    Get a cached filter, or `None` if it is missing or expired.
+    """
+    return self._lookup(key, allow_stale=False)[0]
+
+  def _lookup(self, key: FilterKey, allow_stale: bool = True) -> Tuple[Optional[str], bool]:
+    """Get a cached filter, and whether it is stale, counting the lookup in `stats`."""
+    now = time.monotonic()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and (entry.expires_at is None or entry.expires_at > now):
+        self._entries.move_to_end(key)
+        self._count(hits=1)
+        return entry.value, False
+      if entry is not None and entry.stale_until is not None and entry.stale_until > now:
+        if allow_stale:
+          self._entries.move_to_end(key)
+          self._count(stale_hits=1)
+          return entry.value, True
+      elif entry is not None:
+        del self._entries[key]
+      self._count(misses=1)
+      return None, False
+
+  def _count(self, **counts: int):
+    self._stats = self._stats._replace(**{name: getattr(self._stats, name) + count for name, count in counts.items()})
+
+  def stats(self) -> CacheStats:
+    """
+    How often filters were served fresh, served stale or fetched, since the cache was created.
+    """
+    with self._lock:
+      return self._stats
+
+  def _begin_refresh(self, key: FilterKey) -> bool:
+    """Claim a stale filter for refreshing. Returns `False` if it is already being refreshed."""
+    with self._lock:
+      if key in self._refreshing:
+        return False
+      self._refreshing.add(key)
+      return True
+
+  def _end_refresh(self, key: FilterKey, succeeded: bool):
+    with self._lock:
+      self._refreshing.discard(key)
+      self._count(**({"refreshes": 1} if succeeded else {"refresh_failures": 1}))
+
+  def set(self, key: FilterKey, value: str):
+    """
+    Cache a filter, evicting the least recently used filter if the cache is full.
+    """
+    self._set(key, value, None)
+
+  def _set(self, key: FilterKey, value: str, generation: Optional[int]) -> bool:
+    """
+    Cache a filter, unless filters have been invalidated since `generation`.
+
+    :param generation: The `_generation` when the filter started being fetched, or `None` to cache it regardless.
+    :return: Whether the filter was cached.
+    """
+    expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+    stale_until = None if expires_at is None or self.stale_ttl is None else expires_at + self.stale_ttl
+    with self._lock:
+      if generation is not None and generation != self._generation:
+        return False
+      self._entries[key] = _Entry(value, expires_at, stale_until)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+      return True
+
+  def invalidate(self, actor: Optional["Value"] = None, resource_type: Optional[str] = None) -> int:
+    """
+    Remove cached filters. With no arguments, every filter is removed.
+
+    :param actor: Only remove filters for this actor.
+    :param resource_type: Only remove filters for this resource type.
+
+    :return: The number of filters removed.
+    """
+    with self._lock:
+      stale = [
+        key for key in self._entries
+        if (actor is None or _same_value(key.actor, actor))
+        and (resource_type is None or key.resource_type == resource_type)
+      ]
+      for key in stale:
+        del self._entries[key]
+      self._generation += 1
+      return len(stale)
+
+  def clear(self):
+    """
+    Remove every cached filter.
+    """
+    with self._lock:
+      self._entries.clear()
+      self._generation += 1
+
+  def _on_facts_written(self, facts: Iterable[Union["ConcreteFact", "VariableFact"]]):
+    """
+    Clear the cache when facts are written through the Oso client.
+
+    Any fact can change any actor's filter indirectly, such as a role granted to a group the actor is in,
+    or a fact about a parent of the resource type, so no cached filter is known to be unaffected.
+    """
+    self.clear()
+
+def _same_value(a: "Value", b: "Value") -> bool:
+  return a.type == b.type and str(a.id) == str(b.id)
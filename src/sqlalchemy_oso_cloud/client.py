@@ -0,0 +1,44 @@
+"""
+The Oso Cloud client created by `.init`.
+
+This module imports the Oso Cloud SDK, so it is only imported when a client is created.
+"""
+from contextlib import contextmanager
+from typing import Callable, Generator, Iterable, Union
+
+from oso_cloud import IntoFact, IntoFactPattern, Oso
+from oso_cloud.api import BatchInserts, ConcreteFact, VariableFact
+from oso_cloud.helpers import to_api_variable_fact
+from oso_cloud.oso import BatchTransaction
+
+FactListener = Callable[[Iterable[Union[ConcreteFact, VariableFact]]], None]
+
+class _Client(Oso):
+  """
+  An Oso Cloud client that notifies listeners about facts written through it.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.fact_listeners: list[FactListener] = []
+
+  def insert(self, fact: IntoFact):
+    super().insert(fact)
+    self._notify([to_api_variable_fact(fact)])
+
+  def delete(self, fact: IntoFactPattern):
+    super().delete(fact)
+    self._notify([to_api_variable_fact(fact)])
+
+  @contextmanager
+  def batch(self) -> Generator[BatchTransaction, None, None]:
+    with super().batch() as tx:
+      yield tx
+    facts: list[Union[ConcreteFact, VariableFact]] = []
+    for changeset in tx.changesets:
+      facts.extend(changeset.inserts if isinstance(changeset, BatchInserts) else changeset.deletes)
+    self._notify(facts)
+
+  def _notify(self, facts: list[Union[ConcreteFact, VariableFact]]):
+    for listener in self.fact_listeners:
+      listener(facts)
@@ -0,0 +1,92 @@
+from typing import TYPE_CHECKING, TypeVar
+
+import sqlalchemy.sql
+
+from .auth import (
+    Actions,
+    _apply_authorization_options,
+    _apply_authorization_options_async,
+)
+
+if TYPE_CHECKING:
+    from oso_cloud import Value
+
+UpdateSelf = TypeVar("UpdateSelf", bound="Update")
+DeleteSelf = TypeVar("DeleteSelf", bound="Delete")
+
+class Update(sqlalchemy.sql.Update):
+    """An Update subclass that adds authorization functionality"""
+
+    inherit_cache = True
+    """Internal SQLAlchemy caching optimization"""
+
+    def authorized(self: UpdateSelf, actor: "Value", action: Actions) -> UpdateSelf:
+        """
+        Only update the rows the actor is authorized to perform the action on
+
+        The authorization filter is added to the statement's `WHERE` clause,
+        so the rows are updated by one set-based statement without being loaded first.
+        The statement must be executed by an ORM `Session`.
+        """
+        return _apply_authorization_options(self, actor, action)
+
+    async def authorized_async(self: UpdateSelf, actor: "Value", action: Actions) -> UpdateSelf:
+        """
+        Like `authorized`, but awaits Oso Cloud instead of blocking the event loop
+        """
+        return await _apply_authorization_options_async(self, actor, action)
+
+
+class Delete(sqlalchemy.sql.Delete):
+    """A Delete subclass that adds authorization functionality"""
+
+    inherit_cache = True
+    """Internal SQLAlchemy caching optimization"""
+
+    def authorized(self: DeleteSelf, actor: "Value", action: Actions) -> DeleteSelf:
+        """
+        Only delete the rows the actor is authorized to perform the action on
+
+        The authorization filter is added to the statement's `WHERE` clause,
+        so the rows are deleted by one set-based statement without being loaded first.
+        The statement must be executed by an ORM `Session`.
+        """
+        return _apply_authorization_options(self, actor, action)
+
+    async def authorized_async(self: DeleteSelf, actor: "Value", action: Actions) -> DeleteSelf:
+        """
+        Like `authorized`, but awaits Oso Cloud instead of blocking the event loop
+        """
+        return await _apply_authorization_options_async(self, actor, action)
+
+
+def update(table) -> Update:
+    """
+    Create an sqlalchemy_oso_cloud.Update() object
+
+    This is a drop-in replacement for sqlalchemy.update() that adds
+    authorization capabilities via the .authorized() method.
+
+    Example:
+        from sqlalchemy_oso_cloud import update
+
+        stmt = update(Document).where(Document.folder_id == folder.id).values(archived=True).authorized(actor, "write")
+        archived = session.execute(stmt).rowcount
+    """
+    return Update(table)
+
+
+def delete(table) -> Delete:
+    """
+    Create an sqlalchemy_oso_cloud.Delete() object
+
+    This is a drop-in replacement for sqlalchemy.delete() that adds
+    authorization capabilities via the .authorized() method.
+
+    Example:
+        from sqlalchemy_oso_cloud import delete
+
+        stmt = delete(Document).where(Document.folder_id == folder.id).authorized(actor, "delete")
+        deleted = session.execute(stmt).rowcount
+    """
+    return Delete(table)
@@ -0,0 +1,195 @@
+"""
+Diagnostics for how the database plans authorized statements.
+
+`explain_authorized` runs `EXPLAIN` on a statement with its authorization filters applied,
+and flags the parts of the plan that commonly make authorized queries slow:
+
+    plan = explain_authorized(session, select(Document).authorized(user, "read"), analyze=True)
+    for warning in plan.warnings:
+      print(warning.message)
+
+PostgreSQL plans are read from `EXPLAIN (FORMAT JSON)`.
+SQLite plans are read from `EXPLAIN QUERY PLAN`, which only describes scans,
+so only sequential scans are flagged.
+"""
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union, cast
+
+import sqlalchemy.orm
+from sqlalchemy import ClauseElement, Executable, Select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+
+from .auth import _resolve_deferred
+
+__all__ = ["explain_authorized", "Plan", "PlanNode", "PlanWarning"]
+
+
+class PlanNode(NamedTuple):
+  """A step in a query plan."""
+
+  node_type: str
+  """The kind of step, such as `Seq Scan` or `Hash Join`. For SQLite, the step's description."""
+  relation: Optional[str]
+  """The table the step reads, if any."""
+  estimated_rows: Optional[float]
+  actual_rows: Optional[float]
+  """The rows the step returned in total, if the plan was analyzed."""
+  children: Tuple["PlanNode", ...]
+  details: Dict[str, Any]
+  """Everything the database reported about the step."""
+
+  def walk(self):
+    """Iterate over this step and all of the steps below it."""
+    yield self
+    for child in self.children:
+      yield from child.walk()
+
+
+class PlanWarning(NamedTuple):
+  """A part of a plan that is likely to make the statement slow."""
+
+  kind: str
+  """`seq_scan`, `hash_join` or `row_estimate`."""
+  message: str
+  node: PlanNode
+
+
+class Plan(NamedTuple):
+  """The plan for an authorized statement."""
+
+  sql: str
+  """The statement that was explained, including its authorization filters."""
+  root: PlanNode
+  warnings: Tuple[PlanWarning, ...]
+  details: Any
+  """The plan exactly as the database reported it."""
+
+
+class _Explain(Executable, ClauseElement):
+  inherit_cache = False
+
+  def __init__(self, statement: Select, explain: str):
+    self.statement = statement
+    self.explain = explain
+
+
+@compiles(_Explain)
+def _compile_explain(element: _Explain, compiler: SQLCompiler, **kwargs) -> str:
+  return f"{element.explain} {compiler.process(element.statement, **kwargs)}"
+
+
+def _postgresql_node(plan: Dict[str, Any]) -> PlanNode:
+  actual_rows = None
+  if "Actual Rows" in plan:
+    actual_rows = plan["Actual Rows"] * plan.get("Actual Loops", 1)
+  return PlanNode(
+    node_type=plan["Node Type"],
+    relation=plan.get("Relation Name"),
+    estimated_rows=plan.get("Plan Rows"),
+    actual_rows=actual_rows,
+    children=tuple(_postgresql_node(child) for child in plan.get("Plans", [])),
+    details={key: value for key, value in plan.items() if key != "Plans"},
+  )
+
+
+def _sqlite_node(rows: List[Tuple[int, int, int, str]]) -> PlanNode:
+  children: Dict[int, List[Tuple[int, str]]] = {}
+  for node_id, parent, _, detail in rows:
+    children.setdefault(parent, []).append((node_id, detail))
+
+  def node(node_id: int, detail: str) -> PlanNode:
+    words = detail.split()
+    relation = words[1] if words[0] in ("SCAN", "SEARCH") and len(words) > 1 else None
+    return PlanNode(detail, relation, None, None, tuple(node(*child) for child in children.get(node_id, [])), {"detail": detail})
+
+  return PlanNode("QUERY PLAN", None, None, None, tuple(node(*child) for child in children.get(0, [])), {})
+
+
+def _warnings(root: PlanNode, seq_scan_rows: float, estimate_factor: float) -> List[PlanWarning]:
+  warnings = []
+  for node in root.walk():
+    rows = node.actual_rows if node.actual_rows is not None else node.estimated_rows
+    if node.node_type == "Seq Scan" and (rows is None or rows >= seq_scan_rows):
+      warnings.append(PlanWarning(
+        "seq_scan",
+        f"Sequential scan on {node.relation} ({rows:.0f} rows)" if rows is not None else f"Sequential scan on {node.relation}",
+        node,
+      ))
+    elif node.node_type.startswith("SCAN ") and "INDEX" not in node.node_type:
+      warnings.append(PlanWarning("seq_scan", f"Sequential scan on {node.relation}", node))
+    elif node.node_type == "Hash Join":
+      hashed = [child for child in node.children if child.node_type == "Hash"]
+      scans = sorted({
+        descendant.relation or descendant.details.get("CTE Name") or descendant.node_type
+        for child in hashed
+        for descendant in child.walk()
+        if descendant.node_type in ("Seq Scan", "CTE Scan", "Subquery Scan")
+      })
+      if scans:
+        warnings.append(PlanWarning(
+          "hash_join",
+          f"Hash join builds a hash table by scanning {', '.join(scans)} instead of looking up matching rows",
+          node,
+        ))
+    if node.actual_rows is not None and node.estimated_rows is not None:
+      estimated, actual = max(node.estimated_rows, 1), max(node.actual_rows, 1)
+      if max(estimated, actual) / min(estimated, actual) >= estimate_factor:
+        warnings.append(PlanWarning(
+          "row_estimate",
+          f"{node.node_type}{f' on {node.relation}' if node.relation else ''} was estimated to return "
+          f"{node.estimated_rows:.0f} rows, but returned {node.actual_rows:.0f}",
+          node,
+        ))
+  return warnings
+
+
+def explain_authorized(
+  session: sqlalchemy.orm.Session,
+  statement: Union[Select, sqlalchemy.orm.Query],
+  analyze: bool = False,
+  buffers: bool = False,
+  seq_scan_rows: float = 1000,
+  estimate_factor: float = 10,
+) -> Plan:
+  """
+  Explain how the database plans an authorized statement.
+
+  Deferred authorization is resolved first, so the plan includes the authorization filters.
+
+  :param session: The session to explain the statement with.
+  :param statement: An authorized `Select` statement or `Query`.
+  :param analyze: (optional) Execute the statement to report actual row counts and timings (PostgreSQL only).
+  :param buffers: (optional) Report buffer usage. Requires `analyze` (PostgreSQL only).
+  :param seq_scan_rows: (optional) Only flag sequential scans of tables with at least this many rows (PostgreSQL only).
+  :param estimate_factor: (optional) Flag steps whose actual row count is off from the estimate by at least this factor.
+  :return: The plan, with warnings about the parts of it that are likely to be slow.
+  """
+  if isinstance(statement, sqlalchemy.orm.Query):
+    statement = cast(Select, statement.statement)
+  statement = _resolve_deferred(statement, session)
+  connection = session.connection()
+  dialect = connection.dialect
+  sql = str(statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True}))
+
+  details: Any
+
+  if dialect.name == "postgresql":
+    options = ["FORMAT JSON"]
+    if analyze:
+      options.append("ANALYZE")
+    if buffers:
+      options.append("BUFFERS")
+    details = connection.execute(_Explain(statement, f"EXPLAIN ({', '.join(options)})")).scalar_one()
+    if isinstance(details, str):
+      details = json.loads(details)
+    root = _postgresql_node(details[0]["Plan"])
+  elif dialect.name == "sqlite":
+    if analyze or buffers:
+      raise ValueError("SQLite does not support EXPLAIN ANALYZE")
+    details = [tuple(row) for row in connection.execute(_Explain(statement, "EXPLAIN QUERY PLAN"))]
+    root = _sqlite_node(details)
+  else:
+    raise NotImplementedError(f"explain_authorized does not support {dialect.name}")
+
+  return Plan(sql, root, tuple(_warnings(root, seq_scan_rows, estimate_factor)), details)
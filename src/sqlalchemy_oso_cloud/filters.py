@@ -0,0 +1,177 @@
+"""
+Turns the SQL filters returned by Oso Cloud into SQLAlchemy expressions.
+
+The filters returned by `list_local` inline literal values, such as actor IDs and role names.
+Rendering them as-is would make every actor's statement distinct,
+defeating SQLAlchemy's compiled statement cache and the database's prepared statement plans.
+Instead, the literals are pulled out into bound parameters,
+so that actors whose filters have the same shape share one compiled statement.
+
+Each parameter is typed from the column it is compared to, where that column is one of your tables,
+so that, for example, `document.id = '1'` binds the integer `1` rather than a string that the database
+has to cast (or, with asyncpg, rejects).
+"""
+import re
+import uuid
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Mapping, Optional, Tuple, Union
+
+from sqlalchemy import ColumnElement, bindparam, text
+from sqlalchemy.sql.expression import Grouping
+from sqlalchemy.types import TypeEngine
+
+__all__ = ["filter_expression", "parameterize"]
+
+_LITERAL = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?"
+
+_TOKENS = re.compile(
+  rf"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<identifier>"(?:[^"]|"")*")
+  | (?P<in_list>\bIN\s*\(\s*(?:{_LITERAL})(?:\s*,\s*(?:{_LITERAL}))*\s*\))
+  | (?P<comparison>(?:<>|!=|<=|>=|=|<|>)\s*)(?P<number>-?\d+(?:\.\d+)?)(?![\w.])
+  | (?P<colon>:)
+  """,
+  re.IGNORECASE | re.VERBOSE,
+)
+
+_IN_LIST_ITEMS = re.compile(_LITERAL)
+
+# String literals that are part of a typed literal (e.g. `DATE '2025-01-01'` or `E'\n'`)
+# can't be replaced by a bound parameter.
+_TYPED_LITERAL_PREFIX = re.compile(r"(?:\w|\b(?:DATE|TIME|TIMESTAMP|INTERVAL)\s+)$", re.IGNORECASE)
+
+_IDENTIFIER = r'"(?:[^"]|"")*"|\w+'
+
+# The column reference at the end of the SQL before a literal, such as `document.id =` or `"document"."id" NOT IN`.
+_COMPARED_COLUMN = re.compile(
+  rf"((?:{_IDENTIFIER})(?:\s*\.\s*(?:{_IDENTIFIER}))*)\s*(?:<>|!=|<=|>=|=|<|>|(?:\bNOT\s+)?\bIN)\s*$",
+  re.IGNORECASE,
+)
+
+_IDENTIFIER_PART = re.compile(_IDENTIFIER)
+
+# A number at the end of the SQL before a comparison, as in the constant comparisons `1 = 0` and `1 = 1`
+# that deny-all and allow-all filters are made of.
+_NUMBER_BEFORE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\s*$")
+
+# Values are only converted to these types, since converting to others (such as `bool("false")`) can change them.
+_COERCIBLE_TYPES = (int, float, Decimal, uuid.UUID, str)
+
+Parameters = Tuple[Tuple[str, Any], ...]
+
+
+def _literal_value(literal: str) -> Union[str, int, Decimal]:
+  if literal.startswith("'"):
+    return literal[1:-1].replace("''", "'")
+  if "." in literal:
+    return Decimal(literal)
+  return int(literal)
+
+
+def _compared_column(sql: str) -> Optional[str]:
+  """The lowercased, unquoted column reference that the SQL before a literal compares it to, if any."""
+  match = _COMPARED_COLUMN.search(sql[-256:])
+  if match is None:
+    return None
+  parts = _IDENTIFIER_PART.findall(match[1])
+  return ".".join(part[1:-1].replace('""', '"') if part.startswith('"') else part for part in parts).lower()
+
+
+def parameterize(sql_filter: str) -> Tuple[str, Parameters]:
+  """
+  Replace the literal values in a SQL filter with bound parameters.
+
+  String literals, numbers that are compared against, and lists of literals in `IN (...)`
+  are replaced, except in comparisons between two numbers, such as `1 = 0`. Every other `:` is escaped, so the result can be passed to
+  [`sqlalchemy.text`](https://docs.sqlalchemy.org/en/20/core/sqlelement.html#sqlalchemy.sql.expression.text).
+
+  :param sql_filter: A SQL filter returned by Oso Cloud.
+  :return: The filter in `sqlalchemy.text` syntax, and the values of its parameters.
+    Parameters whose value is a list should be bound with `expanding=True`.
+  """
+  template, parameters, _ = _parameterize(sql_filter)
+  return template, parameters
+
+
+@lru_cache(maxsize=1024)
+def _parameterize(sql_filter: str) -> Tuple[str, Parameters, Tuple[Optional[str], ...]]:
+  """Like `parameterize`, but also return the column that each parameter is compared to, if any."""
+  parameters: list[Tuple[str, Any]] = []
+  columns: list[Optional[str]] = []
+
+  def parameter(value: Any, preceding: str) -> str:
+    name = f"oso_{len(parameters) + 1}"
+    parameters.append((name, value))
+    columns.append(_compared_column(preceding))
+    return f":{name}"
+
+  def replace(match: "re.Match[str]") -> str:
+    if match["string"] is not None:
+      prefix = sql_filter[max(0, match.start() - len("TIMESTAMP ")):match.start()]
+      if _TYPED_LITERAL_PREFIX.search(prefix):
+        return match[0].replace(":", "\\:")
+      return parameter(_literal_value(match["string"]), sql_filter[:match.start()])
+    if match["identifier"] is not None:
+      return match[0].replace(":", "\\:")
+    if match["in_list"] is not None:
+      in_keyword = match["in_list"][:2]
+      values = [_literal_value(item) for item in _IN_LIST_ITEMS.findall(match["in_list"][2:])]
+      return f"{in_keyword} {parameter(values, sql_filter[:match.start()] + in_keyword)}"
+    if match["number"] is not None:
+      if _NUMBER_BEFORE.search(sql_filter[max(0, match.start() - 64):match.start()]):
+        # Left inline, so that the database can fold the comparison away, even in generic plans.
+        return match[0]
+      return match["comparison"] + parameter(_literal_value(match["number"]), sql_filter[:match.start()] + match["comparison"])
+    return "\\:"
+
+  return _TOKENS.sub(replace, sql_filter), tuple(parameters), tuple(columns)
+
+
+def _typed_value(value: Any, column_type: Optional[TypeEngine]) -> Tuple[Any, Optional[TypeEngine]]:
+  """
+  Convert a parameter's value to the Python type of the column it is compared to.
+
+  :return: The converted value and the column type, or the value as-is and `None` if it can't be converted.
+  """
+  if column_type is None:
+    return value, None
+  try:
+    python_type = column_type.python_type
+  except NotImplementedError:
+    return value, None
+  if python_type not in _COERCIBLE_TYPES:
+    return value, None
+
+  def coerce(item: Any) -> Any:
+    return item if isinstance(item, python_type) else python_type(item)
+
+  try:
+    if isinstance(value, list):
+      return [coerce(item) for item in value], column_type
+    return coerce(value), column_type
+  except (TypeError, ValueError, ArithmeticError):
+    return value, None
+
+
+def filter_expression(sql_filter: str, column_types: Optional[Mapping[str, TypeEngine]] = None) -> ColumnElement[Any]:
+  """
+  Convert a SQL filter returned by Oso Cloud into a SQLAlchemy expression,
+  with its literal values as bound parameters.
+
+  :param sql_filter: A SQL filter returned by Oso Cloud.
+  :param column_types: (optional) The types of the columns that parameters may be compared to,
+    by `table.column`, `schema.table.column` and unambiguous column name, all lowercase.
+    Defaults to the columns of the registry passed to `.init`.
+  :return: A boolean SQL expression.
+  """
+  if column_types is None:
+    from .oso import _get_filter_column_types
+    column_types = _get_filter_column_types()
+  template, parameters, columns = _parameterize(sql_filter)
+  bindparams = []
+  for (name, value), column in zip(parameters, columns):
+    value, type_ = _typed_value(value, None if column is None else column_types.get(column))
+    bindparams.append(bindparam(name, value, type_=type_, unique=True, expanding=isinstance(value, list)))
+  return Grouping(text(template).bindparams(*bindparams))
@@ -0,0 +1,129 @@
+"""
+Hooks for measuring where the time goes in authorized queries.
+
+Subclass `Listener`, override the events you're interested in, and register it
+for every session or for a single session with `add_listener`:
+
+    class LogSlowQueries(Listener):
+      def statement_executed(self, session, execution):
+        fetch_time = sum(authorization.duration for authorization in execution.authorizations)
+        if fetch_time + execution.duration > 0.5:
+          logger.warning("slow query: %.3fs fetching filters, %.3fs in the database", fetch_time, execution.duration)
+
+    add_listener(LogSlowQueries())
+    add_listener(LogSlowQueries(), session=session)
+
+For OpenTelemetry spans and metrics, see `.opentelemetry`.
+"""
+from typing import TYPE_CHECKING, Any, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+  from sqlalchemy.orm import Session
+  from sqlalchemy.sql import Executable
+
+__all__ = ["Listener", "FilterFetch", "Authorization", "Execution", "add_listener", "remove_listener"]
+
+
+class FilterFetch(NamedTuple):
+  """A filter that was fetched from Oso Cloud or found in the `.FilterCache`."""
+
+  resource_type: str
+  action: str
+  duration: float
+  """Seconds spent fetching the filter. `0.0` for cache hits."""
+  size: int
+  """The size of the filter's SQL, in bytes."""
+  cache_hit: bool
+  stale: bool = False
+  """Whether the filter was served from the cache after its `ttl`, while being refreshed in the background."""
+
+
+class Authorization(NamedTuple):
+  """The filters fetched to authorize a statement."""
+
+  models: int
+  """The number of models authorized."""
+  fetches: Tuple[FilterFetch, ...]
+  """The distinct filters fetched. Requests for the same filter are only fetched once."""
+  duration: float
+  """Seconds spent fetching filters, including concurrent fetches and cache lookups."""
+
+
+class Execution(NamedTuple):
+  """An authorized statement that was executed by a session."""
+
+  statement: "Executable"
+  duration: float
+  """Seconds spent executing the statement in the database, not including fetching its rows."""
+  authorizations: Tuple[Authorization, ...]
+  """How the statement was authorized. A statement that was authorized several times has several."""
+
+
+class Listener:
+  """
+  Receives events about authorized statements. Every event does nothing by default.
+  """
+
+  def filters_fetched(self, session: Optional["Session"], authorization: Authorization):
+    """
+    Called when the filters for a statement have been fetched.
+
+    Unless authorization is deferred (see `.init`), filters are fetched when the statement is built,
+    so `session` is `None` and only listeners registered for every session are called.
+    """
+
+  def statement_executed(self, session: "Session", execution: Execution):
+    """
+    Called when an authorized statement has been executed by a session.
+    """
+
+
+_listeners: List[Listener] = []
+
+_SESSION_LISTENERS = "sqlalchemy_oso_cloud.listeners"
+
+
+def _session_listeners(session: Any) -> List[Listener]:
+  # Accept an `AsyncSession`, whose events are emitted by its `sync_session`.
+  session = getattr(session, "sync_session", session)
+  return session.info.setdefault(_SESSION_LISTENERS, [])
+
+
+def add_listener(listener: Listener, session: Optional["Session"] = None):
+  """
+  Register a listener.
+
+  :param listener: The listener to register.
+  :param session: (optional) Only send the listener events for this session.
+    By default, the listener receives events for every session.
+  """
+  if session is None:
+    _listeners.append(listener)
+  else:
+    _session_listeners(session).append(listener)
+
+
+def remove_listener(listener: Listener, session: Optional["Session"] = None):
+  """
+  Unregister a listener registered with `add_listener`.
+  """
+  if session is None:
+    _listeners.remove(listener)
+  else:
+    _session_listeners(session).remove(listener)
+
+
+def _listeners_for(session: Optional["Session"]) -> List[Listener]:
+  if session is None or _SESSION_LISTENERS not in session.info:
+    return _listeners
+  return _listeners + session.info[_SESSION_LISTENERS]
+
+
+def _filters_fetched(session: Optional["Session"], authorization: Authorization):
+  for listener in _listeners_for(session):
+    listener.filters_fetched(session, authorization)
+
+
+def _statement_executed(session: "Session", execution: Execution):
+  for listener in _listeners_for(session):
+    listener.statement_executed(session, execution)
@@ -0,0 +1,313 @@
+"""
+Materialized authorization for hot actors.
+
+For most actors, `.authorized()` filters a statement with the `list_local` filter returned by Oso Cloud,
+which the database evaluates from your fact bindings on every statement. For actors whose authorized set is
+large and queried constantly, such as service accounts and admins of large organizations, that is wasteful.
+
+An `AuthorizationTable` stores the IDs of the resources chosen actors are authorized for,
+so that their statements are filtered with an indexed semi-join against it instead:
+
+    authorizations = AuthorizationTable(engine, max_staleness=300)
+    authorizations.create()
+    sqlalchemy_oso_cloud.init(Base.registry, authorization_table=authorizations)
+    authorizations.materialize(service_account, "read", Document)
+    authorizations.refresh_every(60)
+
+The table is refreshed incrementally: rows are only inserted for resources that became authorized,
+and deleted for resources that no longer are. A materialization is only used while it is known to be fresh.
+Until it has been refreshed again, statements fall back to the filter:
+
+- after a session commits writes to a table that the fact bindings read from,
+- after facts are inserted or deleted through the client created by `.init`,
+- and more than `max_staleness` seconds after it was last refreshed, if set.
+
+Set `max_staleness` if other processes write to your database, since only writes made through this process are detected.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+  TYPE_CHECKING,
+  Any,
+  Dict,
+  FrozenSet,
+  Iterable,
+  NamedTuple,
+  Optional,
+  Set,
+  Tuple,
+  Type,
+)
+
+import sqlalchemy
+from sqlalchemy import (
+  Column,
+  ColumnElement,
+  Engine,
+  MetaData,
+  String,
+  Table,
+  and_,
+  cast,
+  exists,
+  literal,
+)
+
+if TYPE_CHECKING:
+  from oso_cloud import Value
+
+__all__ = ["AuthorizationTable"]
+
+
+class _Materialization(NamedTuple):
+  refreshed_at: Optional[float]
+  """When the materialization was last refreshed, or `None` if it isn't fresh."""
+  generation: int
+  """Incremented whenever the materialization becomes stale, so that a refresh that started before can't make it fresh."""
+
+
+_Key = Tuple[str, str, str, Type]
+"""The actor type, actor ID, action and model of a materialization."""
+
+
+class AuthorizationTable:
+  """
+  A table of the resources that chosen actors are authorized for. See the module documentation.
+  """
+
+  def __init__(
+    self,
+    bind: Engine,
+    name: str = "oso_authorizations",
+    schema: Optional[str] = None,
+    max_staleness: Optional[float] = None,
+    refresh_on_write: bool = True,
+  ):
+    """
+    :param bind: The engine of the database your models are stored in.
+    :param name: (optional) The name of the table.
+    :param schema: (optional) The schema of the table.
+    :param max_staleness: (optional) How many seconds after a refresh a materialization may be used,
+      or `None` to use it until a write is detected.
+    :param refresh_on_write: (optional) Whether to refresh materializations in the background
+      when a write makes them stale. Otherwise, they are refreshed by `refresh` or `refresh_every`.
+    """
+    self.bind = bind
+    self.max_staleness = max_staleness
+    self.refresh_on_write = refresh_on_write
+    self.table = Table(
+      name,
+      MetaData(schema=schema),
+      Column("actor_type", String(255), primary_key=True),
+      Column("actor_id", String(255), primary_key=True),
+      Column("action", String(255), primary_key=True),
+      Column("resource_type", String(255), primary_key=True),
+      Column("resource_id", String(255), primary_key=True),
+    )
+    self._materializations: Dict[_Key, _Materialization] = {}
+    self._actors: Dict[Tuple[str, str], "Value"] = {}
+    self._fact_tables: FrozenSet[str] = frozenset()
+    self._pending: Set[_Key] = set()
+    self._executor: Optional[ThreadPoolExecutor] = None
+    self._lock = threading.Lock()
+    # Held while writing rows, so that a refresh can't write rows for a materialization that was just forgotten.
+    self._write_lock = threading.Lock()
+    self._stop: Optional[threading.Event] = None
+
+  def create(self):
+    """
+    Create the table, if it doesn't exist.
+    """
+    self.table.create(self.bind, checkfirst=True)
+
+  def drop(self):
+    """
+    Drop the table, if it exists.
+    """
+    self.table.drop(self.bind, checkfirst=True)
+
+  def materialize(self, actor: "Value", action: str, model: Type):
+    """
+    Start materializing the resources of a model that an actor is authorized to perform an action on,
+    and refresh the materialization now.
+    """
+    key = (actor.type, str(actor.id), action, model)
+    with self._lock:
+      self._actors[(actor.type, str(actor.id))] = actor
+      self._materializations.setdefault(key, _Materialization(None, 0))
+    self._refresh(key)
+
+  def forget(self, actor: "Value", action: Optional[str] = None, model: Optional[Type] = None):
+    """
+    Stop materializing an actor's authorizations, and delete their rows.
+
+    :param action: (optional) Only stop materializing this action.
+    :param model: (optional) Only stop materializing this model.
+    """
+    actor_key = (actor.type, str(actor.id))
+    with self._write_lock:
+      with self._lock:
+        keys = [
+          key for key in self._materializations
+          if key[:2] == actor_key
+          and (action is None or key[2] == action)
+          and (model is None or key[3] is model)
+        ]
+        for key in keys:
+          del self._materializations[key]
+        if not any(key[:2] == actor_key for key in self._materializations):
+          self._actors.pop(actor_key, None)
+      with self.bind.begin() as connection:
+        for key in keys:
+          connection.execute(sqlalchemy.delete(self.table).where(self._key_criteria(key)))
+
+  def refresh(self, actor: Optional["Value"] = None) -> int:
+    """
+    Refresh materializations from your database and Oso Cloud.
+
+    :param actor: (optional) Only refresh this actor's materializations.
+    :return: The number of rows inserted or deleted.
+    """
+    with self._lock:
+      keys = [
+        key for key in self._materializations
+        if actor is None or key[:2] == (actor.type, str(actor.id))
+      ]
+    return sum(self._refresh(key) for key in keys)
+
+  def refresh_every(self, seconds: float):
+    """
+    Refresh every materialization every `seconds` seconds, in a background thread, until `stop` is called.
+    """
+    self.stop()
+    stop = self._stop = threading.Event()
+
+    def run():
+      while not stop.wait(seconds):
+        try:
+          self.refresh()
+        except Exception:
+          # Keep refreshing. Stale materializations fall back to the filter meanwhile.
+          pass
+
+    threading.Thread(target=run, name="sqlalchemy_oso_cloud_authorization_table", daemon=True).start()
+
+  def stop(self):
+    """
+    Stop refreshing materializations in the background.
+    """
+    if self._stop is not None:
+      self._stop.set()
+      self._stop = None
+
+  def is_fresh(self, actor: "Value", action: str, model: Type) -> bool:
+    """
+    Whether statements authorizing `action` on `model` for `actor` are filtered with the table.
+    """
+    with self._lock:
+      materialization = self._materializations.get((actor.type, str(actor.id), action, model))
+    if materialization is None or materialization.refreshed_at is None:
+      return False
+    return self.max_staleness is None or time.monotonic() - materialization.refreshed_at <= self.max_staleness
+
+  def _key_criteria(self, key: _Key) -> Any:
+    actor_type, actor_id, action, model = key
+    return and_(
+      self.table.c.actor_type == actor_type,
+      self.table.c.actor_id == actor_id,
+      self.table.c.action == action,
+      self.table.c.resource_type == model.__name__,
+    )
+
+  def _criteria(self, model: Type, actor: "Value", action: str) -> ColumnElement[bool]:
+    """The semi-join that filters `model` on the materialized authorizations of `actor`."""
+    id_column = sqlalchemy.inspect(model).get_property("id").columns[0]
+    authorized_ids = sqlalchemy.select(cast(self.table.c.resource_id, id_column.type)).where(
+      self._key_criteria((actor.type, str(actor.id), action, model))
+    )
+    return getattr(model, "id").in_(authorized_ids)
+
+  def _refresh(self, key: _Key) -> int:
+    """
+    Bring a materialization up to date with one `DELETE` and one `INSERT ... SELECT`.
+
+    :return: The number of rows inserted or deleted.
+    """
+    from .auth import _fetch_filter_uncached
+    from .filters import filter_expression
+
+    with self._lock:
+      materialization = self._materializations.get(key)
+      if materialization is None:
+        return 0
+      actor = self._actors[key[:2]]
+    actor_type, actor_id, action, model = key
+    # Cached filters may predate the write that made the materialization stale.
+    sql_filter = filter_expression(_fetch_filter_uncached(model, actor, action))
+    resource_id = cast(sqlalchemy.inspect(model).get_property("id").columns[0], String)
+    key_criteria = self._key_criteria(key)
+
+    with self._write_lock, self.bind.begin() as connection:
+      with self._lock:
+        if key not in self._materializations:
+          return 0
+      deleted = connection.execute(
+        sqlalchemy.delete(self.table).where(
+          key_criteria,
+          self.table.c.resource_id.not_in(sqlalchemy.select(resource_id).where(sql_filter)),
+        )
+      ).rowcount
+      inserted = connection.execute(
+        sqlalchemy.insert(self.table).from_select(
+          ["actor_type", "actor_id", "action", "resource_type", "resource_id"],
+          sqlalchemy.select(literal(actor_type), literal(actor_id), literal(action), literal(model.__name__), resource_id)
+          .where(sql_filter)
+          .where(~exists().where(key_criteria, self.table.c.resource_id == resource_id)),
+        )
+      ).rowcount
+
+    with self._lock:
+      current = self._materializations.get(key)
+      if current is not None and current.generation == materialization.generation:
+        self._materializations[key] = current._replace(refreshed_at=time.monotonic())
+    return deleted + inserted
+
+  def _invalidate(self):
+    """
+    Mark every materialization stale, and refresh them in the background if `refresh_on_write` is set,
+    in a dedicated thread so that refreshes don't hold up fetching filters for statements.
+    """
+    with self._lock:
+      for key, materialization in self._materializations.items():
+        self._materializations[key] = _Materialization(None, materialization.generation + 1)
+      if not self.refresh_on_write:
+        return
+      keys = [key for key in self._materializations if key not in self._pending]
+      self._pending.update(keys)
+      if self._executor is None and keys:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlalchemy_oso_cloud_authorization_table")
+    for key in keys:
+      self._executor.submit(self._refresh_pending, key)
+
+  def _refresh_pending(self, key: _Key):
+    """
+    Refresh a materialization in the background. Writes while a refresh is waiting to run don't queue another,
+    but writes while it is running do, since it may have read the data from before them.
+    """
+    with self._lock:
+      self._pending.discard(key)
+    try:
+      self._refresh(key)
+    except Exception:
+      # The materialization stays stale, so statements fall back to the filter until it is refreshed.
+      pass
+
+  def _tables_written(self, tables: Iterable[str]):
+    """Invalidate materializations when a session commits writes to the tables the fact bindings read from."""
+    if self._fact_tables.intersection(tables):
+      self._invalidate()
+
+  def _on_facts_written(self, facts: Iterable[Any]):
+    """Invalidate materializations when facts are written through the Oso client."""
+    self._invalidate()
@@ -0,0 +1,99 @@
+"""
+[OpenTelemetry](https://opentelemetry.io/) spans and metrics for authorized queries.
+
+Requires the `opentelemetry` extra (`pip install sqlalchemy-oso-cloud[opentelemetry]`).
+Register an `OpenTelemetryListener` for every session:
+
+    from sqlalchemy_oso_cloud.instrumentation import add_listener
+    from sqlalchemy_oso_cloud.opentelemetry import OpenTelemetryListener
+
+    add_listener(OpenTelemetryListener())
+
+Spans are children of the span that is current when the filters are fetched or the statement is executed.
+
+| Span | |
+| --- | --- |
+| `oso.fetch_filters` | Fetching the filters for a statement |
+| `oso.execute` | Executing an authorized statement in the database |
+
+| Metric | Unit | |
+| --- | --- | --- |
+| `oso.filter.fetch.duration` | s | Time spent fetching each filter from Oso Cloud |
+| `oso.filter.size` | By | Size of each filter's SQL |
+| `oso.filter.cache.requests` | {request} | Filters requested, with `oso.cache_hit` set if found in the `.FilterCache`, and `oso.stale` if it was stale |
+| `oso.statement.models` | {model} | Models authorized per statement |
+| `oso.statement.execution.duration` | s | Time spent executing authorized statements in the database |
+"""
+import time
+from typing import TYPE_CHECKING, Optional
+
+from opentelemetry import metrics, trace
+
+from .instrumentation import Authorization, Execution, Listener
+
+if TYPE_CHECKING:
+  from sqlalchemy.orm import Session
+
+__all__ = ["OpenTelemetryListener"]
+
+
+class OpenTelemetryListener(Listener):
+  """
+  Records `.instrumentation` events as OpenTelemetry spans and metrics.
+  """
+
+  def __init__(
+    self,
+    tracer_provider: Optional[trace.TracerProvider] = None,
+    meter_provider: Optional[metrics.MeterProvider] = None,
+  ):
+    """
+    :param tracer_provider: (optional) The tracer provider to use. Defaults to the global tracer provider.
+    :param meter_provider: (optional) The meter provider to use. Defaults to the global meter provider.
+    """
+    self.tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+    meter = metrics.get_meter(__name__, meter_provider=meter_provider)
+    self.fetch_duration = meter.create_histogram(
+      "oso.filter.fetch.duration", unit="s", description="Time spent fetching each filter from Oso Cloud"
+    )
+    self.filter_size = meter.create_histogram(
+      "oso.filter.size", unit="By", description="Size of each filter's SQL"
+    )
+    self.cache_requests = meter.create_counter(
+      "oso.filter.cache.requests", unit="{request}", description="Filters requested, and whether they were cached"
+    )
+    self.models = meter.create_histogram(
+      "oso.statement.models", unit="{model}", description="Models authorized per statement"
+    )
+    self.execution_duration = meter.create_histogram(
+      "oso.statement.execution.duration", unit="s", description="Time spent executing authorized statements"
+    )
+
+  def _span(self, name: str, duration: float, attributes: dict):
+    """Record a span that ended just now."""
+    end_time = time.time_ns()
+    span = self.tracer.start_span(name, start_time=end_time - int(duration * 1e9), attributes=attributes)
+    span.end(end_time=end_time)
+
+  def filters_fetched(self, session: Optional["Session"], authorization: Authorization):
+    for fetch in authorization.fetches:
+      attributes = {"oso.resource_type": fetch.resource_type, "oso.action": fetch.action}
+      self.filter_size.record(fetch.size, attributes)
+      self.cache_requests.add(1, {**attributes, "oso.cache_hit": fetch.cache_hit, "oso.stale": fetch.stale})
+      if not fetch.cache_hit:
+        self.fetch_duration.record(fetch.duration, attributes)
+    self.models.record(authorization.models)
+    self._span("oso.fetch_filters", authorization.duration, {
+      "oso.models": authorization.models,
+      "oso.resource_types": [fetch.resource_type for fetch in authorization.fetches],
+      "oso.filter.size": sum(fetch.size for fetch in authorization.fetches),
+      "oso.cache_hits": sum(fetch.cache_hit for fetch in authorization.fetches),
+      "oso.stale_hits": sum(fetch.stale for fetch in authorization.fetches),
+    })
+
+  def statement_executed(self, session: "Session", execution: Execution):
+    self.execution_duration.record(execution.duration)
+    self._span("oso.execute", execution.duration, {
+      "oso.models": sum(authorization.models for authorization in execution.authorizations),
+      "oso.fetch_filters.duration": sum(authorization.duration for authorization in execution.authorizations),
+    })
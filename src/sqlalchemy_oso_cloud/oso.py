@@ -1,20 +1,43 @@
+import asyncio
+import hashlib
 import os
+from contextlib import contextmanager
+from functools import lru_cache
 from tempfile import NamedTemporaryFile
-from typing import Optional, TypedDict, Union
+from typing import (
+  TYPE_CHECKING,
+  Dict,
+  FrozenSet,
+  Iterator,
+  List,
+  Optional,
+  Tuple,
+  TypedDict,
+  Union,
+)
 
-import yaml
-from oso_cloud import Oso
-from sqlalchemy import select
+import sqlalchemy
+from sqlalchemy import Connection, Engine, MetaData, Select, select
+from sqlalchemy.engine import Dialect
+from sqlalchemy.engine.default import DefaultDialect
 from sqlalchemy.orm import ColumnProperty, Mapper, RelationshipProperty, registry
 from sqlalchemy.sql.elements import NamedColumn
 from sqlalchemy.sql.sqltypes import Boolean, Integer, String, TypeEngine
 
+from .breaker import CircuitBreaker
+from .cache import FilterCache
+from .materialize import AuthorizationTable
 from .orm import (
   _ATTRIBUTE_INFO_KEY,
   _RELATION_INFO_KEY,
   _REMOTE_RELATION_INFO_KEY,
   Resource,
 )
+from .planner import AuthorizationPlanner
+from .result_cache import ResultCache
+
+if TYPE_CHECKING:
+  from oso_cloud import Fact, IntoFact, IntoFactPattern, Oso, Value
 
 
 class FactConfig(TypedDict):
@@ -24,9 +47,59 @@ class LocalAuthorizationConfig(TypedDict):
   facts: dict[str, FactConfig]
   sql_types: dict[str, str]
 
-def generate_local_authorization_config(registry: registry) -> LocalAuthorizationConfig:
+def _fact_query_dialect(dialect: Dialect) -> Dialect:
+  """
+  A copy of `dialect` for rendering fact queries.
+
+  Fact queries are rendered with their values inline, and Oso Cloud embeds them in filters
+  that are later executed with `sqlalchemy.text`, so they must not use the dialect's
+  parameter style escaping (such as `%%` for `%` in `pyformat`).
+  """
+  fact_query_dialect = type(dialect)(paramstyle="named")  # type: ignore[call-arg]
+  fact_query_dialect.server_version_info = dialect.server_version_info
+  return fact_query_dialect
+
+def _to_sql(query: Select, dialect: Optional[Dialect]) -> str:
+  if dialect is None:
+    return str(query)
+  return str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+def _to_sql_type(column_type: TypeEngine, dialect: Optional[Dialect]) -> str:
+  if dialect is None:
+    return str(column_type)
+  return column_type.compile(dialect=dialect)
+
+def generate_local_authorization_config(registry: registry, dialect: Optional[Dialect] = None, fact_views: bool = False) -> LocalAuthorizationConfig:
+  """
+  Generate the Local Authorization configuration for the `.orm.Resource` models in a registry.
+
+  :param registry: The SQLAlchemy registry containing your models.
+  :param dialect: (optional) The dialect of the database the fact queries run on.
+    By default, fact queries are rendered with SQLAlchemy's generic default dialect.
+    Call this once per dialect if your models are stored in several kinds of database.
+  :param fact_views: (optional) If `True`, each fact query selects from the view created for it by `.views.create_fact_views`,
+    instead of from your tables.
+  """
+  if dialect is not None:
+    dialect = _fact_query_dialect(dialect)
+  facts, sql_types, view_names = _fact_bindings(registry, dialect)
+  if fact_views:
+    facts = {key: {"query": _fact_view_query(key, view_names[key], dialect)} for key in facts}
+
+  return {
+    "facts": facts,
+    "sql_types": sql_types,
+  }
+
+def _fact_bindings(registry: registry, dialect: Optional[Dialect]) -> Tuple[dict[str, FactConfig], dict[str, str], dict[str, str]]:
+  """
+  Generate the fact bindings for the `.orm.Resource` models in a registry.
+
+  :return: The fact queries and SQL types of `LocalAuthorizationConfig`, and the name of the view for each fact.
+  """
   facts: dict[str, FactConfig] = {}
   sql_types: dict[str, str] = {}
+  view_names: dict[str, str] = {}
 
   for mapper in registry.mappers:
     if not issubclass(mapper.class_, Resource):
@@ -37,27 +110,48 @@ def generate_local_authorization_config(registry: registry) -> LocalAuthorizatio
     if len(id.columns) != 1:
       raise ValueError("Oso id must be a single column")
     id_column = id.columns[0]
-    sql_types[mapper.class_.__name__] = str(id_column.type)
+    sql_types[mapper.class_.__name__] = _to_sql_type(id_column.type, dialect)
     for attr in mapper.attrs:
+      bindings: dict[str, FactConfig] = {}
+      view_key = attr.key
       if isinstance(attr, RelationshipProperty) and _RELATION_INFO_KEY in attr.info:
-        bindings = gen_relation_binding(attr, mapper, id_column)
-        facts.update(bindings)
+        bindings = gen_relation_binding(attr, mapper, id_column, dialect=dialect)
       elif isinstance(attr, ColumnProperty):
         if _ATTRIBUTE_INFO_KEY in attr.columns[0].info:
-          bindings = gen_attribute_binding(attr, mapper, id_column)
-          facts.update(bindings)
+          bindings = gen_attribute_binding(attr, mapper, id_column, dialect=dialect)
         elif _REMOTE_RELATION_INFO_KEY in attr.columns[0].info:
           remote_resource_name, remote_relation_key = attr.columns[0].info[_REMOTE_RELATION_INFO_KEY]
-          sql_types[remote_resource_name] = str(attr.columns[0].type)
-          bindings = gen_remote_relation_binding(attr, mapper, id_column, remote_resource_name, remote_relation_key)
-          facts.update(bindings)
+          sql_types[remote_resource_name] = _to_sql_type(attr.columns[0].type, dialect)
+          bindings = gen_remote_relation_binding(attr, mapper, id_column, remote_resource_name, remote_relation_key, dialect=dialect)
+          view_key = remote_relation_key or attr.columns[0].name.removesuffix("_id")
+      facts.update(bindings)
+      view_names.update((key, _fact_view_name(mapper, view_key)) for key in bindings)
 
-  return {
-    "facts": facts,
-    "sql_types": sql_types,
-  }
+  return facts, sql_types, view_names
+
+_MAX_IDENTIFIER_LENGTH = 63
+"""PostgreSQL's limit on the length of identifiers, which is the shortest of the databases we support."""
 
-def gen_relation_binding(relationship: RelationshipProperty, mapper: Mapper, id_column: NamedColumn) -> dict[str, FactConfig]:
+def _truncate_identifier(name: str) -> str:
+  """Shorten a name longer than `_MAX_IDENTIFIER_LENGTH`, ending it with a hash of the full name so that names stay distinct."""
+  if len(name) > _MAX_IDENTIFIER_LENGTH:
+    digest = hashlib.sha256(name.encode()).hexdigest()[:8]
+    name = f"{name[:_MAX_IDENTIFIER_LENGTH - len(digest) - 1]}_{digest}"
+  return name
+
+def _fact_view_name(mapper: Mapper, key: str) -> str:
+  """The name of the view for the fact bound to an attribute of a model, such as `oso_fact_document_status`."""
+  return _truncate_identifier(f"oso_fact_{mapper.class_.__tablename__}_{key}".lower())
+
+def _fact_view_columns(fact: str) -> List[str]:
+  """The columns of the view for a fact: one per variable argument, in order."""
+  return [f"arg_{i + 1}" for i in range(fact.count(":_"))]
+
+def _fact_view_query(fact: str, view_name: str, dialect: Optional[Dialect]) -> str:
+  preparer = (dialect or DefaultDialect()).identifier_preparer
+  return f"SELECT {', '.join(_fact_view_columns(fact))} FROM {preparer.quote(view_name)}"
+
+def gen_relation_binding(relationship: RelationshipProperty, mapper: Mapper, id_column: NamedColumn, dialect: Optional[Dialect] = None) -> dict[str, FactConfig]:
   remote = relationship.entity
   remote_id = remote.get_property("id")
   if not isinstance(remote_id, ColumnProperty):
@@ -69,11 +163,11 @@ def gen_relation_binding(relationship: RelationshipProperty, mapper: Mapper, id_
   query = select(id_column, remote_id_column).where(relationship.primaryjoin)
   return {
     key: {
-      "query": str(query),
+      "query": _to_sql(query, dialect),
     }
   }
 
-def gen_attribute_binding(attribute: ColumnProperty, mapper: Mapper, id_column: NamedColumn) -> dict[str, FactConfig]:
+def gen_attribute_binding(attribute: ColumnProperty, mapper: Mapper, id_column: NamedColumn, dialect: Optional[Dialect] = None) -> dict[str, FactConfig]:
   if len(attribute.columns) != 1:
     raise ValueError(f"Oso attribute {attribute.key} must be a single column")
   column = attribute.columns[0]
@@ -83,18 +177,18 @@ def gen_attribute_binding(attribute: ColumnProperty, mapper: Mapper, id_column:
     key = f"{attribute.key}({mapper.class_.__name__}:_)"
     return {
       key: {
-        "query": str(select(id_column).where(column)),
+        "query": _to_sql(select(id_column).where(column), dialect),
       }
     }
     
   key = f"has_{attribute.key}({mapper.class_.__name__}:_, {key_type}:_)"
   return {
     key: {
-      "query": str(select(id_column, column)),
+      "query": _to_sql(select(id_column, column), dialect),
     }
   }
 
-def gen_remote_relation_binding(attribute: ColumnProperty, mapper: Mapper, id_column: NamedColumn, remote_resource_name: str, remote_relation_key: Union[str, None]) -> dict[str, FactConfig]:
+def gen_remote_relation_binding(attribute: ColumnProperty, mapper: Mapper, id_column: NamedColumn, remote_resource_name: str, remote_relation_key: Union[str, None], dialect: Optional[Dialect] = None) -> dict[str, FactConfig]:
   if len(attribute.columns) != 1:
     raise ValueError(f"Oso remote relation {attribute.key} must be a single column")
   column = attribute.columns[0]
@@ -103,10 +197,110 @@ def gen_remote_relation_binding(attribute: ColumnProperty, mapper: Mapper, id_co
   key = f"has_relation({mapper.class_.__name__}:_, {remote_relation_key}, {remote_resource_name}:_)"
   return {
     key: {
-      "query": str(select(id_column, column)),
+      "query": _to_sql(select(id_column, column), dialect),
     }
   }
 
+def _fact_binding_tables(registry: registry) -> FrozenSet[str]:
+  """The tables that the fact queries generated by `generate_local_authorization_config` read from."""
+  tables: set[str] = set()
+  for mapper in registry.mappers:
+    if not issubclass(mapper.class_, Resource):
+      continue
+    tables.update(table.fullname for table in mapper.tables)
+    for relationship in mapper.relationships:
+      if _RELATION_INFO_KEY in relationship.info:
+        tables.update(table.fullname for table in relationship.mapper.tables)
+  return frozenset(tables)
+
+def _filter_column_types(metadata: MetaData) -> Dict[str, TypeEngine]:
+  """
+  The types of the columns that literals in the filters returned by Oso Cloud may be compared to,
+  by `table.column` and `schema.table.column`, and by column name where every table agrees on its type.
+  Keys are lowercase, as `.filters.filter_expression` looks them up.
+  """
+  column_types: Dict[str, TypeEngine] = {}
+  types_by_name: Dict[str, List[TypeEngine]] = {}
+  for table in metadata.tables.values():
+    for column in table.columns:
+      column_types[f"{table.name}.{column.name}".lower()] = column.type
+      column_types[f"{table.fullname}.{column.name}".lower()] = column.type
+      types_by_name.setdefault(column.name.lower(), []).append(column.type)
+  for name, types in types_by_name.items():
+    if len({repr(column_type) for column_type in types}) == 1:
+      column_types.setdefault(name, types[0])
+  return column_types
+
+@lru_cache(maxsize=None)
+def _generator_digest() -> str:
+  """
+  A digest of the source of the modules that generate the config, so that upgrading
+  this library never serves a config generated by a previous version.
+  """
+  from . import orm
+  digest = hashlib.sha256()
+  for module_file in (__file__, orm.__file__):
+    assert module_file is not None
+    with open(module_file, "rb") as f:
+      digest.update(f.read())
+  return digest.hexdigest()
+
+def _registry_fingerprint(registry: registry, dialect: Optional[Dialect], fact_views: bool = False) -> str:
+  """
+  A digest of everything in a registry that `generate_local_authorization_config` depends on,
+  which is much cheaper to compute than the config itself.
+  """
+  parts: List[str] = [_generator_digest(), sqlalchemy.__version__, f"fact_views={fact_views}"]
+  if dialect is not None:
+    parts.append(f"{dialect.name} {dialect.server_version_info}")
+  mappers = sorted(registry.mappers, key=lambda mapper: f"{mapper.class_.__module__}.{mapper.class_.__qualname__}")
+  for mapper in mappers:
+    if not issubclass(mapper.class_, Resource):
+      continue
+    parts.append(f"{mapper.class_.__name__} {mapper.local_table}")
+    for attr in mapper.attrs:
+      if isinstance(attr, RelationshipProperty) and _RELATION_INFO_KEY in attr.info:
+        parts.append(f"{attr.key} {attr.entity.class_.__name__} {attr.primaryjoin}")
+      elif isinstance(attr, ColumnProperty):
+        parts.extend(f"{attr.key} {column} {column.type!r} {column.info!r}" for column in attr.columns)
+  return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+@contextmanager
+def _local_authorization_config_file(
+  registry: registry,
+  dialect: Optional[Dialect],
+  cache_dir: Optional[str],
+  fact_views: bool = False,
+) -> Iterator[str]:
+  """
+  Provide a file with the Local Authorization configuration as YAML, to pass to the Oso client as `data_bindings`.
+
+  With `cache_dir`, the file is cached there, and reused by processes with the same models.
+  Otherwise, it is a temporary file that is deleted when the block exits.
+  """
+  if cache_dir is None:
+    with NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+      f.write(_dump_config(registry, dialect, fact_views))
+    try:
+      yield f.name
+    finally:
+      os.remove(f.name)
+    return
+
+  path = os.path.join(cache_dir, f"sqlalchemy-oso-cloud-{_registry_fingerprint(registry, dialect, fact_views)}.yaml")
+  if not os.path.exists(path):
+    config_yaml = _dump_config(registry, dialect, fact_views)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary file first, so that other processes never read a partially written config
+    with NamedTemporaryFile(mode="w", dir=cache_dir, suffix=".tmp", delete=False) as f:
+      f.write(config_yaml)
+    os.replace(f.name, path)
+  yield path
+
+def _dump_config(registry: registry, dialect: Optional[Dialect], fact_views: bool = False) -> str:
+  import yaml
+  return yaml.dump(generate_local_authorization_config(registry, dialect, fact_views))
+
 def to_polar_type(column_type: TypeEngine) -> str:
   if isinstance(column_type, Integer):
     return "Integer"
@@ -118,37 +312,136 @@ def to_polar_type(column_type: TypeEngine) -> str:
     raise ValueError(f"Unsupported type: {column_type}")
 
 
+class AsyncOso:
+  """
+  An asyncio counterpart to the Oso Cloud client created by `init`.
+
+  The Oso Cloud SDK only provides a blocking client, so each call runs on a worker thread.
+  Awaiting a call never blocks the event loop, and concurrent calls overlap.
+  """
+
+  def __init__(self, oso: "Oso"):
+    self.oso = oso
+    """The blocking client that this client delegates to."""
+
+  async def authorize(self, actor: "Value", action: str, resource: "Value", context_facts: Optional[List["IntoFact"]] = None) -> bool:
+    return await asyncio.to_thread(self.oso.authorize, actor, action, resource, context_facts)
+
+  async def list(self, actor: "Value", action: str, resource_type: str, context_facts: Optional[List["IntoFact"]] = None) -> List[str]:
+    return await asyncio.to_thread(self.oso.list, actor, action, resource_type, context_facts)
+
+  async def actions(self, actor: "Value", resource: "Value", context_facts: Optional[List["IntoFact"]] = None) -> List[str]:
+    return await asyncio.to_thread(self.oso.actions, actor, resource, context_facts)
+
+  async def insert(self, fact: "IntoFact"):
+    await asyncio.to_thread(self.oso.insert, fact)
+
+  async def delete(self, fact: "IntoFactPattern"):
+    await asyncio.to_thread(self.oso.delete, fact)
+
+  async def get(self, fact: "IntoFactPattern") -> List["Fact"]:
+    return await asyncio.to_thread(self.oso.get, fact)
+
+  async def list_local(self, actor: "Value", action: str, resource_type: str, column: str, context_facts: Optional[List["IntoFact"]] = None) -> str:
+    return await asyncio.to_thread(self.oso.list_local, actor, action, resource_type, column, context_facts)
+
+
 # TODO: what if they want multiple DBs/registries?
-oso: Optional[Oso] = None
+oso: Optional["Oso"] = None
+_async_oso: Optional[AsyncOso] = None
+_filter_cache: Optional[FilterCache] = None
+_planner: Optional[AuthorizationPlanner] = None
+_circuit_breaker: Optional[CircuitBreaker] = None
+_result_cache: Optional[ResultCache] = None
+_authorization_table: Optional[AuthorizationTable] = None
+_filter_column_types_by_name: Dict[str, TypeEngine] = {}
+_defer_authorization = False
 
-def init(registry: registry, **kwargs):
+def init(
+  registry: registry,
+  *,
+  dialect: Optional[Union[Dialect, Engine, Connection]] = None,
+  filter_cache: Optional[FilterCache] = None,
+  defer_authorization: bool = False,
+  planner: Optional[AuthorizationPlanner] = None,
+  circuit_breaker: Optional[CircuitBreaker] = None,
+  result_cache: Optional[ResultCache] = None,
+  authorization_table: Optional[AuthorizationTable] = None,
+  fact_views: bool = False,
+  config_cache_dir: Optional[str] = None,
+  **kwargs
+):
   """
   Initialize an Oso Cloud client configured to resolve authorization data from your
   database as specified in your ORM models.
   See `.orm` for more information on how to map your authorization data.
 
   :param registry: The SQLAlchemy registry containing your models. For example, `Base.registry`.
+  :param dialect: (optional) The engine, connection or dialect of the database your models are stored in.
+    Fact queries are compiled for this dialect, so the filters returned by Oso Cloud use its quoting
+    and SQL constructs. By default, they are compiled with SQLAlchemy's generic default dialect.
+  :param filter_cache: (optional) A `.FilterCache` to reuse authorization filters across queries.
+  :param defer_authorization: (optional) If `True`, `.authorized()` only records the actor and action,
+    and filters are fetched from Oso Cloud when the statement is executed by a SQLAlchemy session.
+    This makes authorized statements cheap to build, even if they are never executed.
+    Deferred statements can only be executed by an ORM session; compiling them any other way raises `CompileError`.
+  :param planner: (optional) An `.AuthorizationPlanner` that chooses how to authorize deferred top-k statements.
+    Requires `defer_authorization=True`.
+  :param circuit_breaker: (optional) A `.CircuitBreaker` that stops fetching filters from Oso Cloud while it is failing.
+  :param result_cache: (optional) A `.ResultCache` to serve repeated authorized statements from.
+  :param authorization_table: (optional) A `.AuthorizationTable` that filters statements for the actors
+    it materializes with a semi-join against their authorized resources, instead of fetching their filters.
+  :param fact_views: (optional) If `True`, fact queries select from the views created by `.views.create_fact_views`
+    instead of from your tables, which keeps the filters returned by Oso Cloud short.
+    Create the views (for example, in a migration) before authorizing any statements.
+  :param config_cache_dir: (optional) A directory to cache the generated Local Authorization configuration in,
+    so that processes with the same models skip generating it. Defaults to the `OSO_CONFIG_CACHE_DIR`
+    environment variable, if set.
   :param kwargs: Additional keyword arguments to pass to the Oso client constructor, such as `url` and `api_key`.
   """
-  global oso
+  global oso, _async_oso, _filter_cache, _defer_authorization, _planner, _circuit_breaker, _result_cache, _authorization_table
+  global _filter_column_types_by_name
   if oso is not None:
     raise RuntimeError("sqlalchemy_oso_cloud has already been initialized")
+  if planner is not None and not defer_authorization:
+    raise ValueError("planner requires defer_authorization=True")
   kwargs = { **kwargs }
   if "url" not in kwargs:
     kwargs["url"] = os.getenv("OSO_URL", "https://api.osohq.com")
   if "api_key" not in kwargs:
     kwargs["api_key"] = os.getenv("OSO_AUTH")
   if "data_bindings" in kwargs:
-    # just need to conditionally close/delete the temporary file if it was created
     raise NotImplementedError("manual data_bindings are not supported yet")
-  with NamedTemporaryFile(mode="w") as f:
-    config = generate_local_authorization_config(registry)
-    yaml.dump(config, f)
-    f.flush()
-    kwargs["data_bindings"] = f.name
-    oso = Oso(**kwargs)
-  
-def get_oso() -> Oso:
+  if config_cache_dir is None:
+    config_cache_dir = os.getenv("OSO_CONFIG_CACHE_DIR")
+  if isinstance(dialect, (Engine, Connection)):
+    dialect = dialect.dialect
+
+  from .client import _Client
+  with _local_authorization_config_file(registry, dialect, config_cache_dir, fact_views) as data_bindings:
+    client = _Client(**kwargs, data_bindings=data_bindings)
+  if filter_cache is not None and filter_cache.invalidate_on_write:
+    client.fact_listeners.append(filter_cache._on_facts_written)
+  if result_cache is not None:
+    result_cache._fact_tables = _fact_binding_tables(registry)
+    client.fact_listeners.append(result_cache._on_facts_written)
+  if authorization_table is not None:
+    authorization_table._fact_tables = _fact_binding_tables(registry)
+    client.fact_listeners.append(authorization_table._on_facts_written)
+  if result_cache is not None or authorization_table is not None:
+    from .auth import _listen_for_writes
+    _listen_for_writes()
+  _filter_cache = filter_cache
+  _defer_authorization = defer_authorization
+  _planner = planner
+  _circuit_breaker = circuit_breaker
+  _result_cache = result_cache
+  _authorization_table = authorization_table
+  _filter_column_types_by_name = _filter_column_types(registry.metadata)
+  _async_oso = AsyncOso(client)
+  oso = client
+
+def get_oso() -> "Oso":
   """
   Get the Oso Cloud client that was created with `init`.
 
@@ -158,3 +451,58 @@ def get_oso() -> Oso:
   if oso is None:
     raise RuntimeError("sqlalchemy_oso_cloud must be initialized before getting the Oso client")
   return oso
+
+def get_async_oso() -> AsyncOso:
+  """
+  Get the asyncio counterpart to the Oso Cloud client that was created with `init`.
+
+  :return: The asyncio Oso Cloud client.
+  """
+  if _async_oso is None:
+    raise RuntimeError("sqlalchemy_oso_cloud must be initialized before getting the Oso client")
+  return _async_oso
+
+def get_filter_cache() -> Optional[FilterCache]:
+  """
+  Get the `.FilterCache` that was passed to `init`, if any.
+
+  :return: The filter cache, or `None` if filters are not cached.
+  """
+  return _filter_cache
+
+def is_authorization_deferred() -> bool:
+  """
+  Whether `.authorized()` defers fetching filters until statements are executed.
+  See the `defer_authorization` argument to `init`.
+  """
+  return _defer_authorization
+
+def get_planner() -> Optional[AuthorizationPlanner]:
+  """
+  Get the `.AuthorizationPlanner` that was passed to `init`, if any.
+  """
+  return _planner
+
+def get_result_cache() -> Optional[ResultCache]:
+  """
+  Get the `.ResultCache` that was passed to `init`, if any.
+  """
+  return _result_cache
+
+def get_authorization_table() -> Optional[AuthorizationTable]:
+  """
+  Get the `.AuthorizationTable` that was passed to `init`, if any.
+  """
+  return _authorization_table
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+  """
+  Get the `.CircuitBreaker` that was passed to `init`, if any.
+  """
+  return _circuit_breaker
+
+def _get_filter_column_types() -> Dict[str, TypeEngine]:
+  """
+  Get the column types that filter parameters are typed from, for the registry that was passed to `init`.
+  """
+  return _filter_column_types_by_name
@@ -0,0 +1,161 @@
+"""
+Chooses how to authorize top-k statements, based on how each strategy has performed.
+
+A statement like `select(Document).order_by(Document.created_at.desc()).limit(10).authorized(user, "read")`
+can be authorized in two ways:
+
+- `filter`: apply the authorization filter to the statement, as usual.
+  The database has to evaluate the filter's subqueries as part of the statement,
+  which can cost far more than the cheap, indexed ordering.
+- `candidates`: run the statement without the filter to fetch a few times `k` candidate rows,
+  check which candidates are authorized with one query that applies the filter to just their primary keys,
+  and run the statement again restricted to the authorized candidates.
+  If too few candidates are authorized, the statement falls back to `filter`.
+
+Both strategies return the same rows. Pass an `AuthorizationPlanner` to `.init` to choose between them
+for each statement, based on its limit, the share of candidates that were authorized and the time each strategy took:
+
+    sqlalchemy_oso_cloud.init(Base.registry, defer_authorization=True, planner=AuthorizationPlanner())
+
+Only deferred statements are planned (see `.init`), since planning needs the session that executes them,
+and only statements over one authorized model with a `LIMIT`, without `GROUP BY`, `HAVING`, `DISTINCT` or loader options.
+"""
+import threading
+from math import ceil
+from typing import Dict, NamedTuple, Optional, Tuple
+
+__all__ = ["AuthorizationPlanner", "PlanStats"]
+
+FILTER = "filter"
+CANDIDATES = "candidates"
+
+
+class PlanStats(NamedTuple):
+  """What the planner has observed about authorizing an action on a resource type."""
+
+  statements: int
+  """The number of statements planned."""
+  filter_seconds: Optional[float]
+  """The moving average time to run a statement with the `filter` strategy, if it has been used."""
+  candidates_seconds: Optional[float]
+  """The moving average time to run a statement with the `candidates` strategy, including fallbacks, if it has been used."""
+  pass_rate: Optional[float]
+  """The moving average share of candidates that were authorized, if the `candidates` strategy has been used."""
+
+
+class AuthorizationPlanner:
+  """
+  A thread-safe planner that chooses between the `filter` and `candidates` strategies
+  for each resource type and action.
+
+  Until both strategies have been timed, each is tried in turn.
+  After that, the faster one is used, except for every `explore_every`th statement,
+  which uses the slower one to notice if it has become faster.
+  """
+
+  def __init__(
+    self,
+    max_limit: int = 100,
+    overfetch: float = 3.0,
+    max_candidates: int = 1000,
+    smoothing: float = 0.2,
+    explore_every: int = 20,
+  ):
+    """
+    :param max_limit: Statements whose `LIMIT` (plus `OFFSET`) is larger than this always use the `filter` strategy.
+    :param overfetch: Candidates to fetch per row, until the share of candidates that are authorized is known.
+    :param max_candidates: The most candidates to fetch. If more would be needed, the `filter` strategy is used.
+    :param smoothing: The weight of each new observation in the moving averages, between 0 and 1.
+    :param explore_every: How often to use the slower strategy, or 0 to never do so.
+    """
+    if not 0 < smoothing <= 1:
+      raise ValueError("smoothing must be greater than 0 and at most 1")
+    if overfetch < 1:
+      raise ValueError("overfetch must be at least 1")
+    self.max_limit = max_limit
+    self.overfetch = overfetch
+    self.max_candidates = max_candidates
+    self.smoothing = smoothing
+    self.explore_every = explore_every
+    self._stats: Dict[Tuple[str, str], PlanStats] = {}
+    self._lock = threading.Lock()
+
+  def stats(self, resource_type: str, action: str) -> Optional[PlanStats]:
+    """
+    What the planner has observed about authorizing `action` on `resource_type`, or `None` if nothing yet.
+    """
+    with self._lock:
+      return self._stats.get((resource_type, action))
+
+  def reset(self):
+    """
+    Forget every observation.
+    """
+    with self._lock:
+      self._stats.clear()
+
+  def choose(self, resource_type: str, action: str, rows: int) -> Tuple[str, int]:
+    """
+    Choose a strategy for a statement.
+
+    :param resource_type: The resource type the statement is authorized on.
+    :param action: The action the statement is authorized for.
+    :param rows: The number of rows the statement needs: its `LIMIT` plus its `OFFSET`.
+    :return: The strategy, `"filter"` or `"candidates"`, and the number of candidates to fetch.
+    """
+    with self._lock:
+      stats = self._stats.get((resource_type, action), PlanStats(0, None, None, None))
+      stats = self._stats[(resource_type, action)] = stats._replace(statements=stats.statements + 1)
+
+    exploring = bool(self.explore_every) and stats.statements % self.explore_every == 0
+    if rows > self.max_limit:
+      return FILTER, 0
+    if stats.pass_rate is None:
+      candidates = ceil(rows * self.overfetch)
+    elif stats.pass_rate > 0:
+      # Leave some headroom, so that a statement rarely has to fall back to the filter.
+      candidates = ceil(rows / stats.pass_rate * 1.5)
+    else:
+      candidates = self.max_candidates + 1
+    if candidates > self.max_candidates:
+      # Too few candidates are authorized. Check now and then whether that has changed.
+      return (CANDIDATES, self.max_candidates) if exploring else (FILTER, 0)
+
+    if stats.candidates_seconds is None:
+      return CANDIDATES, candidates
+    if stats.filter_seconds is None:
+      return FILTER, 0
+    faster = CANDIDATES if stats.candidates_seconds < stats.filter_seconds else FILTER
+    if exploring:
+      return (FILTER, 0) if faster == CANDIDATES else (CANDIDATES, candidates)
+    return faster, (candidates if faster == CANDIDATES else 0)
+
+  def record(
+    self,
+    resource_type: str,
+    action: str,
+    strategy: str,
+    seconds: float,
+    candidates: int = 0,
+    authorized: int = 0,
+  ):
+    """
+    Record how a strategy performed for a statement.
+
+    :param strategy: The strategy that was used.
+    :param seconds: The time it took to authorize and run the statement.
+    :param candidates: For the `candidates` strategy, the number of candidates fetched.
+    :param authorized: For the `candidates` strategy, the number of candidates that were authorized.
+    """
+    def average(previous: Optional[float], value: float) -> float:
+      return value if previous is None else previous + self.smoothing * (value - previous)
+
+    with self._lock:
+      stats = self._stats.get((resource_type, action), PlanStats(0, None, None, None))
+      if strategy == FILTER:
+        stats = stats._replace(filter_seconds=average(stats.filter_seconds, seconds))
+      else:
+        stats = stats._replace(candidates_seconds=average(stats.candidates_seconds, seconds))
+        if candidates:
+          stats = stats._replace(pass_rate=average(stats.pass_rate, authorized / candidates))
+      self._stats[(resource_type, action)] = stats
@@ -1,15 +1,16 @@
-from typing import Optional, Type, TypeVar
+from typing import TYPE_CHECKING, Any, Optional, Sequence, Type, TypeVar
 
 import sqlalchemy.orm
-from oso_cloud import Value
 
-from .auth import _apply_authorization_options
+from .auth import Actions, _apply_authorization_options, _apply_permission_columns
 from .oso import get_oso
 
+if TYPE_CHECKING:
+  from oso_cloud import Value
+
 T = TypeVar("T")
 Self = TypeVar("Self", bound="Query")
 
-#TODO - multiple permissions for multiple main models
 class Query(sqlalchemy.orm.Query[T]):
   """
   An extension of [`sqlalchemy.orm.Query`](https://docs.sqlalchemy.org/orm/queryguide/query.html#sqlalchemy%2Eorm%2EQuery)
@@ -20,14 +21,34 @@ class Query(sqlalchemy.orm.Query[T]):
       super().__init__(*args, **kwargs)
       self.oso = get_oso()
 
-  def authorized(self: Self, actor: Value, action: str, model: Optional[Type] = None ) -> Self:
+  def authorized(self: Self, actor: "Value", action: Actions, model: Optional[Type] = None ) -> Self:
     """
     Filter the query to only include resources that the given actor is authorized to perform the given action on.
 
     :param actor: The actor performing the action.
-    :param action: The action the actor is performing.
+    :param action: The action the actor is performing, or a mapping from model to action,
+      such as `{Document: "read", Organization: "view"}`, to authorize a different action on each model.
+      The filters for all of the models are fetched in one step.
+    :param model: (optional) The only model to authorize. By default, every Resource model in the query is authorized.
 
     :return: A new query that includes only the resources that the actor is authorized to perform the action on.
     """
     return _apply_authorization_options(self, actor, action, model)
   
+
+  def with_permissions(self, actor: "Value", actions: Sequence[str], model: Optional[Type] = None) -> "Query[Any]":
+    """
+    Filter the query on the first action, and add a boolean column for each of the other actions
+    that says whether the actor may perform it on the row.
+
+    The filters for every action are fetched from Oso Cloud in one step,
+    and the permissions are evaluated by the database in the same query.
+
+    :param actor: The actor performing the actions.
+    :param actions: The actions to check. Rows are filtered on the first one.
+    :param model: (optional) The model to add the permission columns for.
+      Required if the query selects several Resource models.
+
+    :return: A new query whose rows are the original entities followed by one column per additional action.
+    """
+    return _apply_permission_columns(self, actor, actions, model)
@@ -0,0 +1,283 @@
+"""
+Caching for the results of authorized statements.
+
+Pass a `ResultCache` to `.init` to serve repeated authorized `SELECT`s from a cache
+instead of the database:
+
+    sqlalchemy_oso_cloud.init(Base.registry, result_cache=ResultCache(LRUBackend(maxsize=10_000), ttl=30))
+
+Every authorized `SELECT` executed by an ORM session is cached, unless it is executed with
+`execution_options(cache_results=False)`, locks rows (`with_for_update`) or refreshes loaded instances
+(`populate_existing`). Results are cached by the database the statement is executed on, and by the statement's
+SQLAlchemy cache key and parameters, which include the authorization filter, so each actor gets their own results.
+
+Cached results are never served stale because of writes that this process can see:
+
+- When a session commits, the results read from any table it wrote to are invalidated.
+  Until then, the session itself bypasses the cache, since it can see its own uncommitted writes.
+- When facts are inserted or deleted through the client created by `.init`, every result is invalidated.
+
+Results read from a table that the statement's authorization filter reads from (the tables of your
+`.orm` fact bindings) are invalidated by writes to those tables too.
+Writes that don't go through an ORM session, or that are made by other processes with an in-process backend,
+are not detected; `ttl` bounds how long they can go unnoticed. Use `RedisBackend` to share the cache,
+and its invalidations, between processes.
+"""
+import copyreg
+import hashlib
+import hmac
+import io
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+  TYPE_CHECKING,
+  Any,
+  FrozenSet,
+  Iterable,
+  List,
+  NamedTuple,
+  Optional,
+  Sequence,
+  Tuple,
+)
+
+from sqlalchemy.engine import FrozenResult
+from sqlalchemy.orm import InstanceState
+from sqlalchemy.util import LRUCache
+
+if TYPE_CHECKING:
+  from sqlalchemy import ClauseElement
+
+__all__ = ["ResultCache", "ResultCacheBackend", "LRUBackend", "RedisBackend", "ResultCacheStats"]
+
+_EVERYTHING = "*"
+"""The version that `ResultCache.invalidate()` bumps to invalidate every result."""
+
+_FACTS = "oso:facts"
+"""The version that fact writes bump."""
+
+
+class ResultCacheBackend:
+  """
+  Where a `ResultCache` stores results, and the versions of the tables they were read from.
+
+  A result is stored under a key that includes the versions of the tables it was read from,
+  so bumping a table's version invalidates every result read from it without finding them.
+  Subclass this to store results somewhere other than `LRUBackend` or `RedisBackend`.
+  """
+
+  def get(self, key: str) -> Optional[bytes]:
+    """Get a stored result, or `None` if there is none."""
+    raise NotImplementedError
+
+  def set(self, key: str, value: bytes, ttl: Optional[float]):
+    """Store a result for `ttl` seconds, or until it is evicted if `ttl` is `None`."""
+    raise NotImplementedError
+
+  def versions(self, names: Sequence[str]) -> List[int]:
+    """Get the current versions of tables, which start at 0."""
+    raise NotImplementedError
+
+  def bump(self, names: Iterable[str]):
+    """Increment the versions of tables."""
+    raise NotImplementedError
+
+
+class LRUBackend(ResultCacheBackend):
+  """
+  A bounded, thread-safe, in-process backend that evicts the least recently used result when it is full.
+  """
+
+  def __init__(self, maxsize: int = 1024):
+    """
+    :param maxsize: The maximum number of results to keep.
+    """
+    if maxsize < 1:
+      raise ValueError("maxsize must be at least 1")
+    self.maxsize = maxsize
+    self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+    self._versions: dict[str, int] = {}
+    self._lock = threading.Lock()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._entries)
+
+  def get(self, key: str) -> Optional[bytes]:
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at is not None and expires_at <= time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key: str, value: bytes, ttl: Optional[float]):
+    expires_at = None if ttl is None else time.monotonic() + ttl
+    with self._lock:
+      self._entries[key] = (value, expires_at)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+  def versions(self, names: Sequence[str]) -> List[int]:
+    with self._lock:
+      return [self._versions.get(name, 0) for name in names]
+
+  def bump(self, names: Iterable[str]):
+    with self._lock:
+      for name in names:
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class RedisBackend(ResultCacheBackend):
+  """
+  A backend that stores results in Redis, or any server that speaks its protocol,
+  so that processes share results and invalidations.
+
+  Results are evicted by Redis, according to its `maxmemory-policy`, or when their `ttl` runs out.
+
+  Results are stored pickled, and unpickling data can run arbitrary code, so only use a server
+  that untrusted clients can't write to. Pass a `secret` to sign every result, so that results
+  that weren't stored by a process with the same secret are ignored.
+  """
+
+  def __init__(self, client: Any, prefix: str = "sqlalchemy_oso_cloud:", secret: Optional[bytes] = None):
+    """
+    :param client: A client with the interface of [`redis.Redis`](https://redis.readthedocs.io/),
+      such as `redis.Redis.from_url("redis://localhost:6379")`. Only `get`, `set`, `mget` and `incr` are used.
+    :param prefix: A prefix for every key this backend stores.
+    :param secret: (optional) A key to sign results with, shared by every process that uses the cache.
+    """
+    self.client = client
+    self.prefix = prefix
+    self.secret = secret
+
+  def _signature(self, key: str, value: bytes) -> bytes:
+    assert self.secret is not None
+    return hmac.new(self.secret, key.encode() + b"\0" + value, hashlib.sha256).digest()
+
+  def get(self, key: str) -> Optional[bytes]:
+    value = self.client.get(f"{self.prefix}result:{key}")
+    if value is None or self.secret is None:
+      return value
+    signature, value = value[:32], value[32:]
+    if not hmac.compare_digest(signature, self._signature(key, value)):
+      return None
+    return value
+
+  def set(self, key: str, value: bytes, ttl: Optional[float]):
+    if self.secret is not None:
+      value = self._signature(key, value) + value
+    self.client.set(f"{self.prefix}result:{key}", value, px=None if ttl is None else max(1, int(ttl * 1000)))
+
+  def versions(self, names: Sequence[str]) -> List[int]:
+    values = self.client.mget([f"{self.prefix}version:{name}" for name in names])
+    return [int(value) if value is not None else 0 for value in values]
+
+  def bump(self, names: Iterable[str]):
+    for name in names:
+      self.client.incr(f"{self.prefix}version:{name}")
+
+
+class ResultCacheStats(NamedTuple):
+  """How often results were found in a `ResultCache`."""
+
+  hits: int
+  """Results served from the cache."""
+  misses: int
+  """Results that had to be read from the database."""
+  bypassed: int
+  """Statements executed by a session with uncommitted writes, which doesn't use the cache."""
+
+
+class _Pickler(pickle.Pickler):
+  """
+  Pickles results without the loader options of their ORM instances.
+
+  The options include the authorization filter, which can't be pickled,
+  and are discarded anyway when a cached result is merged into a session.
+  """
+
+  def reducer_override(self, obj):
+    if isinstance(obj, InstanceState):
+      state = obj.__getstate__()
+      state.pop("load_options", None)
+      state.pop("load_path", None)
+      return copyreg.__newobj__, (type(obj),), state
+    return NotImplemented
+
+
+class ResultCache:
+  """
+  A cache of the results of authorized statements. See the module documentation.
+  """
+
+  def __init__(self, backend: Optional[ResultCacheBackend] = None, ttl: Optional[float] = 30.0, max_rows: int = 1000):
+    """
+    :param backend: (optional) Where to store results. Defaults to an `LRUBackend` with its default size.
+    :param ttl: How many seconds a result may be served for, or `None` to keep results until they are evicted or invalidated.
+    :param max_rows: Results with more rows than this are not cached.
+    """
+    self.backend = backend if backend is not None else LRUBackend()
+    self.ttl = ttl
+    self.max_rows = max_rows
+    self._fact_tables: FrozenSet[str] = frozenset()
+    self._statements: LRUCache = LRUCache(1024)
+    self._stats = ResultCacheStats(0, 0, 0)
+    self._lock = threading.Lock()
+
+  def stats(self) -> ResultCacheStats:
+    """
+    How often results were served from the cache, read from the database or bypassed the cache, since it was created.
+    """
+    with self._lock:
+      return self._stats
+
+  def _count(self, **counts: int):
+    with self._lock:
+      self._stats = self._stats._replace(**{name: getattr(self._stats, name) + count for name, count in counts.items()})
+
+  def invalidate(self, tables: Optional[Iterable[str]] = None):
+    """
+    Invalidate cached results, for writes that the cache can't detect.
+
+    :param tables: (optional) Only invalidate results read from these tables, given by name. By default, invalidate every result.
+    """
+    self.backend.bump([_EVERYTHING] if tables is None else tables)
+
+  def _key(self, statement: "ClauseElement", parameters: Any, tables: FrozenSet[str], database: str) -> str:
+    """
+    The key to cache a statement's result under: the database it is executed on, its SQL and parameters,
+    including its authorization filter, and the current versions of the tables it reads from.
+    """
+    names = sorted(tables | self._fact_tables | {_EVERYTHING, _FACTS})
+    cache_key = statement._generate_cache_key()
+    assert cache_key is not None
+    sql = cache_key.to_offline_string(self._statements, statement, parameters or {})
+    versions = self.backend.versions(names)
+    return hashlib.sha256(repr((database, sql, names, versions)).encode()).hexdigest()
+
+  def _get(self, key: str) -> Optional[FrozenResult]:
+    value = self.backend.get(key)
+    if value is None:
+      self._count(misses=1)
+      return None
+    self._count(hits=1)
+    return pickle.loads(value)
+
+  def _set(self, key: str, result: FrozenResult):
+    if len(result.data) > self.max_rows:
+      return
+    buffer = io.BytesIO()
+    _Pickler(buffer, pickle.HIGHEST_PROTOCOL).dump(result)
+    self.backend.set(key, buffer.getvalue(), self.ttl)
+
+  def _on_facts_written(self, facts: Iterable[Any]):
+    """Invalidate every result when facts are written through the Oso client, since they may change any filter."""
+    self.backend.bump([_FACTS])
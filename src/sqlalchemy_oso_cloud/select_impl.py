@@ -1,9 +1,17 @@
-from typing import TypeVar
+from typing import TYPE_CHECKING, Optional, Sequence, Type, TypeVar
 
 import sqlalchemy.sql
-from oso_cloud import Value
 
-from .auth import _apply_authorization_options
+from .auth import (
+    Actions,
+    _apply_authorization_options,
+    _apply_authorization_options_async,
+    _apply_permission_columns,
+    _apply_permission_columns_async,
+)
+
+if TYPE_CHECKING:
+    from oso_cloud import Value
 
 Self = TypeVar("Self", bound="Select")
 
@@ -17,9 +25,48 @@ class Select(sqlalchemy.sql.Select):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
     
-    def authorized(self: Self, actor: Value, action: str) -> Self:
-        """Add authorization filtering to the select statement"""
+    def authorized(self: Self, actor: "Value", action: Actions) -> Self:
+        """
+        Add authorization filtering to the select statement
+
+        `action` is either one action to authorize on every Resource model in the statement,
+        or a mapping from model to action, such as `{Document: "read", Organization: "view"}`.
+        Either way, the filters for all of the models are fetched in one step.
+        """
         return _apply_authorization_options(self, actor, action)
+
+    async def authorized_async(self: Self, actor: "Value", action: Actions) -> Self:
+        """
+        Add authorization filtering to the select statement,
+        awaiting Oso Cloud instead of blocking the event loop
+        """
+        return await _apply_authorization_options_async(self, actor, action)
+
+    def with_permissions(self: Self, actor: "Value", actions: Sequence[str], model: Optional[Type] = None) -> Self:
+        """
+        Filter the select statement on the first action, and add a boolean column for each of the other actions
+        that says whether the actor may perform it on the row.
+
+        The filters for every action are fetched from Oso Cloud in one step, and the permissions are
+        evaluated by the database in the same query. Unlike `authorized`, filters are never deferred.
+
+        Example:
+            stmt = select(Document).with_permissions(user, ["read", "write", "delete"])
+            for document, can_write, can_delete in session.execute(stmt):
+                ...
+
+        :param actor: The actor performing the actions.
+        :param actions: The actions to check. Rows are filtered on the first one.
+        :param model: (optional) The model to add the permission columns for.
+          Required if the statement selects several Resource models.
+        """
+        return _apply_permission_columns(self, actor, actions, model)
+
+    async def with_permissions_async(self: Self, actor: "Value", actions: Sequence[str], model: Optional[Type] = None) -> Self:
+        """
+        Like `with_permissions`, but awaits Oso Cloud instead of blocking the event loop.
+        """
+        return await _apply_permission_columns_async(self, actor, actions, model)
     
     
 def select(*args, **kwargs) -> Select:
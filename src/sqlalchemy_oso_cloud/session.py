@@ -1,11 +1,26 @@
-from typing import Any, Tuple, Type, TypeVar, Union, overload
+from typing import (
+  TYPE_CHECKING,
+  Any,
+  Iterable,
+  Iterator,
+  List,
+  Tuple,
+  Type,
+  TypeVar,
+  Union,
+  overload,
+)
 
 import sqlalchemy.orm
 from sqlalchemy.engine import Row
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
+from .auth import Actions, _authorize_objects, _stream_authorized
 from .query import Query
 
+if TYPE_CHECKING:
+  from oso_cloud import Value
+
 T = TypeVar("T")
 T1 = TypeVar("T1")
 T2 = TypeVar("T2")
@@ -81,3 +96,44 @@ class Session(sqlalchemy.orm.Session):
       All other queries types return Query[Any].
       """
       return super().query(*entities, **kwargs)
+
+  def authorize_objects(self, actor: "Value", action: str, objects: Iterable[T]) -> List[T]:
+    """
+    Filter instances that have already been loaded down to the ones an actor is authorized for.
+
+    Useful for instances loaded without `.authorized()`, such as identity map hits,
+    relationship collections or instances from a cache. Instead of one `authorize` call per instance,
+    this runs one query per model, selecting the primary keys of the instances that pass the model's
+    authorization filter. Models with more than 10,000 instances are checked in chunks of 10,000,
+    to stay under the database's limit on parameters.
+
+    :param actor: The actor performing the action.
+    :param action: The action the actor is performing.
+    :param objects: Persistent instances of `.orm.Resource` models, which may be of different models.
+    :return: The authorized instances, in the order they were given.
+    """
+    return _authorize_objects(self, actor, action, list(objects))
+
+  def stream_authorized(self, statement: sqlalchemy.Select, actor: "Value", action: Actions, chunk_size: int = 1000) -> Iterator[Any]:
+    """
+    Iterate over every authorized result of a statement with bounded memory,
+    for jobs like exports that read far more rows than fit in memory.
+
+    The authorization filters are fetched once. The statement is then run once per chunk of `chunk_size` rows,
+    in order of the primary keys of every model it selects, each chunk starting after the last row of the one before.
+    So that those primary keys identify every row, the statement must select the model of every table it joins,
+    and must not use outer joins. After each chunk has been iterated over, its instances are expunged from the session,
+    unless they have been modified.
+
+    Example:
+        for document in session.stream_authorized(select(Document), service_account, "read"):
+            export(document)
+
+    :param statement: The statement to run. It must select a Resource model and the model of every table it joins,
+      and must not have an outer join, an `ORDER BY`, `LIMIT` or `OFFSET`.
+    :param actor: The actor performing the action.
+    :param action: The action the actor is performing, or a mapping from model to action (see `.Select.authorized`).
+    :param chunk_size: (optional) The number of rows to fetch at a time.
+    :return: An iterator over instances if the statement selects a single model, otherwise over rows.
+    """
+    return _stream_authorized(self, statement, actor, action, chunk_size)
@@ -0,0 +1,177 @@
+"""
+Authorized nearest-neighbor search for [pgvector](https://github.com/pgvector/pgvector).
+
+Filtering an approximate nearest-neighbor search on authorization is a trade-off.
+With an HNSW or IVFFlat index, `select(Document).order_by(distance).authorized(user, "read").limit(k)`
+either makes PostgreSQL skip the index and compute the distance to every authorized row,
+or use the index and return fewer than `k` rows once the unauthorized ones are filtered out.
+
+`authorized_nearest` manages that trade-off:
+
+    documents = authorized_nearest(session, Document, Document.embedding, embedding, 10, user, "read")
+
+It returns the `k` nearest authorized rows (fewer only if fewer exist), nearest first, using one of several strategies:
+
+| Strategy | |
+| --- | --- |
+| `overfetch` | Fetch the nearest `k * overfetch` candidates with the index, keep the authorized ones, and fetch more candidates until there are `k`, up to `max_candidates`. Then, or if the index returns fewer candidates than asked for, fall back to `prefilter`. |
+| `auto` | Like `overfetch`, but size the next round from the share of candidates that were authorized, and go straight to `prefilter` if even `max_candidates` candidates are unlikely to be enough. |
+| `prefilter` | Filter on authorization first, then sort the authorized rows by distance. Exact, but doesn't use the vector index. |
+| `iterative` | Use pgvector's iterative index scans (pgvector 0.8+), which keep scanning the index until `k` rows pass the filter. |
+"""
+from contextlib import contextmanager
+from math import ceil
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Sequence, Type, TypeVar
+
+import sqlalchemy.orm
+from sqlalchemy import func
+from sqlalchemy.orm.interfaces import ORMOption
+
+from .auth import _authorize_models_in_session
+
+if TYPE_CHECKING:
+  from oso_cloud import Value
+
+__all__ = ["authorized_nearest"]
+
+T = TypeVar("T")
+
+STRATEGIES = ("auto", "overfetch", "prefilter", "iterative")
+
+# The largest `hnsw.ef_search` pgvector accepts. Without raising `ef_search`,
+# an HNSW index scan returns at most 40 rows, however many candidates are asked for.
+_MAX_EF_SEARCH = 1000
+
+
+@contextmanager
+def _local_settings(session: sqlalchemy.orm.Session, settings: Dict[str, str]) -> Iterator[None]:
+  """Change PostgreSQL settings for the statements run inside the block, then change them back."""
+  if not settings or session.connection().dialect.name != "postgresql":
+    yield
+    return
+  previous = session.execute(sqlalchemy.select(*[func.current_setting(name, True) for name in settings])).one()
+  session.execute(sqlalchemy.select(*[func.set_config(name, value, True) for name, value in settings.items()]))
+  try:
+    yield
+  finally:
+    restore = {name: value for name, value in zip(settings, previous) if value is not None}
+    if restore:
+      session.execute(sqlalchemy.select(*[func.set_config(name, value, True) for name, value in restore.items()]))
+
+
+def _nearest_authorized(
+  session: sqlalchemy.orm.Session,
+  model: Type[T],
+  distance: Any,
+  k: int,
+  authorization: List[ORMOption],
+  candidates: Any = None,
+) -> List[T]:
+  statement = sqlalchemy.select(model)
+  if candidates is not None:
+    statement = statement.where(candidates)
+  statement = statement.order_by(distance).limit(k).options(*authorization)
+  return list(session.execute(statement).scalars())
+
+
+def _candidates(session: sqlalchemy.orm.Session, model: Type, table_distance: Any, n: int) -> List[Sequence[Any]]:
+  """The primary keys of the `n` rows nearest to the query vector, found with the vector index."""
+  primary_key = sqlalchemy.inspect(model).primary_key
+  statement = sqlalchemy.select(*primary_key).order_by(table_distance).limit(n)
+  with _local_settings(session, {"hnsw.ef_search": str(min(max(n, 40), _MAX_EF_SEARCH))}):
+    return [tuple(row) for row in session.execute(statement)]
+
+
+def _in_candidates(model: Type, candidates: List[Sequence[Any]]) -> Any:
+  primary_key = sqlalchemy.inspect(model).primary_key
+  if len(primary_key) == 1:
+    return primary_key[0].in_([candidate[0] for candidate in candidates])
+  return sqlalchemy.tuple_(*primary_key).in_(candidates)
+
+
+def authorized_nearest(
+  session: sqlalchemy.orm.Session,
+  model: Type[T],
+  column: Any,
+  query_vector: Any,
+  k: int,
+  actor: "Value",
+  action: str,
+  distance: str = "l2_distance",
+  strategy: str = "auto",
+  overfetch: int = 4,
+  max_candidates: int = _MAX_EF_SEARCH,
+) -> List[T]:
+  """
+  Find the `k` authorized rows nearest to a vector.
+
+  :param session: The session to query with.
+  :param model: The `.orm.Resource` model to search.
+  :param column: The model's vector column, such as `Document.embedding`.
+  :param query_vector: The vector to find the nearest rows to.
+  :param k: The number of rows to return.
+  :param actor: The actor performing the action.
+  :param action: The action the actor is performing.
+  :param distance: (optional) The pgvector distance to order by: `l2_distance` (default), `cosine_distance`,
+    `max_inner_product`, `l1_distance`, `hamming_distance` or `jaccard_distance`.
+  :param strategy: (optional) `auto` (default), `overfetch`, `prefilter` or `iterative`. See the module documentation.
+  :param overfetch: (optional) For `auto` and `overfetch`, the number of candidates to fetch per result in the first round.
+  :param max_candidates: (optional) For `auto` and `overfetch`, the most candidates to fetch before falling back to `prefilter`,
+    at most 1000 (the default), the largest `hnsw.ef_search`.
+  :return: Up to `k` authorized rows, nearest first. Fewer than `k` only if fewer than `k` are authorized.
+  """
+  if strategy not in STRATEGIES:
+    raise ValueError(f"Unknown strategy {strategy!r}. Expected one of: {', '.join(STRATEGIES)}")
+  if max_candidates > _MAX_EF_SEARCH:
+    raise ValueError(f"max_candidates can be at most {_MAX_EF_SEARCH}, the most rows an HNSW index scan can return")
+  if k <= 0:
+    return []
+  model_distance = getattr(column, distance)(query_vector)
+  # Fetch the filter once, rather than once per round of candidates.
+  authorization = _authorize_models_in_session([(model, actor, action)], session)
+
+  if strategy == "prefilter":
+    return _nearest_authorized(session, model, model_distance, k, authorization)
+
+  if strategy == "iterative":
+    if session.connection().dialect.name != "postgresql":
+      raise ValueError("The iterative strategy requires PostgreSQL with pgvector 0.8 or later")
+    # IVFFlat only supports relaxed order, where rows can come out of the index slightly out of order,
+    # so sort them by distance again.
+    statement = (
+      sqlalchemy.select(model, model_distance.label("distance"))
+      .order_by(model_distance)
+      .limit(k)
+      .options(*authorization)
+    )
+    with _local_settings(session, {"hnsw.iterative_scan": "strict_order", "ivfflat.iterative_scan": "relaxed_order"}):
+      rows = session.execute(statement).all()
+    return [row[0] for row in sorted(rows, key=lambda row: row[1])]
+
+  # Compute the distance on the table's column rather than the model's,
+  # so that the candidate query isn't authorized and can be answered by the vector index.
+  table_column = column.property.columns[0]
+  table_distance = getattr(table_column, distance)(query_vector)
+
+  n = min(k * overfetch, max_candidates)
+  while True:
+    candidates = _candidates(session, model, table_distance, n)
+    results = _nearest_authorized(session, model, model_distance, k, authorization, _in_candidates(model, candidates))
+    if len(results) >= k:
+      return results
+    if len(candidates) < n or n >= max_candidates:
+      # Fewer candidates than asked for doesn't mean every row was a candidate: an IVFFlat index
+      # only returns rows from the lists it probes. Either way, only `prefilter` can find the rest.
+      break
+    if strategy == "auto" and results:
+      # Size the next round from the share of candidates that were authorized, with some headroom.
+      needed = ceil(k * len(candidates) / len(results) * 1.5)
+      if needed > max_candidates:
+        break
+      n = min(max(needed, n * 2), max_candidates)
+    elif strategy == "auto":
+      break
+    else:
+      n = min(n * overfetch, max_candidates)
+
+  return _nearest_authorized(session, model, model_distance, k, authorization)
@@ -0,0 +1,89 @@
+"""
+Database views for fact bindings.
+
+Oso Cloud inlines the fact queries generated from your `.orm` models into every filter it returns,
+often several times, so the SQL of each authorized statement grows with your policy.
+Instead, create one view per fact, such as `oso_fact_document_status`, and have the fact queries select from the views:
+
+    create_fact_views(engine, Base.registry)
+    sqlalchemy_oso_cloud.init(Base.registry, dialect=engine, fact_views=True)
+
+The filters then only reference the views, which keeps them short,
+and each fact can be tuned, or replaced by a materialized view, on its own.
+Create the views again whenever the models they are generated from change,
+for example in a migration with `fact_view_ddl`:
+
+    def upgrade():
+        for statement in fact_view_ddl(Base.registry, op.get_bind().dialect):
+            op.execute(statement)
+"""
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import Connection, Engine
+from sqlalchemy.engine import Dialect
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.orm import registry
+
+from .oso import _fact_bindings, _fact_query_dialect, _fact_view_columns
+
+__all__ = ["fact_view_ddl", "create_fact_views", "drop_fact_views"]
+
+
+def _fact_views(registry: registry, dialect: Optional[Dialect]) -> List[Tuple[str, List[str], str]]:
+  """The name, columns and query of the view for each fact."""
+  facts, _, view_names = _fact_bindings(registry, None if dialect is None else _fact_query_dialect(dialect))
+  return [(view_names[key], _fact_view_columns(key), config["query"]) for key, config in facts.items()]
+
+
+def fact_view_ddl(registry: registry, dialect: Optional[Dialect] = None, replace: bool = True) -> List[str]:
+  """
+  Render the statements that create the view for each fact.
+
+  :param registry: The SQLAlchemy registry containing your models.
+  :param dialect: (optional) The dialect of your database. By default, SQLAlchemy's generic default dialect.
+  :param replace: (optional) Whether to drop each view before creating it.
+  :return: The statements, in the order to run them.
+  """
+  preparer = (dialect or DefaultDialect()).identifier_preparer
+  statements = []
+  for name, columns, query in _fact_views(registry, dialect):
+    if replace:
+      statements.append(f"DROP VIEW IF EXISTS {preparer.quote(name)}")
+    statements.append(f"CREATE VIEW {preparer.quote(name)} ({', '.join(columns)}) AS {query}")
+  return statements
+
+
+@contextmanager
+def _begin(bind: Union[Engine, Connection]) -> Iterator[Connection]:
+  if isinstance(bind, Engine):
+    with bind.begin() as connection:
+      yield connection
+  else:
+    yield bind
+
+
+def create_fact_views(bind: Union[Engine, Connection], registry: registry, replace: bool = True):
+  """
+  Create the view for each fact, for use with `init(fact_views=True)`.
+
+  :param bind: The engine or connection of your database. A connection is left for the caller to commit.
+  :param registry: The SQLAlchemy registry containing your models.
+  :param replace: (optional) Whether to drop existing views first.
+  """
+  with _begin(bind) as connection:
+    for statement in fact_view_ddl(registry, connection.dialect, replace):
+      connection.exec_driver_sql(statement)
+
+
+def drop_fact_views(bind: Union[Engine, Connection], registry: registry):
+  """
+  Drop the views created by `create_fact_views`.
+
+  :param bind: The engine or connection of your database. A connection is left for the caller to commit.
+  :param registry: The SQLAlchemy registry containing your models.
+  """
+  preparer = bind.dialect.identifier_preparer
+  with _begin(bind) as connection:
+    for name, _, _ in _fact_views(registry, bind.dialect):
+      connection.exec_driver_sql(f"DROP VIEW IF EXISTS {preparer.quote(name)}")
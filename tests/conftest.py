@@ -4,6 +4,7 @@ import pytest
 from oso_cloud import Oso, Value
 from sqlalchemy import Engine, create_engine, text
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import Session
 from testcontainers.core.container import DockerContainer  # type: ignore
 from testcontainers.core.waiting_utils import (  # type: ignore
@@ -57,6 +58,10 @@ def engine(postgres: PostgresContainer):
   return engine
 
 
+@pytest.fixture
+def async_engine(engine: Engine, postgres: PostgresContainer):
+  return create_async_engine(postgres.get_connection_url(driver="asyncpg"))
+
 @pytest.fixture
 def session(engine: Engine):
   with Session(engine) as session:
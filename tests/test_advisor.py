@@ -0,0 +1,48 @@
+from sqlalchemy import Engine, inspect, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from sqlalchemy_oso_cloud.advisor import recommend_indexes, to_alembic, to_ddl
+from sqlalchemy_oso_cloud.orm import Resource, attribute
+
+from .models import Base
+
+
+def test_recommend_indexes():
+  recommendations = {recommendation.columns: recommendation for recommendation in recommend_indexes(Base.registry)}
+  assert set(recommendations) == {("organization_id", "id"), ("team_id", "id"), ("status", "id"), ("is_public", "id")}
+  assert recommendations[("organization_id", "id")].facts == (
+    "has_relation(Document:_, organization, Organization:_)",
+    "has_relation(Organization:_, documents, Document:_)",
+  )
+  assert not any(recommendation.indexed for recommendation in recommendations.values())
+
+def test_recommended_indexes_are_created_by_ddl(engine: Engine):
+  recommendations = recommend_indexes(Base.registry, inspect(engine))
+  assert len(recommendations) == 4
+  ddl = to_ddl(recommendations, engine.dialect)
+  assert "CREATE INDEX ix_oso_document_status_id ON document (status, id);" in ddl
+  with engine.connect() as connection:
+    for statement in ddl.split(";\n"):
+      connection.execute(text(statement.rstrip(";")))
+    assert recommend_indexes(Base.registry, inspect(connection)) == []
+    connection.rollback()
+
+def test_alembic_migration():
+  migration = to_alembic(recommend_indexes(Base.registry))
+  assert "    op.create_index('ix_oso_document_team_id_id', 'document', ['team_id', 'id'])" in migration
+  assert "    op.drop_index('ix_oso_document_team_id_id', table_name='document')" in migration
+
+def test_long_index_names_are_truncated_distinctly():
+  class LongBase(DeclarativeBase):
+    pass
+
+  class Widget(LongBase, Resource):
+    __tablename__ = "widget_with_a_table_name_long_enough_to_need_truncation"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    lifecycle_status_of_the_widget_one: Mapped[str] = attribute()
+    lifecycle_status_of_the_widget_two: Mapped[str] = attribute()
+
+  names = [recommendation.name for recommendation in recommend_indexes(LongBase.registry)]
+  assert len(names) == 2
+  assert all(len(name) <= 63 for name in names)
+  assert names[0] != names[1]
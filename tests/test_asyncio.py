@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from oso_cloud import Value
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import select
+from sqlalchemy_oso_cloud.asyncio import AsyncSession
+
+from .models import Document, Organization
+
+
+async def read_document_ids(engine: AsyncEngine, actor: Value) -> list[int]:
+  async with AsyncSession(engine) as session:
+    statement = select(Document).order_by(Document.id).authorized(actor, "read")
+    documents = await session.scalars(statement)
+    return [document.id for document in documents]
+
+def test_deferred_authorization_with_async_session(monkeypatch: pytest.MonkeyPatch, async_engine: AsyncEngine, alice: Value, bob: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  async def main():
+    return await asyncio.gather(read_document_ids(async_engine, alice), read_document_ids(async_engine, bob))
+  alice_ids, bob_ids = asyncio.run(main())
+  assert alice_ids == [1, 2, 3]
+  assert bob_ids == [2, 3]
+
+def test_authorized_async(async_engine: AsyncEngine, alice: Value):
+  async def main():
+    async with AsyncSession(async_engine) as session:
+      statement = await select(Document, Organization).join(Organization).authorized_async(alice, "read")
+      return (await session.execute(statement)).all()
+  # 0 because Organization has no "read" permissions
+  assert len(asyncio.run(main())) == 0
+
+def test_async_oso(alice: Value):
+  oso = sqlalchemy_oso_cloud.get_async_oso()
+  sql_filter = asyncio.run(oso.list_local(alice, "read", "Document", "document.id"))
+  assert sql_filter == sqlalchemy_oso_cloud.get_oso().list_local(alice, "read", "Document", "document.id")
+
+def test_authorize_objects(async_engine: AsyncEngine, bob: Value):
+  async def main():
+    async with AsyncSession(async_engine) as session:
+      documents = (await session.scalars(select(Document).order_by(Document.id))).all()
+      return await session.authorize_objects(bob, "read", documents)
+  assert [document.id for document in asyncio.run(main())] == [2, 3]
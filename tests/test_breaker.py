@@ -0,0 +1,65 @@
+import time
+
+import pytest
+from oso_cloud import Value
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import CircuitBreaker, CircuitOpenError, select
+
+from .models import Document
+
+
+def test_breaker_opens_when_failure_rate_is_reached():
+  breaker = CircuitBreaker(failure_rate=0.5, minimum_requests=4, window=60, reset_timeout=60)
+  for succeeded in [True, False, True]:
+    breaker._allow()
+    breaker._record(succeeded)
+  assert breaker.state == "closed"
+  breaker._allow()
+  breaker._record(False)
+  assert breaker.state == "open"
+  with pytest.raises(CircuitOpenError):
+    breaker._allow()
+  assert breaker.stats() == ("open", 2, 2, 1, 1)
+
+def test_breaker_lets_one_fetch_through_after_reset_timeout():
+  breaker = CircuitBreaker(minimum_requests=1, reset_timeout=0.05)
+  breaker._allow()
+  breaker._record(False)
+  time.sleep(0.1)
+  breaker._allow()
+  assert breaker.state == "half_open"
+  with pytest.raises(CircuitOpenError):
+    breaker._allow()
+  breaker._record(False)
+  assert breaker.state == "open"
+  time.sleep(0.1)
+  breaker._allow()
+  breaker._record(True)
+  assert breaker.state == "closed"
+
+def test_interrupted_probe_lets_next_fetch_probe():
+  breaker = CircuitBreaker(minimum_requests=1, reset_timeout=0.05)
+  breaker._allow()
+  breaker._record(False)
+  time.sleep(0.1)
+  with pytest.raises(KeyboardInterrupt):
+    with breaker._call():
+      raise KeyboardInterrupt
+  assert breaker.state == "half_open"
+  with breaker._call():
+    pass
+  assert breaker.state == "closed"
+
+def test_open_breaker_fails_fast(monkeypatch: pytest.MonkeyPatch, alice: Value):
+  breaker = CircuitBreaker(minimum_requests=1, reset_timeout=60)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_circuit_breaker", breaker)
+  oso = sqlalchemy_oso_cloud.get_oso()
+  def list_local(*args, **kwargs):
+    raise ConnectionError("Oso Cloud is down")
+  monkeypatch.setattr(oso, "list_local", list_local)
+
+  with pytest.raises(ConnectionError):
+    select(Document).authorized(alice, "read")
+  with pytest.raises(CircuitOpenError):
+    select(Document).authorized(alice, "read")
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+from oso_cloud import Value
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import FilterCache, select
+from sqlalchemy_oso_cloud.cache import FilterKey
+
+from .models import Document
+
+
+@pytest.fixture
+def filter_cache(monkeypatch: pytest.MonkeyPatch):
+  cache = FilterCache(maxsize=2, ttl=60, invalidate_on_write=True)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_filter_cache", cache)
+  oso = sqlalchemy_oso_cloud.get_oso()
+  monkeypatch.setattr(oso, "fact_listeners", [cache._on_facts_written])
+  return cache
+
+def key(actor: Value, action: str = "read") -> FilterKey:
+  return FilterKey(actor, action, "Document", "document.id")
+
+def test_cached_filter_is_reused(oso_session: sqlalchemy_oso_cloud.Session, filter_cache: FilterCache, alice: Value):
+  documents = oso_session.execute(select(Document).authorized(alice, "read")).scalars().all()
+  assert len(documents) == 3
+  assert filter_cache.get(key(alice)) is not None
+
+  filter_cache.set(key(alice), "document.id = 1")
+  documents = oso_session.execute(select(Document).authorized(alice, "read")).scalars().all()
+  assert [document.id for document in documents] == [1]
+
+def test_least_recently_used_filter_is_evicted(filter_cache: FilterCache, alice: Value, bob: Value):
+  filter_cache.set(key(alice), "alice read")
+  filter_cache.set(key(bob), "bob read")
+  assert filter_cache.get(key(alice)) == "alice read"
+  filter_cache.set(key(bob, "write"), "bob write")
+  assert filter_cache.get(key(bob)) is None
+  assert filter_cache.get(key(alice)) == "alice read"
+  assert len(filter_cache) == 2
+
+def test_expired_filter_is_not_served(alice: Value):
+  cache = FilterCache(ttl=0.01)
+  cache.set(key(alice), "alice read")
+  time.sleep(0.02)
+  assert cache.get(key(alice)) is None
+
+def test_invalidate(filter_cache: FilterCache, alice: Value, bob: Value):
+  filter_cache.set(key(alice), "alice read")
+  filter_cache.set(key(bob), "bob read")
+  assert filter_cache.invalidate(actor=alice) == 1
+  assert filter_cache.get(key(bob)) == "bob read"
+  assert filter_cache.invalidate(resource_type="Document") == 1
+  assert len(filter_cache) == 0
+
+def test_writing_facts_clears_cache(filter_cache: FilterCache, alice: Value, bob: Value):
+  filter_cache.set(key(alice), "alice read")
+  filter_cache.set(key(bob), "bob read")
+  fact = ("has_role", alice, "admin", Value("Organization", "3"))
+  oso = sqlalchemy_oso_cloud.get_oso()
+  oso.insert(fact)
+  try:
+    assert len(filter_cache) == 0
+  finally:
+    oso.delete(fact)
+
+def test_writing_facts_that_mention_neither_actor_nor_resource_type_clears_cache(filter_cache: FilterCache, alice: Value, bob: Value):
+  # facts can change filters indirectly, such as a role granted to a group the actor is in
+  filter_cache.set(key(alice), "alice read")
+  fact = ("has_role", bob, "editor", Value("Team", "333"))
+  oso = sqlalchemy_oso_cloud.get_oso()
+  oso.insert(fact)
+  try:
+    assert filter_cache.get(key(alice)) is None
+  finally:
+    oso.delete(fact)
+
+def test_stale_filter_is_served_while_refreshing(monkeypatch: pytest.MonkeyPatch, oso_session: sqlalchemy_oso_cloud.Session, alice: Value):
+  cache = FilterCache(ttl=0.05, stale_ttl=60)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_filter_cache", cache)
+  cache.set(key(alice), "document.id = 1")
+  time.sleep(0.1)
+  assert cache.get(key(alice)) is None
+
+  documents: list[Document] = list(oso_session.execute(select(Document).authorized(alice, "read")).scalars())
+  assert [document.id for document in documents] == [1]
+  for _ in range(50):
+    if cache.stats().refreshes:
+      break
+    time.sleep(0.1)
+  assert cache.get(key(alice)) != "document.id = 1"
+  assert cache.stats().stale_hits == 1
+  assert cache.stats().refreshes == 1
+
+def test_stale_filter_expires(alice: Value):
+  cache = FilterCache(ttl=0.01, stale_ttl=0.01)
+  cache.set(key(alice), "document.id = 1")
+  time.sleep(0.05)
+  assert cache._lookup(key(alice)) == (None, False)
+  assert len(cache) == 0
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+from sqlalchemy.dialects import postgresql
+
+import sqlalchemy_oso_cloud.oso
+from sqlalchemy_oso_cloud.oso import (
+  _local_authorization_config_file,
+  _registry_fingerprint,
+  generate_local_authorization_config,
+)
+
+from .models import Base
+
+
+def test_config_is_cached_on_disk(tmp_path: Path):
+  with _local_authorization_config_file(Base.registry, None, str(tmp_path)) as path:
+    config_yaml = Path(path).read_text()
+  assert yaml.safe_load(config_yaml) == generate_local_authorization_config(Base.registry)
+  [cached] = tmp_path.iterdir()
+  assert cached.read_text() == config_yaml
+
+  cached.write_text("facts: {}\n")
+  with _local_authorization_config_file(Base.registry, None, str(tmp_path)) as path:
+    assert Path(path).read_text() == "facts: {}\n"
+
+def test_uncached_config_file_is_removed():
+  with _local_authorization_config_file(Base.registry, None, None) as path:
+    assert yaml.safe_load(Path(path).read_text()) == generate_local_authorization_config(Base.registry)
+  assert not Path(path).exists()
+
+def test_config_cache_is_keyed_by_library_source(monkeypatch: pytest.MonkeyPatch):
+  fingerprint = _registry_fingerprint(Base.registry, None)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_generator_digest", lambda: "another version")
+  assert _registry_fingerprint(Base.registry, None) != fingerprint
+
+def test_config_cache_is_keyed_by_dialect():
+  assert _registry_fingerprint(Base.registry, None) == _registry_fingerprint(Base.registry, None)
+  assert _registry_fingerprint(Base.registry, None) != _registry_fingerprint(Base.registry, postgresql.dialect())
+
+def test_import_does_not_load_oso_cloud_or_yaml():
+  code = "import sys, sqlalchemy_oso_cloud; print(sorted({'oso_cloud', 'yaml'} & set(sys.modules)))"
+  output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+  assert output.strip() == "[]"
@@ -0,0 +1,68 @@
+import pytest
+from oso_cloud import Value
+from sqlalchemy import Engine
+from sqlalchemy.exc import CompileError
+from sqlalchemy.orm import Session
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import delete, select, update
+
+from .models import Document
+
+DOCUMENTS = select(Document).order_by(Document.id)
+
+@pytest.fixture
+def list_local_calls(monkeypatch: pytest.MonkeyPatch):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  oso = sqlalchemy_oso_cloud.get_oso()
+  calls = []
+  list_local = oso.list_local
+  def spy(*args, **kwargs):
+    calls.append(kwargs)
+    return list_local(*args, **kwargs)
+  monkeypatch.setattr(oso, "list_local", spy)
+  return calls
+
+def test_building_statement_does_not_fetch_filter(list_local_calls: list, alice: Value):
+  DOCUMENTS.authorized(alice, "read")
+  assert list_local_calls == []
+
+def test_filter_is_fetched_on_execute(oso_session: sqlalchemy_oso_cloud.Session, list_local_calls: list, alice: Value, bob: Value):
+  documents = oso_session.execute(DOCUMENTS.authorized(alice, "read")).scalars().all()
+  assert [document.id for document in documents] == [1, 2, 3]
+  documents = oso_session.execute(DOCUMENTS.authorized(bob, "read")).scalars().all()
+  assert [document.id for document in documents] == [2, 3]
+  assert len(list_local_calls) == 2
+
+def test_deferred_query(oso_session: sqlalchemy_oso_cloud.Session, list_local_calls: list, bob: Value):
+  query = oso_session.query(Document).authorized(bob, "write")
+  assert list_local_calls == []
+  assert len(query.all()) == 1
+
+def test_deferred_statement_is_authorized_by_plain_session(session: Session, list_local_calls: list, bob: Value):
+  documents = session.execute(DOCUMENTS.authorized(bob, "read")).scalars().all()
+  assert [document.id for document in documents] == [2, 3]
+
+def test_deferred_select_fails_closed_outside_session(engine: Engine, list_local_calls: list, bob: Value):
+  statement = DOCUMENTS.authorized(bob, "read")
+  with engine.connect() as connection:
+    with pytest.raises(CompileError):
+      connection.execute(statement)
+  with pytest.raises(CompileError):
+    str(statement)
+
+def test_deferred_update_fails_closed_outside_session(engine: Engine, list_local_calls: list, bob: Value):
+  with engine.connect() as connection:
+    with pytest.raises(CompileError):
+      connection.execute(update(Document).values(content="changed").authorized(bob, "read"))
+    connection.rollback()
+  with Session(engine) as session:
+    assert session.execute(select(Document.content).order_by(Document.id)).scalars().all() == ["hello", "world", "world"]
+
+def test_deferred_delete_fails_closed_outside_session(engine: Engine, list_local_calls: list, bob: Value):
+  with engine.connect() as connection:
+    with pytest.raises(CompileError):
+      connection.execute(delete(Document).authorized(bob, "read"))
+    connection.rollback()
+  with Session(engine) as session:
+    assert len(session.execute(DOCUMENTS).scalars().all()) == 3
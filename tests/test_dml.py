@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, cast
+
+import pytest
+from oso_cloud import Value
+from sqlalchemy import CursorResult, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import Session, delete, select, update
+from sqlalchemy_oso_cloud.asyncio import AsyncSession
+
+from .models import Document
+
+
+def test_authorized_update(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  try:
+    result = cast(CursorResult[Any], oso_session.execute(update(Document).values(content="archived").authorized(bob, "read")))
+    assert result.rowcount == 2
+    documents: list[Document] = list(oso_session.execute(select(Document).where(Document.content == "archived").order_by(Document.id)).scalars())
+    assert [document.id for document in documents] == [2, 3]
+  finally:
+    oso_session.rollback()
+
+def test_authorized_delete(oso_session: sqlalchemy_oso_cloud.Session, alice: Value):
+  try:
+    result = cast(CursorResult[Any], oso_session.execute(delete(Document).where(Document.id > 1).authorized(alice, "write")))
+    assert result.rowcount == 1
+    documents: list[Document] = list(oso_session.execute(select(Document).order_by(Document.id)).scalars())
+    assert [document.id for document in documents] == [1, 3]
+  finally:
+    oso_session.rollback()
+
+def test_deferred_authorized_update(monkeypatch: pytest.MonkeyPatch, engine: Engine, bob: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  statement = update(Document).values(content="archived").authorized(bob, "write")
+  with Session(engine) as session:
+    assert cast(CursorResult[Any], session.execute(statement)).rowcount == 1
+    session.rollback()
+
+def test_authorized_update_async(async_engine: AsyncEngine, alice: Value):
+  async def main():
+    async with AsyncSession(async_engine) as session:
+      statement = await update(Document).values(content="archived").authorized_async(alice, "write")
+      result = await session.execute(statement)
+      await session.rollback()
+      return result.rowcount
+  assert asyncio.run(main()) == 2
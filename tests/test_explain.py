@@ -0,0 +1,34 @@
+import pytest
+from oso_cloud import Value
+from sqlalchemy.orm import Session
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import select
+from sqlalchemy_oso_cloud.explain import explain_authorized
+
+from .models import Document
+
+
+def test_explain_authorized(session: Session, alice: Value):
+  plan = explain_authorized(session, select(Document).authorized(alice, "read"))
+  assert "document.organization_id" in plan.sql
+  assert any(node.relation == "document" for node in plan.root.walk())
+  assert all(node.actual_rows is None for node in plan.root.walk())
+
+def test_explain_authorized_query(oso_session: sqlalchemy_oso_cloud.Session, alice: Value):
+  plan = explain_authorized(oso_session, oso_session.query(Document).authorized(alice, "read"))
+  assert "document.organization_id" in plan.sql
+
+def test_explain_analyze(session: Session, alice: Value):
+  plan = explain_authorized(session, select(Document).authorized(alice, "read"), analyze=True, buffers=True)
+  assert plan.root.actual_rows is not None
+  assert "Shared Hit Blocks" in plan.root.details
+
+def test_explain_flags_seq_scans(session: Session, alice: Value):
+  plan = explain_authorized(session, select(Document).authorized(alice, "read"), seq_scan_rows=0)
+  assert any(warning.kind == "seq_scan" and warning.node.relation == "document" for warning in plan.warnings)
+
+def test_explain_resolves_deferred_authorization(monkeypatch: pytest.MonkeyPatch, session: Session, alice: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  plan = explain_authorized(session, select(Document).authorized(alice, "read"))
+  assert "document.organization_id" in plan.sql
@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+from decimal import Decimal
+
+from oso_cloud import Value
+from sqlalchemy import Column, Engine, MetaData, Table, Uuid
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import select
+from sqlalchemy_oso_cloud.filters import filter_expression, parameterize
+from sqlalchemy_oso_cloud.oso import _filter_column_types
+
+from .models import Base, Document
+
+
+def test_parameterize_strings():
+  template, parameters = parameterize("document.status = 'published' AND document.owner = 'o''brien'")
+  assert template == "document.status = :oso_1 AND document.owner = :oso_2"
+  assert parameters == (("oso_1", "published"), ("oso_2", "o'brien"))
+
+def test_parameterize_numbers_and_lists():
+  template, parameters = parameterize("organization.id IN (1, 2) OR organization.id = -3 OR score >= 2.5 OR name IN ('a')")
+  assert template == "organization.id IN :oso_1 OR organization.id = :oso_2 OR score >= :oso_3 OR name IN :oso_4"
+  assert parameters == (("oso_1", [1, 2]), ("oso_2", -3), ("oso_3", Decimal("2.5")), ("oso_4", ["a"]))
+
+def test_parameterize_leaves_structure_alone():
+  template, parameters = parameterize("x::integer = 'a'::text AND y = DATE '2025-01-01' AND \"we:ird\" = 1 LIMIT 1")
+  assert template == "x\\:\\:integer = :oso_1\\:\\:text AND y = DATE '2025-01-01' AND \"we\\:ird\" = :oso_2 LIMIT 1"
+  assert parameters == (("oso_1", "a"), ("oso_2", 1))
+
+def test_parameterize_leaves_constant_comparisons_alone():
+  template, parameters = parameterize("1 = 0 OR (1 = 1 AND document.id = 2) OR -1 <> 1.5 OR t1 = 3")
+  assert template == "1 = 0 OR (1 = 1 AND document.id = :oso_1) OR -1 <> 1.5 OR t1 = :oso_2"
+  assert parameters == (("oso_1", 2), ("oso_2", 3))
+
+def test_actors_share_compiled_statement(engine: Engine, oso_session: sqlalchemy_oso_cloud.Session, alice: Value, bob: Value):
+  alice_statement = select(Document).authorized(alice, "read")
+  bob_statement = select(Document).authorized(bob, "read")
+  alice_sql = str(alice_statement.compile(engine))
+  assert "alice" not in alice_sql
+  assert alice_sql == str(bob_statement.compile(engine))
+  assert len(oso_session.execute(alice_statement).scalars().all()) == 3
+  assert len(oso_session.execute(bob_statement).scalars().all()) == 2
+
+def test_integer_primary_key_parameters_are_typed(async_engine: AsyncEngine):
+  sql_filter = "document.id IN ('1', '2') AND \"document\".\"organization_id\" = '1' AND document.status <> 'published'"
+  statement = select(Document.id).where(filter_expression(sql_filter, _filter_column_types(Base.metadata)))
+  compiled = statement.compile(dialect=postgresql.asyncpg.dialect())
+  assert "organization_id\" = $1::INTEGER" in str(compiled)
+  assert compiled.params == {"oso_1_1": [1, 2], "oso_2_1": 1, "oso_3_1": "published"}
+  # asyncpg rejects strings for integer parameters, and PostgreSQL can't compare an integer to a `VARCHAR`
+  async def main():
+    async with async_engine.connect() as connection:
+      return (await connection.execute(statement)).scalars().all()
+  assert asyncio.run(main()) == [1]
+
+def test_uuid_primary_key_parameters_are_typed(engine: Engine):
+  metadata = MetaData()
+  table = Table("oso_uuid_resource", metadata, Column("id", Uuid, primary_key=True))
+  ids = [uuid.uuid4(), uuid.uuid4()]
+  metadata.create_all(engine)
+  try:
+    with engine.begin() as connection:
+      connection.execute(table.insert(), [{"id": id} for id in ids])
+    clause = filter_expression(f"oso_uuid_resource.id IN ('{ids[0]}')", _filter_column_types(metadata))
+    compiled = select(table.c.id).where(clause).compile(dialect=postgresql.asyncpg.dialect())
+    assert compiled.params == {"oso_1_1": [ids[0]]}
+    with engine.connect() as connection:
+      assert connection.execute(select(table.c.id).where(clause)).scalars().all() == [ids[0]]
+  finally:
+    metadata.drop_all(engine)
@@ -0,0 +1,111 @@
+from typing import Optional
+
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from oso_cloud import Value
+from sqlalchemy.orm import Session
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import FilterCache, select
+from sqlalchemy_oso_cloud.instrumentation import (
+  Authorization,
+  Execution,
+  Listener,
+  add_listener,
+  remove_listener,
+)
+from sqlalchemy_oso_cloud.opentelemetry import OpenTelemetryListener
+
+from .models import Document, Organization
+
+
+class RecordingListener(Listener):
+  def __init__(self):
+    self.fetched: list[tuple[Optional[Session], Authorization]] = []
+    self.executed: list[tuple[Session, Execution]] = []
+
+  def filters_fetched(self, session: Optional[Session], authorization: Authorization):
+    self.fetched.append((session, authorization))
+
+  def statement_executed(self, session: Session, execution: Execution):
+    self.executed.append((session, execution))
+
+@pytest.fixture
+def listener():
+  listener = RecordingListener()
+  add_listener(listener)
+  yield listener
+  remove_listener(listener)
+
+def test_filters_fetched(listener: RecordingListener, alice: Value):
+  select(Document, Organization).join(Document.organization).authorized(alice, "read")
+  [(session, authorization)] = listener.fetched
+  assert session is None
+  assert authorization.models == 2
+  assert {fetch.resource_type for fetch in authorization.fetches} == {"Document", "Organization"}
+  assert all(fetch.size > 0 and not fetch.cache_hit for fetch in authorization.fetches)
+
+def test_statement_executed(oso_session: sqlalchemy_oso_cloud.Session, listener: RecordingListener, alice: Value):
+  oso_session.execute(select(Document)).all()
+  assert listener.executed == []
+  oso_session.execute(select(Document).authorized(alice, "read")).all()
+  [(session, execution)] = listener.executed
+  assert session is oso_session
+  assert execution.duration > 0
+  assert execution.authorizations == (listener.fetched[0][1],)
+
+def test_session_listener(oso_session: sqlalchemy_oso_cloud.Session, session: Session, alice: Value):
+  listener = RecordingListener()
+  add_listener(listener, session=oso_session)
+  statement = select(Document).authorized(alice, "read")
+  session.execute(statement).all()
+  assert listener.executed == []
+  oso_session.execute(statement).all()
+  assert len(listener.executed) == 1
+
+def test_deferred_filters_are_fetched_by_session(monkeypatch: pytest.MonkeyPatch, oso_session: sqlalchemy_oso_cloud.Session, listener: RecordingListener, alice: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  statement = select(Document).authorized(alice, "read")
+  assert listener.fetched == []
+  oso_session.execute(statement).all()
+  [(session, _)] = listener.fetched
+  assert session is oso_session
+
+def test_cache_hits(monkeypatch: pytest.MonkeyPatch, listener: RecordingListener, alice: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_filter_cache", FilterCache())
+  select(Document).authorized(alice, "read")
+  select(Document).authorized(alice, "read")
+  assert [fetch.cache_hit for _, authorization in listener.fetched for fetch in authorization.fetches] == [False, True]
+
+def test_opentelemetry(oso_session: sqlalchemy_oso_cloud.Session, alice: Value):
+  spans = InMemorySpanExporter()
+  tracer_provider = TracerProvider()
+  tracer_provider.add_span_processor(SimpleSpanProcessor(spans))
+  metrics = InMemoryMetricReader()
+  listener = OpenTelemetryListener(tracer_provider, MeterProvider(metric_readers=[metrics]))
+  add_listener(listener)
+  try:
+    oso_session.execute(select(Document).authorized(alice, "read")).all()
+  finally:
+    remove_listener(listener)
+
+  assert [span.name for span in spans.get_finished_spans()] == ["oso.fetch_filters", "oso.execute"]
+  metrics_data = metrics.get_metrics_data()
+  assert metrics_data is not None
+  names = {
+    metric.name
+    for resource_metrics in metrics_data.resource_metrics
+    for scope_metrics in resource_metrics.scope_metrics
+    for metric in scope_metrics.metrics
+  }
+  assert names == {
+    "oso.filter.fetch.duration",
+    "oso.filter.size",
+    "oso.filter.cache.requests",
+    "oso.statement.models",
+    "oso.statement.execution.duration",
+  }
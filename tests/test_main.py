@@ -1,11 +1,14 @@
+import pytest
 import yaml
 from oso_cloud import Oso, Value
-from sqlalchemy import func, text
+from sqlalchemy import Engine, event, func, text
 from sqlalchemy import select as sqla_select
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import Session, joinedload
 
 import sqlalchemy_oso_cloud
 from sqlalchemy_oso_cloud import authorized, select
+from sqlalchemy_oso_cloud.auth import fetch_filters
 
 from .models import Base, Document, Organization
 
@@ -45,6 +48,14 @@ def test_local_authorization_config_snapshot(snapshot):
   config = sqlalchemy_oso_cloud.oso.generate_local_authorization_config(Base.registry)
   snapshot.assert_match(yaml.dump(config))
 
+def test_local_authorization_config_for_dialect(engine: Engine):
+  config = sqlalchemy_oso_cloud.oso.generate_local_authorization_config(Base.registry, engine.dialect)
+  with engine.connect() as connection:
+    for fact in config["facts"].values():
+      connection.execute(text(fact["query"]))
+  config = sqlalchemy_oso_cloud.oso.generate_local_authorization_config(Base.registry, sqlite.dialect())
+  assert config["facts"]["is_public(Document:_)"]["query"].endswith("WHERE document.is_public = 1")
+
 def test_alice_and_bob_write(oso_session: sqlalchemy_oso_cloud.Session, alice: Value, bob: Value):
   documents = oso_session.query(Document).authorized(alice, "write").all()
   assert len(documents) == 2
@@ -209,3 +220,104 @@ def test_authorized_on_column(oso_session: sqlalchemy_oso_cloud.Session, alice:
   documents = oso_session.query(Document.id).authorized(alice, "read").all() 
   assert len(documents) > 0
   assert all(isinstance(doc.id, int) for doc in documents)
+
+def test_multimodel_filters_are_fetched_once_per_model(monkeypatch, alice: Value):
+  oso = sqlalchemy_oso_cloud.get_oso()
+  list_local = oso.list_local
+  calls = []
+  def spy(*args, **kwargs):
+    calls.append(kwargs["resource_type"])
+    return list_local(*args, **kwargs)
+  monkeypatch.setattr(oso, "list_local", spy)
+
+  requests = [(Document, alice, "read"), (Organization, alice, "read"), (Document, alice, "read")]
+  filters = fetch_filters(requests)
+  assert sorted(calls) == ["Document", "Organization"]
+  assert filters[0] == filters[2]
+  assert filters[0] == oso.list_local(alice, "read", "Document", "document.id")
+
+def test_authorize_objects(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  documents = oso_session.query(Document).order_by(Document.id.desc()).all()
+  organizations = oso_session.query(Organization).all()
+  authorized_objects = oso_session.authorize_objects(bob, "read", [*documents, *organizations, documents[0]])
+  assert authorized_objects == [documents[0], documents[1], documents[0]]
+  assert oso_session.authorize_objects(bob, "write", documents) == [documents[0]]
+  assert oso_session.authorize_objects(bob, "read", []) == []
+
+def test_authorize_objects_in_chunks(monkeypatch: pytest.MonkeyPatch, oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  documents = oso_session.query(Document).order_by(Document.id).all()
+  statements = []
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.auth, "_MAX_IDENTITY_PARAMETERS", 2)
+  event.listen(oso_session.get_bind(), "before_cursor_execute", record)
+  try:
+    assert oso_session.authorize_objects(bob, "read", [*documents, documents[1]]) == [documents[1], documents[2], documents[1]]
+  finally:
+    event.remove(oso_session.get_bind(), "before_cursor_execute", record)
+  assert len(statements) == 2
+
+def test_authorize_objects_requires_persistent_instances(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  with pytest.raises(ValueError):
+    oso_session.authorize_objects(bob, "read", [Document(id=4)])
+
+def test_with_permissions(oso_session: sqlalchemy_oso_cloud.Session, alice: Value, bob: Value):
+  statement = select(Document).order_by(Document.id).with_permissions(alice, ["read", "write", "eat"])
+  assert [(row.Document.id, row.write, row.eat) for row in oso_session.execute(statement)] == [
+    (1, True, False),
+    (2, True, False),
+    (3, False, False),
+  ]
+  rows = oso_session.query(Document).order_by(Document.id).with_permissions(bob, ["read", "write"]).all()
+  assert [(document.id, write) for document, write in rows] == [(2, False), (3, True)]
+
+def test_with_permissions_fetches_filters_in_one_step(monkeypatch, alice: Value):
+  calls = []
+  def fetch(requests):
+    calls.append(list(requests))
+    return original(requests)
+  original = sqlalchemy_oso_cloud.auth._fetch_filters
+  monkeypatch.setattr(sqlalchemy_oso_cloud.auth, "_fetch_filters", fetch)
+  select(Document).with_permissions(alice, ["read", "write", "delete"])
+  assert calls == [[(Document, alice, "read"), (Document, alice, "write"), (Document, alice, "delete")]]
+
+def test_with_permissions_requires_model_for_several_models(bob: Value):
+  with pytest.raises(ValueError):
+    select(Document, Organization).with_permissions(bob, ["read", "write"])
+
+def test_authorized_aggregates(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  assert oso_session.scalar(select(func.count()).select_from(Document).authorized(bob, "read")) == 2
+  assert oso_session.query(func.count()).select_from(Document).authorized(bob, "read").scalar() == 2
+  # 0 because Organization has no "read" permissions
+  assert oso_session.scalar(select(func.count()).select_from(Organization).join(Document).authorized(bob, "read")) == 0
+
+def test_authorized_select_from_subquery(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  counts = (
+    sqla_select(Document.organization_id, func.count().label("count"))
+    .group_by(Document.organization_id)
+    .subquery()
+  )
+  assert oso_session.scalar(select(func.sum(counts.c.count)).authorized(bob, "read")) == 2
+
+def test_authorized_with_action_per_model(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  statement = select(Document.id, Organization.id).join(Organization).order_by(Document.id)
+  # only the models in the mapping are authorized
+  assert oso_session.execute(statement.authorized(bob, {Document: "write"})).all() == [(3, 3)]
+  # 0 because Organization has no "read" permissions
+  assert oso_session.execute(statement.authorized(bob, {Document: "write", Organization: "read"})).all() == []
+  documents = oso_session.query(Document).join(Organization).authorized(bob, {Document: "read"}).all()
+  assert [document.id for document in documents] == [2, 3]
+
+def test_authorized_with_action_per_model_fetches_filters_in_one_step(monkeypatch, bob: Value):
+  calls = []
+  def fetch(requests):
+    calls.append(list(requests))
+    return original(requests)
+  original = sqlalchemy_oso_cloud.auth._fetch_filters
+  monkeypatch.setattr(sqlalchemy_oso_cloud.auth, "_fetch_filters", fetch)
+  select(Document, Organization).join(Organization).authorized(bob, {Document: "read", Organization: "view"})
+  assert calls == [[(Document, bob, "read"), (Organization, bob, "view")]]
+
+def test_authorized_with_empty_action_mapping(bob: Value):
+  with pytest.raises(ValueError):
+    select(Document).authorized(bob, {})
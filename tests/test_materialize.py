@@ -0,0 +1,110 @@
+import time
+from typing import Iterator
+
+import pytest
+from oso_cloud import Value
+from sqlalchemy import Engine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import AuthorizationTable, FilterCache, Session, select
+from sqlalchemy_oso_cloud.auth import _listen_for_writes
+from sqlalchemy_oso_cloud.oso import _fact_binding_tables
+
+from .models import Base, Document
+
+
+@pytest.fixture
+def authorization_table(monkeypatch: pytest.MonkeyPatch, engine: Engine) -> Iterator[AuthorizationTable]:
+  table = AuthorizationTable(engine, refresh_on_write=False)
+  table._fact_tables = _fact_binding_tables(Base.registry)
+  table.create()
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_authorization_table", table)
+  _listen_for_writes()
+  yield table
+  table.drop()
+
+@pytest.fixture
+def list_local_calls(monkeypatch: pytest.MonkeyPatch) -> list:
+  oso = sqlalchemy_oso_cloud.get_oso()
+  calls = []
+  list_local = oso.list_local
+  def spy(*args, **kwargs):
+    calls.append(kwargs)
+    return list_local(*args, **kwargs)
+  monkeypatch.setattr(oso, "list_local", spy)
+  return calls
+
+def read_document_ids(session: Session, actor: Value) -> list[int]:
+  documents: list[Document] = list(session.execute(select(Document).order_by(Document.id).authorized(actor, "read")).scalars())
+  return [document.id for document in documents]
+
+def test_materialized_actor_is_authorized_from_table(authorization_table: AuthorizationTable, oso_session: Session, list_local_calls: list, alice: Value, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  assert authorization_table.is_fresh(bob, "read", Document)
+  list_local_calls.clear()
+  assert read_document_ids(oso_session, bob) == [2, 3]
+  assert list_local_calls == []
+  assert read_document_ids(oso_session, alice) == [1, 2, 3]
+  assert len(list_local_calls) == 1
+
+def test_refresh_is_incremental(authorization_table: AuthorizationTable, engine: Engine, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  assert authorization_table.refresh() == 0
+  with Session(engine) as session:
+    document = session.get(Document, 1)
+    assert document is not None
+    document.status = "published"
+    session.commit()
+  try:
+    # the commit made the materialization stale, so the filter is used until it is refreshed
+    assert not authorization_table.is_fresh(bob, "read", Document)
+    with Session(engine) as session:
+      assert read_document_ids(session, bob) == [1, 2, 3]
+    assert authorization_table.refresh(bob) == 1
+    assert authorization_table.is_fresh(bob, "read", Document)
+    with Session(engine) as session:
+      assert read_document_ids(session, bob) == [1, 2, 3]
+  finally:
+    with Session(engine) as session:
+      document = session.get(Document, 1)
+      assert document is not None
+      document.status = "draft"
+      session.commit()
+
+def test_stale_materialization_falls_back_to_filter(authorization_table: AuthorizationTable, oso_session: Session, list_local_calls: list, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  list_local_calls.clear()
+  authorization_table._on_facts_written([])
+  assert read_document_ids(oso_session, bob) == [2, 3]
+  assert len(list_local_calls) == 1
+
+def test_forget(authorization_table: AuthorizationTable, oso_session: Session, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  authorization_table.forget(bob)
+  assert not authorization_table.is_fresh(bob, "read", Document)
+  assert read_document_ids(oso_session, bob) == [2, 3]
+
+def test_refresh_bypasses_filter_cache(monkeypatch: pytest.MonkeyPatch, authorization_table: AuthorizationTable, list_local_calls: list, bob: Value):
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_filter_cache", FilterCache(ttl=3600))
+  authorization_table.materialize(bob, "read", Document)
+  authorization_table.refresh()
+  assert len(list_local_calls) == 2
+
+def test_background_refreshes_are_coalesced(authorization_table: AuthorizationTable, list_local_calls: list, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  list_local_calls.clear()
+  authorization_table.refresh_on_write = True
+  for _ in range(20):
+    authorization_table._on_facts_written([])
+  for _ in range(100):
+    if authorization_table.is_fresh(bob, "read", Document):
+      break
+    time.sleep(0.05)
+  assert authorization_table.is_fresh(bob, "read", Document)
+  assert len(list_local_calls) < 20
+
+def test_forget_drops_actor(authorization_table: AuthorizationTable, bob: Value):
+  authorization_table.materialize(bob, "read", Document)
+  authorization_table.forget(bob)
+  assert authorization_table._actors == {}
+  assert authorization_table.refresh() == 0
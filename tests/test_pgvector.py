@@ -7,8 +7,11 @@ from oso_cloud import Value
 from sqlalchemy import select as sqla_select
 from sqlalchemy import text
 
+import sqlalchemy_oso_cloud
+import sqlalchemy_oso_cloud.vector
 from sqlalchemy_oso_cloud import Session as OsoSession
 from sqlalchemy_oso_cloud import authorized, select
+from sqlalchemy_oso_cloud.vector import authorized_nearest
 
 from .models import Document, Organization
 
@@ -190,4 +193,52 @@ def test_no_interference_with_non_vector_queries(oso_session: OsoSession, alice:
     stmt = select(Document).where(Document.status == "published").authorized(alice, "read")
     documents = oso_session.execute(stmt).scalars().all() # type: ignore
     assert len(documents) >= 1
-    assert all(doc.status == "published" for doc in documents)
\ No newline at end of file
+    assert all(doc.status == "published" for doc in documents)
+
+@pytest.mark.parametrize("strategy", ["auto", "overfetch", "prefilter", "iterative"])
+def test_authorized_nearest(oso_session: OsoSession, alice: Value, bob: Value, strategy: str):
+    query_vector = [0.3, 0.4, 0.5]
+
+    documents = authorized_nearest(oso_session, Document, Document.embedding, query_vector, 1, bob, "read", strategy=strategy)
+    assert [document.id for document in documents] == [2]
+
+    documents = authorized_nearest(oso_session, Document, Document.embedding, query_vector, 5, bob, "read", strategy=strategy)
+    assert [document.id for document in documents] == [2, 3]
+
+    documents = authorized_nearest(oso_session, Document, Document.embedding, query_vector, 2, alice, "read", strategy=strategy)
+    assert [document.id for document in documents] == [2, 1]
+
+
+def test_authorized_nearest_restores_settings(oso_session: OsoSession, bob: Value):
+    oso_session.execute(text("SET hnsw.ef_search = 40"))
+    authorized_nearest(oso_session, Document, Document.embedding, [0.3, 0.4, 0.5], 100, bob, "read", strategy="overfetch")
+    assert oso_session.scalar(text("SHOW hnsw.ef_search")) == "40"
+
+
+@pytest.mark.parametrize("strategy", ["auto", "overfetch"])
+def test_authorized_nearest_falls_back_when_index_returns_fewer_candidates(monkeypatch: pytest.MonkeyPatch, oso_session: OsoSession, bob: Value, strategy: str):
+    # like an IVFFlat index that only probes one list
+    candidates = sqlalchemy_oso_cloud.vector._candidates
+    monkeypatch.setattr(sqlalchemy_oso_cloud.vector, "_candidates", lambda *args: candidates(*args)[:1])
+    documents = authorized_nearest(oso_session, Document, Document.embedding, [0.3, 0.4, 0.5], 2, bob, "read", strategy=strategy)
+    assert [document.id for document in documents] == [2, 3]
+
+
+def test_authorized_nearest_rejects_more_candidates_than_index_returns(oso_session: OsoSession, bob: Value):
+    with pytest.raises(ValueError):
+        authorized_nearest(oso_session, Document, Document.embedding, [0.3, 0.4, 0.5], 1, bob, "read", max_candidates=5000)
+
+
+@pytest.mark.parametrize("strategy", ["auto", "overfetch", "prefilter", "iterative"])
+def test_authorized_nearest_fetches_filter_once(monkeypatch: pytest.MonkeyPatch, oso_session: OsoSession, bob: Value, strategy: str):
+    oso = sqlalchemy_oso_cloud.get_oso()
+    calls = []
+    list_local = oso.list_local
+    def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return list_local(*args, **kwargs)
+    monkeypatch.setattr(oso, "list_local", spy)
+    # overfetch and auto run a round of candidates, then fall back to prefilter
+    documents = authorized_nearest(oso_session, Document, Document.embedding, [0.3, 0.4, 0.5], 5, bob, "read", strategy=strategy)
+    assert [document.id for document in documents] == [2, 3]
+    assert len(calls) == 1
@@ -0,0 +1,56 @@
+import pytest
+from oso_cloud import Value
+from sqlalchemy import func
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import AuthorizationPlanner, select
+
+from .models import Document
+
+
+def test_planner_tries_both_strategies_then_uses_the_faster():
+  planner = AuthorizationPlanner(overfetch=3, explore_every=0)
+  assert planner.choose("Document", "read", 10) == ("candidates", 30)
+  planner.record("Document", "read", "candidates", 0.01, candidates=30, authorized=15)
+  assert planner.choose("Document", "read", 10) == ("filter", 0)
+  planner.record("Document", "read", "filter", 0.05)
+  # 10 rows at a pass rate of 0.5, with headroom
+  assert planner.choose("Document", "read", 10) == ("candidates", 30)
+  stats = planner.stats("Document", "read")
+  assert stats is not None
+  assert stats.statements == 3
+  assert stats.pass_rate == 0.5
+
+def test_planner_uses_filter_for_large_limits_and_low_pass_rates():
+  planner = AuthorizationPlanner(max_limit=100, max_candidates=1000, explore_every=0)
+  assert planner.choose("Document", "read", 101) == ("filter", 0)
+  planner.record("Document", "read", "candidates", 0.01, candidates=1000, authorized=0)
+  assert planner.choose("Document", "read", 10) == ("filter", 0)
+
+def test_planner_explores_the_slower_strategy():
+  planner = AuthorizationPlanner(explore_every=3)
+  planner.record("Document", "read", "candidates", 0.01, candidates=10, authorized=10)
+  planner.record("Document", "read", "filter", 0.05)
+  assert [planner.choose("Document", "read", 1)[0] for _ in range(3)] == ["candidates", "candidates", "filter"]
+
+@pytest.fixture
+def planner(monkeypatch: pytest.MonkeyPatch):
+  planner = AuthorizationPlanner(explore_every=2)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_defer_authorization", True)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_planner", planner)
+  return planner
+
+def test_planned_statements_return_the_same_rows(planner: AuthorizationPlanner, oso_session: sqlalchemy_oso_cloud.Session, alice: Value, bob: Value):
+  for _ in range(6):
+    for actor, action, expected in [(alice, "read", [3, 2]), (bob, "read", [3, 2]), (bob, "write", [3]), (bob, "eat", [])]:
+      statement = select(Document).order_by(Document.id.desc()).limit(2).authorized(actor, action)
+      documents: list[Document] = list(oso_session.execute(statement).scalars())
+      assert [document.id for document in documents] == expected
+  stats = planner.stats("Document", "read")
+  assert stats is not None
+  assert stats.filter_seconds is not None and stats.candidates_seconds is not None
+
+def test_unplannable_statements_use_the_filter(planner: AuthorizationPlanner, oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  assert oso_session.scalar(select(func.count()).select_from(Document).authorized(bob, "read")) == 2
+  assert len(oso_session.execute(select(Document).authorized(bob, "read")).scalars().all()) == 2
+  assert planner.stats("Document", "read") is None
@@ -0,0 +1,117 @@
+from typing import Optional
+
+import pytest
+from oso_cloud import Value
+from sqlalchemy import Engine, create_engine
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import LRUBackend, RedisBackend, ResultCache, Session, select
+from sqlalchemy_oso_cloud.auth import _listen_for_writes
+from sqlalchemy_oso_cloud.oso import _fact_binding_tables
+
+from .models import Base, Document
+
+
+@pytest.fixture
+def result_cache(monkeypatch: pytest.MonkeyPatch) -> ResultCache:
+  cache = ResultCache(LRUBackend(maxsize=100), ttl=60)
+  cache._fact_tables = _fact_binding_tables(Base.registry)
+  monkeypatch.setattr(sqlalchemy_oso_cloud.oso, "_result_cache", cache)
+  _listen_for_writes()
+  return cache
+
+def read_document_ids(session: Session, actor: Value) -> list[int]:
+  documents: list[Document] = list(session.execute(select(Document).order_by(Document.id).authorized(actor, "read")).scalars())
+  return [document.id for document in documents]
+
+def test_results_are_cached_per_actor(result_cache: ResultCache, oso_session: Session, alice: Value, bob: Value):
+  assert read_document_ids(oso_session, bob) == [2, 3]
+  assert read_document_ids(oso_session, bob) == [2, 3]
+  assert read_document_ids(oso_session, alice) == [1, 2, 3]
+  assert result_cache.stats() == (1, 2, 0)
+
+def test_committed_writes_invalidate_results(result_cache: ResultCache, engine: Engine, bob: Value):
+  with Session(engine) as session:
+    assert read_document_ids(session, bob) == [2, 3]
+    document = session.get(Document, 1)
+    assert document is not None
+    document.status = "published"
+    session.flush()
+    # uncommitted writes bypass the cache
+    assert read_document_ids(session, bob) == [1, 2, 3]
+    assert result_cache.stats().bypassed == 1
+    session.commit()
+  try:
+    with Session(engine) as session:
+      assert read_document_ids(session, bob) == [1, 2, 3]
+  finally:
+    with Session(engine) as session:
+      document = session.get(Document, 1)
+      assert document is not None
+      document.status = "draft"
+      session.commit()
+
+def test_fact_writes_invalidate_results(result_cache: ResultCache, oso_session: Session, bob: Value):
+  assert read_document_ids(oso_session, bob) == [2, 3]
+  fact = ("has_role", bob, "admin", Value("Organization", "1"))
+  oso = sqlalchemy_oso_cloud.get_oso()
+  oso.insert(fact)
+  result_cache._on_facts_written([])
+  try:
+    assert read_document_ids(oso_session, bob) == [1, 2, 3]
+  finally:
+    oso.delete(fact)
+
+class FakeRedis:
+  def __init__(self):
+    self.values: dict[str, bytes] = {}
+
+  def get(self, key: str) -> Optional[bytes]:
+    return self.values.get(key)
+
+  def set(self, key: str, value: bytes, px: Optional[int] = None):
+    self.values[key] = value
+
+  def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+    return [self.values.get(key) for key in keys]
+
+  def incr(self, key: str):
+    self.values[key] = str(int(self.values.get(key, b"0")) + 1).encode()
+
+def test_redis_backend():
+  backend = RedisBackend(FakeRedis())
+  backend.set("key", b"result", 60)
+  assert backend.get("key") == b"result"
+  assert backend.versions(["document", "organization"]) == [0, 0]
+  backend.bump(["document"])
+  assert backend.versions(["document", "organization"]) == [1, 0]
+
+def test_redis_backend_signs_results():
+  redis = FakeRedis()
+  backend = RedisBackend(redis, secret=b"secret")
+  backend.set("key", b"result", 60)
+  assert backend.get("key") == b"result"
+  assert RedisBackend(redis, secret=b"other").get("key") is None
+  redis.values["sqlalchemy_oso_cloud:result:key"] = b"forged"
+  assert backend.get("key") is None
+
+def test_locking_and_refreshing_reads_are_not_cached(result_cache: ResultCache, oso_session: Session, bob: Value):
+  statement = select(Document).order_by(Document.id)
+  oso_session.execute(statement.with_for_update().authorized(bob, "read")).all()
+  oso_session.execute(statement.execution_options(populate_existing=True).authorized(bob, "read")).all()
+  assert result_cache.stats() == (0, 0, 0)
+
+def test_streamed_chunks_are_not_cached(result_cache: ResultCache, oso_session: Session, bob: Value):
+  assert [document.id for document in oso_session.stream_authorized(select(Document), bob, "read", chunk_size=1)] == [2, 3]
+  assert result_cache.stats() == (0, 0, 0)
+
+def test_results_are_cached_per_database(result_cache: ResultCache, engine: Engine, bob: Value):
+  with Session(engine) as session:
+    assert read_document_ids(session, bob) == [2, 3]
+  other_engine = create_engine(engine.url.set(query={"application_name": "other"}))
+  try:
+    with Session(other_engine) as session:
+      assert read_document_ids(session, bob) == [2, 3]
+  finally:
+    other_engine.dispose()
+  assert result_cache.stats() == (0, 2, 0)
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from oso_cloud import Value
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import aliased
+
+import sqlalchemy_oso_cloud
+from sqlalchemy_oso_cloud import select
+from sqlalchemy_oso_cloud.asyncio import AsyncSession
+
+from .models import Document, Organization
+
+
+def test_stream_authorized(monkeypatch: pytest.MonkeyPatch, oso_session: sqlalchemy_oso_cloud.Session, alice: Value):
+  oso = sqlalchemy_oso_cloud.get_oso()
+  calls = []
+  list_local = oso.list_local
+  def counting_list_local(*args, **kwargs):
+    calls.append(args)
+    return list_local(*args, **kwargs)
+  monkeypatch.setattr(oso, "list_local", counting_list_local)
+
+  documents = oso_session.stream_authorized(select(Document), alice, "read", chunk_size=2)
+  first, second = next(documents), next(documents)
+  assert [first.id, second.id] == [1, 2]
+  third = next(documents)
+  assert third.id == 3
+  # the first chunk has been expunged
+  assert first not in oso_session
+  assert list(documents) == []
+  assert len(calls) == 1
+
+def test_stream_authorized_rows(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  statement = select(Document, Organization).join(Organization)
+  rows = list(oso_session.stream_authorized(statement, bob, {Document: "read"}, chunk_size=1))
+  assert [(row.Document.id, row.Organization.id) for row in rows] == [(2, 2), (3, 3)]
+
+def test_stream_authorized_requires_unordered_model_statement(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  with pytest.raises(ValueError):
+    list(oso_session.stream_authorized(select(Document).order_by(Document.id), bob, "read"))
+  with pytest.raises(ValueError):
+    list(oso_session.stream_authorized(select(Document.id), bob, "read"))
+
+def test_stream_authorized_async(async_engine: AsyncEngine, bob: Value):
+  async def main():
+    async with AsyncSession(async_engine) as session:
+      return [document.id async for document in session.stream_authorized(select(Document), bob, "read", chunk_size=1)]
+  assert asyncio.run(main()) == [2, 3]
+
+def test_stream_authorized_join_repeating_primary_key(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  other = aliased(Document)
+  # each published document is paired with every published document
+  statement = select(Document, other).join(other, other.status == Document.status)
+  rows = list(oso_session.stream_authorized(statement, bob, {Document: "read"}, chunk_size=1))
+  assert sorted((row[0].id, row[1].id) for row in rows) == [(2, 2), (2, 3), (3, 2), (3, 3)]
+
+def test_stream_authorized_requires_joined_models_to_be_selected(oso_session: sqlalchemy_oso_cloud.Session, bob: Value):
+  with pytest.raises(ValueError):
+    list(oso_session.stream_authorized(select(Organization).join(Organization.documents), bob, {Document: "read"}))
+  with pytest.raises(ValueError):
+    list(oso_session.stream_authorized(select(Document, Organization).outerjoin(Organization), bob, {Document: "read"}))
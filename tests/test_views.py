@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import yaml
+from oso_cloud import Oso, Value
+from sqlalchemy import Engine, inspect, select, text
+
+from sqlalchemy_oso_cloud.oso import generate_local_authorization_config
+from sqlalchemy_oso_cloud.views import create_fact_views, drop_fact_views, fact_view_ddl
+
+from .models import Base, Document
+
+
+def test_fact_view_ddl():
+  statements = fact_view_ddl(Base.registry, replace=False)
+  assert "CREATE VIEW oso_fact_document_status (arg_1, arg_2) AS SELECT document.id, document.status \nFROM document" in statements
+  config = generate_local_authorization_config(Base.registry, fact_views=True)
+  assert config["facts"]["has_status(Document:_, String:_)"]["query"] == "SELECT arg_1, arg_2 FROM oso_fact_document_status"
+
+def test_fact_views_match_fact_queries(engine: Engine):
+  create_fact_views(engine, Base.registry)
+  try:
+    tables = generate_local_authorization_config(Base.registry, engine.dialect)["facts"]
+    views = generate_local_authorization_config(Base.registry, engine.dialect, fact_views=True)["facts"]
+    with engine.connect() as connection:
+      for fact, config in views.items():
+        assert sorted(connection.execute(text(config["query"])).all()) == sorted(connection.execute(text(tables[fact]["query"])).all())
+  finally:
+    drop_fact_views(engine, Base.registry)
+  with engine.connect() as connection:
+    assert not [name for name in inspect(connection).get_view_names() if name.startswith("oso_fact_")]
+
+def test_filters_select_from_fact_views(engine: Engine, oso_url: str, oso_auth: str, tmp_path: Path, alice: Value):
+  data_bindings = tmp_path / "data.yaml"
+  data_bindings.write_text(yaml.dump(generate_local_authorization_config(Base.registry, engine.dialect, fact_views=True)))
+  oso = Oso(oso_url, oso_auth, data_bindings=str(data_bindings))
+  create_fact_views(engine, Base.registry)
+  try:
+    sql_filter = oso.list_local(alice, "read", "Document", "document.id")
+    assert "oso_fact_document_status" in sql_filter
+    with engine.connect() as connection:
+      ids = connection.execute(select(Document.id).where(text(sql_filter)).order_by(Document.id)).scalars().all()
+    assert ids == [1, 2, 3]
+  finally:
+    drop_fact_views(engine, Base.registry)